@@ -36,6 +36,12 @@ class ProcessesBus:
             if hasattr(listener, 'on_process_deleted'):
                 listener.on_process_deleted(process_name)
 
+    def notify_commands_changed(self, process_name):
+        """Уведомление об изменении команд процесса (добавление/переименование/удаление)."""
+        for listener in self.listeners:
+            if hasattr(listener, 'on_commands_changed'):
+                listener.on_commands_changed(process_name)
+
     def notify_process_state(self, process_states):
         """Уведомление о состоянии процессов (запущен/не запущен)."""
         for listener in self.listeners:
@@ -1098,6 +1098,8 @@ class ProgramBuilderController(QObject):
         with open(order_path, 'w', encoding='utf-8') as f:
             json.dump({"group_order": group_order}, f, ensure_ascii=False, indent=2)
 
+        self.processes_controller.processes_bus.notify_commands_changed(self.active_process)
+
     def eventFilter(self, obj, event):
         if obj == self.tree.viewport():
             if event.type() == QEvent.MouseButtonPress:
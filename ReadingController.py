@@ -6,6 +6,7 @@ from PySide6.QtCore import QObject, Signal, Qt
 from PySide6.QtGui import QTextCursor
 from PySide6.QtWidgets import QMessageBox, QDialog, QVBoxLayout, QLineEdit, QPushButton
 from TTS_controller import TTS_Controller
+from word_replacements_engine import get_word_replacements_engine
 import nltk
 nltk.download('punkt', quiet=True)
 
@@ -28,6 +29,7 @@ class ReadingController(QObject):
         self.highlight_thread = None
         self.current_pos = 0  # Позиция в тексте для курсора
         self.log_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources/reader_log.json')  # Путь к файлу лога
+        self.word_replacements = get_word_replacements_engine()  # Общий словарь произношения
 
         # Подключение сигнала от TTS о старте воспроизведения
         self.tts_controller.playback_started.connect(self.on_playback_started)
@@ -152,15 +154,8 @@ class ReadingController(QObject):
             self.ui.textEdit_TextToRead.ensureCursorVisible()
 
     def apply_pronunciation_replacements(self, text):
-        """Применяет правила произношения из json перед TTS."""
-        replacements_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources/word_replacements.json')
-        if not os.path.exists(replacements_path):
-            return text
-        with open(replacements_path, 'r', encoding='utf-8') as f:
-            replacements = json.load(f)
-        for wrong, correct in replacements.items():
-            text = text.replace(wrong, correct)  # Простая замена (можно улучшить regex для точности)
-        return text
+        """Применяет правила произношения из общего словаря перед TTS."""
+        return self.word_replacements.apply(text)
 
     def open_pronunciation_editor(self):
         """Окно правил произношения."""
@@ -179,16 +174,13 @@ class ReadingController(QObject):
 
     def save_pronunciation(self, word, pronunciation):
         """Сохраняет в word_replacements.json."""
-        replacements_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources/word_replacements.json')
-        replacements = {}
-        if os.path.exists(replacements_path):
-            with open(replacements_path, 'r', encoding='utf-8') as f:
-                replacements = json.load(f)
-        replacements[word] = pronunciation
-        with open(replacements_path, 'w', encoding='utf-8') as f:
-            json.dump(replacements, f, indent=4, ensure_ascii=False)
+        try:
+            self.word_replacements.set_replacement(word, pronunciation)
+        except Exception as e:
+            QMessageBox.critical(self.ui, "Ошибка", f"Не удалось сохранить: {e}")
+            return
         QMessageBox.information(self.ui, "Успех", f"Правило для '{word}' сохранено")
-        # TTS перезагрузит при необходимости (если добавишь в TTS_controller)
+        # STT и окно словаря увидят правило сразу: словарь общий
 
     def save_log(self):
         """Сохраняет текущий индекс в лог."""
@@ -0,0 +1,117 @@
+# filename: STT_aec.py
+import numpy as np
+
+
+class EchoCanceller:
+    """
+    Адаптивное эхоподавление по опорному сигналу (озвучка TTS из PlaybackReference).
+
+    Частотный адаптивный фильтр с разбиением на блоки (PBFDAF, overlap-save):
+    кадр frame отсчётов, partitions блоков фильтра — хвост эха frame * partitions
+    (по умолчанию 512 * 16 = 170 мс на 48 кГц) после задержки delay_ms.
+    Все партиции обрабатываются одной векторной операцией numpy на кадр.
+
+    Адаптация идёт только при заметном опорном сигнале и замораживается при
+    двойном разговоре (пользователь говорит поверх озвучки). ERLE (подавление эха, дБ)
+    оценивается по кадрам с опорным сигналом: пока оно ниже erle_min_db, фильтр
+    считается несошедшимся, и движок может закрыть распознаватель (полудуплекс).
+    """
+
+    def __init__(self,
+                 samplerate: int = 48000,
+                 frame: int = 512,
+                 partitions: int = 16,
+                 step: float = 0.5,
+                 delay_ms: float = 20.0,
+                 erle_min_db: float = 6.0):
+        self.samplerate = samplerate
+        self.frame = int(frame)
+        self.partitions = int(partitions)
+        self.step = step
+        self.delay_ms = delay_ms
+        self.erle_min_db = erle_min_db
+        self.reset()
+
+    def reset(self):
+        n = self.frame
+        self._weights = np.zeros((self.partitions, n + 1), dtype=np.complex128)
+        self._ref_spectra = np.zeros((self.partitions, n + 1), dtype=np.complex128)
+        self._ref_power = np.full(n + 1, 1e-6)
+        self._ref_prev = np.zeros(n, dtype=np.float64)
+        self._pending = np.zeros(0, dtype=np.float64)
+        self._pending_time = None
+        self.erle_db = 0.0
+        self.frames = 0
+        self.adapted_frames = 0
+
+    @property
+    def converged(self) -> bool:
+        return self.erle_db >= self.erle_min_db
+
+    def stats(self) -> dict:
+        return {
+            "erle_db": self.erle_db,
+            "converged": self.converged,
+            "frames": self.frames,
+            "adapted_frames": self.adapted_frames,
+            "delay_ms": self.delay_ms,
+            "tail_ms": self.frame * self.partitions / self.samplerate * 1000.0,
+        }
+
+    def _process_frame(self, mic: np.ndarray, ref: np.ndarray) -> np.ndarray:
+        n = self.frame
+        ref_spectrum = np.fft.rfft(np.concatenate((self._ref_prev, ref)))
+        self._ref_prev = ref
+        self._ref_spectra = np.roll(self._ref_spectra, 1, axis=0)
+        self._ref_spectra[0] = ref_spectrum
+
+        echo = np.fft.irfft(np.sum(self._weights * self._ref_spectra, axis=0), 2 * n)[n:]
+        error = mic - echo
+        self.frames += 1
+
+        ref_energy = float(np.dot(ref, ref))
+        if ref_energy < n * 1e-6:
+            return error  # Озвучки нет: фильтр не трогаем
+        mic_energy = float(np.dot(mic, mic)) + 1e-10
+        err_energy = float(np.dot(error, error)) + 1e-10
+        self.erle_db = 0.9 * self.erle_db + 0.1 * 10.0 * np.log10(mic_energy / err_energy)
+
+        # Двойной разговор: остаток заметно громче микрофона в целом или эха — не адаптируемся
+        if err_energy > mic_energy:
+            if err_energy > 4.0 * mic_energy:
+                self._weights[:] = 0  # Фильтр разошёлся
+            return error
+        power = np.abs(ref_spectrum) ** 2
+        self._ref_power = power if not self.adapted_frames else 0.9 * self._ref_power + 0.1 * power
+        error_spectrum = np.fft.rfft(np.concatenate((np.zeros(n), error)))
+        # Шаг делится на число партиций: градиент всех партиций суммируется в одном выходе
+        gradient = (self.step / self.partitions) * np.conj(self._ref_spectra) * error_spectrum \
+            / (self._ref_power + 1e-6)
+        # Ограничение градиента: причинная половина импульсной характеристики
+        constrained = np.fft.irfft(gradient, 2 * n, axis=1)
+        constrained[:, n:] = 0.0
+        self._weights += np.fft.rfft(constrained, axis=1)
+        self.adapted_frames += 1
+        return error
+
+    def process(self, mic: np.ndarray, start_time: float, reference) -> np.ndarray:
+        """
+        Блок микрофона (int16), начавшийся в start_time (perf_counter) -> блок без эха (int16).
+        Отсчёты, не набравшие целый кадр, ждут следующего блока.
+        """
+        data = mic.astype(np.float64) / 32768.0
+        if len(self._pending):
+            start_time = self._pending_time
+            data = np.concatenate((self._pending, data))
+        n = self.frame
+        usable = len(data) // n * n
+        self._pending = data[usable:]
+        self._pending_time = start_time + usable / self.samplerate
+        if not usable:
+            return np.zeros(0, dtype=np.int16)
+        # Эхо в микрофоне в момент t — это озвучка, сыгранная в t - delay
+        ref = reference.read(start_time - self.delay_ms / 1000.0, usable).astype(np.float64)
+        out = np.empty(usable)
+        for i in range(0, usable, n):
+            out[i:i + n] = self._process_frame(data[i:i + n], ref[i:i + n])
+        return np.clip(out * 32768.0, -32768, 32767).astype(np.int16)
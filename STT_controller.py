@@ -1,7 +1,9 @@
 import json
 import os
 from pathlib import Path
-from PySide6.QtWidgets import QPushButton, QLineEdit
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QPushButton, QLineEdit, QDialog, QVBoxLayout, QPlainTextEdit
 from STT_engine import SpeechRecognitionEngine
 
 class SpeechRecognitionController:
@@ -10,6 +12,7 @@ class SpeechRecognitionController:
         self.keyword_input = keyword_input
         self.text_browser = text_browser
         self.ui = ui
+        self.latency_panel = None
         self.config_path = str(Path.home() / "Saved Games" / "EDVoicePlugin" / "resources" / "Speech_Reconition.json")
         model_path = str(Path(__file__).parent / "resources" / "vosk" / "vosk_small")
         self.speech_engine = SpeechRecognitionEngine(
@@ -17,6 +20,12 @@ class SpeechRecognitionController:
             text_browser=self.text_browser,
             progress_bar=self.ui.progressBar_STT if hasattr(self.ui, 'progressBar_STT') else None
         )
+        # Фоновая загрузка сохранённой модели, пока строится остальной интерфейс
+        saved_config = self._load_config_file()
+        self._apply_whisper_settings(saved_config)
+        saved_model = saved_config.get("SpeechRecognitionModel", "")
+        if saved_model:
+            self.speech_engine.preload_model(saved_model)
         try:
             self.speech_engine.set_speech_browser(self.ui.lineEdit_SpeechOutput)
             self.speech_engine.signal_emitter.speech_text.connect(self.ui.update_speech_output)
@@ -27,6 +36,10 @@ class SpeechRecognitionController:
         for button_name, button in self.buttons.items():
             if button:  # Проверяем, что кнопка существует
                 button.toggled.connect(lambda state, name=button_name: self.toggle_setting(name, state))
+        if hasattr(self.ui, 'comboBox_CheckModelSpeechReconition'):
+            # Пункта Whisper нет в форме Designer: добавляем его здесь
+            if self.ui.comboBox_CheckModelSpeechReconition.findText("Whisper offline") < 0:
+                self.ui.comboBox_CheckModelSpeechReconition.addItem("Whisper offline")
         self.load_settings()
         self.toggle_keyword_filter(self.buttons["tool_button_CheckUseKeyword"].isChecked())
         if self.buttons["tool_button_CheckSpeechReconition"].isChecked():
@@ -37,6 +50,57 @@ class SpeechRecognitionController:
             self.ui.horizontalSlider_NoiseReduction.valueChanged.connect(self.update_noise_level)
             self.ui.horizontalSlider_NoiseReduction.setEnabled(self.buttons["tool_button_NoiseReduction"].isChecked())
 
+    def show_latency_panel(self, visible):
+        """Отладочное окно задержек распознавания (обновляется раз в секунду)."""
+        if not visible:
+            if self.latency_panel:
+                self.latency_panel.close()
+            return
+        if self.latency_panel is None:
+            dialog = QDialog(self.ui)
+            dialog.setWindowTitle("Задержки распознавания")
+            dialog.resize(640, 260)
+            layout = QVBoxLayout()
+            report = QPlainTextEdit()
+            report.setReadOnly(True)
+            report.setFont(QFont("Consolas", 9))
+            reset_btn = QPushButton("Сбросить")
+            reset_btn.clicked.connect(self.speech_engine.reset_latency_stats)
+            layout.addWidget(report)
+            layout.addWidget(reset_btn)
+            dialog.setLayout(layout)
+
+            def refresh():
+                early = self.speech_engine.get_early_dispatch_stats()
+                aec = self.speech_engine.get_aec_stats()
+                report.setPlainText(
+                    self.speech_engine.get_latency_report()
+                    + f"\n\nРанняя отправка: попаданий {early['early_hits']}, подтверждено {early['late_confirmations']}, "
+                      f"расхождений {early['mismatches']}, только по финалу {early['final_only']}"
+                    + f"\nЭхоподавление ({aec['mode']}): ERLE {aec['erle_db']:.1f} дБ, "
+                      f"закрыто блоков {aec['gated_blocks']}"
+                )
+
+            timer = QTimer(dialog)
+            timer.timeout.connect(refresh)
+            timer.start(1000)
+            refresh()
+            self.latency_panel = dialog
+        self.latency_panel.show()
+
+    def _apply_whisper_settings(self, config):
+        # Whisper (CTranslate2): размер или путь к модели, луч, потоки CPU, тип вычислений
+        try:
+            self.speech_engine.configure_whisper(
+                model=config.get("WhisperModel", "small"),
+                beam_size=config.get("WhisperBeamSize", 1),
+                cpu_threads=config.get("WhisperThreads", 0),
+                compute_type=config.get("WhisperComputeType", "int8"),
+                partial_interval_sec=config.get("WhisperPartialIntervalSec", 0.0)
+            )
+        except (TypeError, ValueError) as e:
+            print(f"[STT] Неверные настройки Whisper в конфигурации: {e}")
+
     def _connect_sent_text_signal(self):
         try:
             self.speech_engine.signal_emitter.sent_text.connect(self.ui.update_sent_phrase)
@@ -53,6 +117,15 @@ class SpeechRecognitionController:
         keyword = config.get("VoiceCommandKeyword", "")
         self.keyword_input.setText(keyword)
         self.speech_engine.set_keyword(keyword)
+        self._apply_whisper_settings(config)
+        # Google: число параллельных запросов и таймаут запроса
+        try:
+            self.speech_engine.configure_google(
+                workers=config.get("GoogleWorkers", 2),
+                timeout=config.get("GoogleTimeoutSec", 5.0)
+            )
+        except (TypeError, ValueError) as e:
+            print(f"[STT] Неверные настройки Google в конфигурации: {e}")
         model = config.get("SpeechRecognitionModel", "")
         if model and hasattr(self.ui, 'comboBox_CheckModelSpeechReconition'):
             self.ui.comboBox_CheckModelSpeechReconition.setCurrentText(model)
@@ -69,6 +142,35 @@ class SpeechRecognitionController:
             self.buttons["tool_button_EchoCancellation"].setChecked(echo_state)
             self.buttons["tool_button_EchoCancellation"].setEnabled(True)
         self.speech_engine.enable_echo_cancellation(echo_state)
+        # Режим грамматики команд (только фразы ProgramBuilder активного процесса)
+        self.speech_engine.set_recognition_mode(
+            "grammar" if config.get("CommandGrammarMode", False) else "open",
+            config.get("GrammarExtraPhrases", [])
+        )
+        # Двухступенчатое распознавание: полный словарь только после ключевого слова
+        self.speech_engine.enable_wake_word(
+            config.get("WakeWordSpotting", False),
+            config.get("WakeWordWindowSec", 5.0)
+        )
+        # Эхоподавление по озвучке TTS: "off", "reference" или "half_duplex"
+        try:
+            self.speech_engine.set_echo_reference_mode(
+                config.get("EchoReferenceMode", "off"),
+                config.get("EchoReferenceDelayMs")
+            )
+        except ValueError as e:
+            print(f"[STT] {e}")
+        # Ранняя отправка команд по стабильному частичному результату
+        self.speech_engine.enable_early_dispatch(
+            config.get("EarlyDispatch", False),
+            config.get("EarlyDispatchStableFrames", 3)
+        )
+        # VAD перед декодером (настраивается только через файл конфигурации)
+        self.speech_engine.enable_vad(config.get("VoiceActivityDetection", False))
+        try:
+            self.speech_engine.set_vad_thresholds(**config.get("VADThresholds", {}))
+        except (TypeError, ValueError) as e:
+            print(f"[STT] Неверные пороги VAD в конфигурации: {e}")
 
     def save_config(self):
         config = self._load_config_file()
@@ -180,6 +282,18 @@ class SpeechRecognitionController:
             self.speech_engine.enable_keyword_filter(False)
         self.save_config()
 
+    # ---- Слушатель ProcessesBus ----
+
+    def on_process_activated(self, process_name):
+        self.speech_engine.set_active_process(process_name)
+
+    def on_process_deactivated(self):
+        self.speech_engine.set_active_process(None)
+
+    def on_commands_changed(self, process_name):
+        if process_name == self.speech_engine.command_grammar.process_name:
+            self.speech_engine.refresh_command_grammar()
+
     def change_model(self, model):
         self.speech_engine.set_model(model)
         self.save_config()
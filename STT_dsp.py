@@ -0,0 +1,197 @@
+# filename: STT_dsp.py
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+
+# Цепочка по умолчанию повторяет прежнее "эхо-подавление": полоса 200–500 Гц, Баттерворт 10-го порядка
+DEFAULT_FILTER_CHAIN = [
+    {"type": "bandstop", "low": 200.0, "high": 500.0, "order": 10},
+]
+
+
+@lru_cache(maxsize=32)
+def design_sos(kind: str, freqs: tuple, order: int, samplerate: int) -> np.ndarray:
+    """Коэффициенты SOS Баттерворта; проектируются один раз на набор параметров."""
+    wn = freqs[0] if len(freqs) == 1 else list(freqs)
+    sos = signal.butter(order, wn, btype=kind, fs=samplerate, output='sos')
+    return sos
+
+
+class _SOSStage:
+    def __init__(self, kind: str, freqs: tuple, order: int, samplerate: int):
+        self.sos = design_sos(kind, freqs, int(order), int(samplerate))
+        self.zi = np.zeros((self.sos.shape[0], 2), dtype=np.float64)
+
+    def reset(self):
+        self.zi.fill(0.0)
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        y, self.zi = signal.sosfilt(self.sos, x, zi=self.zi)
+        return y
+
+
+class _GainStage:
+    def __init__(self, db: float):
+        self.factor = float(10.0 ** (db / 20.0))
+
+    def reset(self):
+        pass
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        x *= self.factor
+        return x
+
+
+class _NoiseGateStage:
+    """
+    Шумовой гейт по RMS блока (в долях полной шкалы int16).
+    Усиление меняется линейно внутри блока, чтобы не было щелчков на границах.
+    """
+
+    def __init__(self, threshold: float, floor_db: float = -30.0, hold_blocks: int = 8):
+        self.threshold = float(threshold) * 32768.0
+        self.floor = float(10.0 ** (floor_db / 20.0))
+        self.hold_blocks = max(0, int(hold_blocks))
+        self._gain = 1.0
+        self._hold = 0
+
+    def reset(self):
+        self._gain = 1.0
+        self._hold = 0
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if not len(x):
+            return x
+        rms = float(np.sqrt(np.mean(np.square(x))))
+        if rms >= self.threshold:
+            self._hold = self.hold_blocks
+            target = 1.0
+        elif self._hold > 0:
+            self._hold -= 1
+            target = 1.0
+        else:
+            target = self.floor
+        if target == self._gain:
+            if target != 1.0:
+                x *= target
+            return x
+        x *= np.linspace(self._gain, target, len(x), endpoint=False)
+        self._gain = target
+        return x
+
+
+class StreamingFilterChain:
+    """
+    Потоковая цепочка фильтров для аудио распознавания.
+
+    Коэффициенты фильтров считаются один раз при создании, состояние (zi) каждой
+    стадии переносится между блоками — нет переходных процессов на границах блоков,
+    и качество фильтрации не зависит от размера блока.
+
+    Стадии задаются списком словарей:
+    - {"type": "bandstop", "low": 200, "high": 500, "order": 10}
+    - {"type": "highpass", "cutoff": 80, "order": 4}
+    - {"type": "gain", "db": 6}
+    - {"type": "noise_gate", "threshold": 0.01, "floor_db": -30, "hold_blocks": 8}
+    """
+
+    def __init__(self, samplerate: int, stages: list[dict] | None = None):
+        self.samplerate = int(samplerate)
+        self.config = [dict(stage) for stage in (DEFAULT_FILTER_CHAIN if stages is None else stages)]
+        self._stages = [self._build_stage(stage) for stage in self.config]
+
+    def _build_stage(self, stage: dict):
+        kind = stage.get("type")
+        if kind == "bandstop":
+            return _SOSStage("bandstop", (float(stage["low"]), float(stage["high"])),
+                             stage.get("order", 10), self.samplerate)
+        if kind == "highpass":
+            return _SOSStage("highpass", (float(stage["cutoff"]),), stage.get("order", 4), self.samplerate)
+        if kind == "gain":
+            return _GainStage(stage.get("db", 0.0))
+        if kind == "noise_gate":
+            return _NoiseGateStage(stage.get("threshold", 0.01), stage.get("floor_db", -30.0),
+                                   stage.get("hold_blocks", 8))
+        raise ValueError(f"Неизвестная стадия фильтра: {kind}")
+
+    def reset(self):
+        """Сброс состояния фильтров (начало нового потока/фразы)."""
+        for stage in self._stages:
+            stage.reset()
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """Обрабатывает блок int16/float и возвращает float64 в шкале int16 (без клиппинга)."""
+        x = np.asarray(data, dtype=np.float64)
+        if x is data:
+            x = x.copy()
+        for stage in self._stages:
+            x = stage.process(x)
+        return x
+
+    def process_int16(self, data: np.ndarray) -> np.ndarray:
+        return np.clip(self.process(data), -32768, 32767).astype(np.int16)
+
+
+@lru_cache(maxsize=8)
+def design_polyphase(up: int, down: int) -> np.ndarray:
+    """
+    Полифазная матрица фильтра как у scipy.signal.resample_poly (Кайзер, beta=5).
+    Строка p — подфильтр фазы p, развёрнутый для скалярного произведения с окном входа.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+    taps = -(-len(h) // up)
+    bank = np.zeros((up, taps), dtype=np.float64)
+    for phase in range(up):
+        sub = h[phase::up]
+        bank[phase, :len(sub)] = sub
+    return bank[:, ::-1].copy()
+
+
+class PolyphaseResampler:
+    """
+    Потоковый ресемплер с рациональным коэффициентом (например 48000 -> 16000).
+
+    Фильтр проектируется один раз, хвост входа переносится между блоками, поэтому
+    результат по блокам совпадает с обработкой всего сигнала целиком. Считаются
+    только нужные выходные отсчёты (полифазная схема), без промежуточной частоты.
+    """
+
+    def __init__(self, rate_in: int, rate_out: int):
+        from math import gcd
+        g = gcd(int(rate_in), int(rate_out))
+        self.rate_in = int(rate_in)
+        self.rate_out = int(rate_out)
+        self.up = self.rate_out // g
+        self.down = self.rate_in // g
+        self._bank = design_polyphase(self.up, self.down)
+        self._taps = self._bank.shape[1]
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self._taps - 1, dtype=np.float64)
+        self._consumed = 0  # абсолютный индекс первого отсчёта следующего блока
+        self._next_out = 0  # абсолютный индекс следующего выходного отсчёта
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        x = np.asarray(data, dtype=np.float64)
+        if not len(x):
+            return np.zeros(0, dtype=np.float64)
+        buf = np.concatenate((self._history, x))
+        last_in = self._consumed + len(x) - 1
+        # Выход n использует входы до floor(n * down / up) включительно
+        n_end = ((last_in + 1) * self.up + self.down - 1) // self.down
+        n = np.arange(self._next_out, n_end)
+        pos = n * self.down
+        base = pos // self.up
+        phase = pos - base * self.up
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self._taps)
+        out = np.einsum('ij,ij->i', windows[base - self._consumed], self._bank[phase])
+        self._history = buf[len(buf) - (self._taps - 1):].copy()
+        self._consumed += len(x)
+        self._next_out = n_end
+        return out
+
+    def process_int16(self, data: np.ndarray) -> np.ndarray:
+        return np.clip(self.process(data), -32768, 32767).astype(np.int16)
@@ -0,0 +1,111 @@
+# filename: STT_early_dispatch.py
+import threading
+
+from STT_grammar import normalize_phrase
+
+
+class EarlyDispatcher:
+    """
+    Ранняя отправка команды по стабильному частичному результату.
+
+    Если частичная гипотеза Kaldi не меняется stable_frames блоков подряд и точно совпадает
+    с известной фразой команды, команда отправляется сразу, не дожидаясь эндпоинта.
+    Финальный результат той же фразы после этого подавляется (дубль не уходит в VoiceAttack).
+
+    Фразы, которые являются началом более длинной команды ("шасси" при "шасси выпустить"),
+    раньше времени не отправляются: их дожидается финальный результат.
+
+    Сравнение идёт по normalize_phrase, но отправляется текст частичного результата как есть
+    (после замен словаря, с "ё" и знаками) — тот же, что ушёл бы по финалу.
+
+    Счётчики:
+    - early_hits — отправлено по частичному результату;
+    - late_confirmations — финал совпал с отправленной командой;
+    - mismatches — финал отличается от отправленной команды (ранняя отправка была ошибкой);
+    - final_only — команда ушла только по финалу (ранняя отправка не сработала).
+    """
+
+    def __init__(self, stable_frames: int = 3):
+        self.stable_frames = max(1, int(stable_frames))
+        self._lock = threading.Lock()
+        self._phrases: frozenset = frozenset()
+        self._ambiguous: frozenset = frozenset()
+        self.phrases_version = None
+        self.reset_stats()
+        self.reset_utterance()
+
+    def reset_utterance(self):
+        self._last_partial = ""
+        self._last_text = ""
+        self._stable_count = 0
+        self._dispatched = None
+
+    def reset_stats(self):
+        with self._lock:
+            self.early_hits = 0
+            self.late_confirmations = 0
+            self.mismatches = 0
+            self.final_only = 0
+
+    def set_phrases(self, phrases, version=None):
+        """Набор известных команд; пересчитывается только при смене version."""
+        if version is not None and version == self.phrases_version:
+            return
+        phrases = frozenset(p for p in (normalize_phrase(x) for x in phrases) if p)
+        prefixes = set()
+        for phrase in phrases:
+            words = phrase.split()
+            prefixes.update(" ".join(words[:i]) for i in range(1, len(words)))
+        self._phrases = phrases
+        self._ambiguous = frozenset(prefixes & phrases)
+        self.phrases_version = version
+
+    def observe_partial(self, text: str) -> str | None:
+        """
+        Вызывается на каждый блок с частичным результатом (уже без ключевого слова).
+        Возвращает исходный текст фразы, который нужно отправить сейчас, или None.
+        """
+        phrase = normalize_phrase(text) if text else ""
+        self._last_text = text.strip() if text else ""
+        if phrase != self._last_partial:
+            self._last_partial = phrase
+            self._stable_count = 1
+        else:
+            self._stable_count += 1
+        if (self._dispatched is None and phrase and self._stable_count >= self.stable_frames
+                and phrase in self._phrases and phrase not in self._ambiguous):
+            self._dispatched = phrase
+            with self._lock:
+                self.early_hits += 1
+            return self._last_text
+        return None
+
+    def finish(self, text: str) -> bool:
+        """
+        Финальный результат высказывания. Возвращает True, если команда уже отправлена
+        по частичному результату и финал нужно подавить.
+        """
+        dispatched = self._dispatched
+        phrase = normalize_phrase(text) if text else ""
+        self.reset_utterance()
+        with self._lock:
+            if dispatched is None:
+                if phrase:
+                    self.final_only += 1
+                return False
+            if phrase == dispatched:
+                self.late_confirmations += 1
+                return True
+            self.mismatches += 1
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stable_frames": self.stable_frames,
+                "early_hits": self.early_hits,
+                "late_confirmations": self.late_confirmations,
+                "mismatches": self.mismatches,
+                "final_only": self.final_only,
+                "known_phrases": len(self._phrases),
+            }
@@ -1,7 +1,7 @@
 import json
 import threading
 import time as ttime
-from queue import Queue, Empty
+from queue import Queue, Empty, Full
 import numpy as np
 import re
 from PySide6.QtCore import Signal, QObject
@@ -15,9 +15,56 @@ import sounddevice as sd
 import noisereduce as nr
 import librosa
 import scipy.io.wavfile
-from scipy import signal
 
 from communicator import Communicator
+from STT_ring_buffer import Int16RingBuffer
+from STT_pipeline import DSPWorker, StageMetrics
+from STT_dsp import StreamingFilterChain, PolyphaseResampler
+from STT_vad import VoiceActivityGate
+from word_replacements_engine import get_word_replacements_engine
+from STT_grammar import CommandGrammar
+from STT_model_manager import VoskModelManager
+from STT_early_dispatch import EarlyDispatcher
+from STT_latency import LatencyTracker
+from STT_wakeword import WakeWordSpotter
+from STT_aec import EchoCanceller
+from STT_noise_profile import NoiseProfile, SpectralSubtractor
+from STT_google import GoogleSpeechClient, OrderedRecognitionPipeline
+from STT_whisper import WhisperSegmentDecoder, WHISPER_COMPUTE_TYPES, whisper_available, load_whisper_model
+from playback_reference import get_playback_reference
+
+# Встроенные замены STT поверх словаря пользователя
+STT_BUILTIN_REPLACEMENTS = (("пересадить на", "transfer to"),)
+
+# Модели Vosk: папка в resources/vosk -> названия в UI и фразы статуса
+VOSK_MODELS = {
+    "vosk_small": {
+        "aliases": ("vosk", "vosksmall", "vosksmallmodel"),
+        "missing": "Папка м+алой модели Воск не найдена.",
+        "loading": "Загрузка м+алой модели Воск...",
+        "loaded": "М+алая модель Воск загружена.",
+        "error": "Ошибка загрузки м+алой модели Воск.",
+    },
+    "vosk_medium": {
+        "aliases": ("voskmedium", "voskmediummodel"),
+        "missing": "Папка средней модели Воск не найдена.",
+        "loading": "Загрузка средней модели Воск. Это займёт одну-две минуты...",
+        "loaded": "Средняя модель Воск загружена.",
+        "error": "Ошибка загрузки средней модели Воск.",
+    },
+}
+
+# Whisper (CTranslate2) на CPU: название в UI и фразы статуса
+WHISPER_ALIASES = ("whisper", "whisperoffline", "whispersmall")
+WHISPER_MODEL_INFO = {
+    "missing": "Для модели Виспер нужен пакет фастер виспер.",
+    "loading": "Загрузка модели Виспер...",
+    "loaded": "Модель Виспер загружена.",
+    "error": "Ошибка загрузки модели Виспер.",
+}
+
+# Движки на общем конвейере захвата PyAudio (коллбек -> DSP -> ресемплинг -> VAD -> декодер)
+STREAM_MODEL_TYPES = ("Vosk", "Whisper")
 
 
 class SignalEmitter(QObject):
@@ -30,7 +77,12 @@ class SignalEmitter(QObject):
 class SpeechRecognitionEngine:
     def __init__(self, model_path, text_browser=None, tts_mediator=None, progress_bar=None):
         self.model_path = None  # Будет установлен в set_model
-        self.samplerate = 48000
+        self.samplerate = 48000  # Частота захвата
+        self.recognition_samplerate = 16000  # Частота распознавателя Vosk (родная для small/medium моделей)
+        self.resampler = None
+        # VAD перед декодером: в AcceptWaveform идут только сегменты речи с pre-roll
+        self.vad_enabled = False
+        self.vad = VoiceActivityGate(self.recognition_samplerate)
         self.channels = 1
         self.dtype = 'int16'
         self.format = pyaudio.paInt16
@@ -40,11 +92,38 @@ class SpeechRecognitionEngine:
         self.noise_reduction_enabled = False
         self.noise_reduction_level = 0.7
         self._echo_cancellation_enabled = False
+        # Потоковая цепочка фильтров эхо-подавления (коэффициенты и состояние между блоками)
+        self.filter_chain = StreamingFilterChain(self.samplerate)
+        # Эхоподавление по опорному сигналу озвучки TTS: "off", "reference" (адаптивный фильтр,
+        # пока он не сошёлся — полудуплекс) или "half_duplex" (распознаватель закрыт во время озвучки)
+        self.echo_reference_mode = "off"
+        self.playback_reference = get_playback_reference()
+        self.aec = EchoCanceller(self.samplerate)
+        self.echo_gated_blocks = 0
+        # Часы захвата: (отсчётов сохранено, perf_counter) из коллбека и отсчёты, взятые потребителем
+        self._capture_anchor = (0, 0.0)
+        self._captured_samples = 0
+        self._consumed_samples = 0
+        # Время начала блока: _capture_block_time — последнего взятого из захвата (поток DSP или
+        # распознавания, кто читает захват), _block_time — блока, который сейчас декодируется
+        self._capture_block_time = None
+        self._block_time = None
         self.noise_reduction_level_google = 0.0
+        # Шумоподавление по сохранённому профилю шума устройства (спектральное вычитание)
+        self.noise_profile = NoiseProfile(self.samplerate)
+        self.noise_suppressor = SpectralSubtractor(self.noise_profile)
+        self._echo_noise_suppressor = SpectralSubtractor(self.noise_profile)
+        self.noise_profile_save_interval = 60.0
+        self._noise_profile_saved_at = 0.0
+        # Свой детектор речи на частоте захвата: профиль учится только на тишине, даже без VAD перед декодером
+        self.noise_vad = VoiceActivityGate(self.samplerate)
         self.keyword_filter_enabled = False
         self.keyword = ""
         self.keyword_detected = False
         self.last_keyword_time = 0
+        # Двухступенчатое распознавание с ключевым словом: полный словарь простаивает до ключевого слова
+        self.wake_word_enabled = False
+        self.wake_word = WakeWordSpotter()
         self.text_browser = text_browser
         self.speech_browser = None
         self.tts_mediator = tts_mediator
@@ -53,17 +132,55 @@ class SpeechRecognitionEngine:
         if self.text_browser:
             self.signal_emitter.append_text.connect(self.text_browser.append)
             self.signal_emitter.clear_text.connect(self.text_browser.clear)
-        self.word_replacements = self.load_word_replacements(
-            str(Path.home() / "Saved Games" / "EDVoicePlugin" / "resources" / "word_replacements.json")
-        )
-        self.word_replacements.update({"пересадить на": "transfer to"})
+        # Общий скомпилированный словарь замен (перечитывается при изменении файла)
+        self.word_replacements = get_word_replacements_engine()
         self.voice_control_enabled = False
         self.model_type = None
+        self.vosk_model = None
         self.recognizer = None
+        # Фоновая загрузка моделей с LRU-кэшем; подмена модели без остановки распознавания
+        self.model_manager = VoskModelManager(max_models=2)
+        self._model_request = 0
+        self._loading_model_path = None
+        self._start_when_ready = False
+        self._model_ready = threading.Event()
+        # Whisper: декодирование сегментов VAD; модель грузится в фоне, как Vosk
+        self.whisper_model_name = "small"
+        self.whisper_compute_type = "int8"
+        self.whisper_threads = 0  # 0 — по числу ядер (решает CTranslate2)
+        self.whisper = WhisperSegmentDecoder(self.recognition_samplerate)
+        self.whisper_manager = VoskModelManager(max_models=1, loader=self._load_whisper_model)
+        # Режим распознавания Vosk: "open" — полный словарь, "grammar" — только фразы команд процесса
+        self.recognition_mode = "open"
+        self.command_grammar = CommandGrammar()
+        self.grammar_extra_phrases = []
+        # Ранняя отправка команд по стабильному частичному результату (по умолчанию выключена)
+        self.early_dispatch_enabled = False
+        self.early_dispatch = EarlyDispatcher()
+        # Трассировка задержки по высказываниям: начало речи -> финал -> отправка в VoiceAttack
+        self.latency = LatencyTracker()
         self.stream = None
-        self.queue = Queue()
+        self.max_queue_blocks = 64
+        self.queue = Queue(maxsize=self.max_queue_blocks)
+        # Режим захвата Vosk: "queue" — bytes в Queue, "ring" — предвыделенный кольцевой буфер
+        self.capture_mode = "queue"
+        self.ring_buffer_blocks = 64
+        self.ring_buffer = None
+        # Конвейер Vosk: захват (коллбек) -> DSP-поток -> распознаватель, у каждой стадии своя очередь и метрики
+        self.capture_metrics = StageMetrics("capture")
+        self.recognizer_metrics = StageMetrics("recognizer")
+        self.dsp_worker = DSPWorker(
+            self._process_dsp_block,
+            output_queue_size=self.max_queue_blocks,
+            block_budget_sec=0.75 * self.block_size / self.samplerate
+        )
         self.google_recognizer = sr.Recognizer()
         self.google_mic = None
+        # Google: захват не ждёт сети, фразы распознаются пулом, результаты — в порядке захвата
+        self.google_client = GoogleSpeechClient()
+        self.google_workers = 2
+        self.google_max_pending = 8
+        self.google_pipeline = None
         self.pyaudio_instance = pyaudio.PyAudio()
         self.silence_threshold = 0.01
         self.min_audio_length = 0.3
@@ -84,143 +201,59 @@ class SpeechRecognitionEngine:
                 self.tts_mediator.queue.append(f"Ошибка проверки микрофона: {e}")
                 self.tts_mediator.start_play_thread()
 
-    def set_model(self, model):
-        was_listening = self.is_listening
-        self.stop_recognition()
+    def _announce(self, text):
+        if self.tts_mediator:
+            self.tts_mediator.queue.append(text)
+            self.tts_mediator.start_play_thread()
 
+    @staticmethod
+    def _resolve_vosk_model(model):
         model_lower = model.lower().replace(" ", "")
+        for folder, info in VOSK_MODELS.items():
+            if model_lower in info["aliases"]:
+                return folder, info
+        return None, None
+
+    @staticmethod
+    def _vosk_model_path(folder):
+        # Динамический путь к папке модели
+        return str(Path(__file__).parent / "resources" / "vosk" / folder)
+
+    def preload_model(self, model):
+        """Фоновая загрузка модели заранее (при старте), без переключения распознавания."""
+        if model.lower().replace(" ", "") in WHISPER_ALIASES:
+            if whisper_available():
+                self.whisper_manager.preload(self._whisper_model_key())
+            return
+        folder, info = self._resolve_vosk_model(model)
+        if folder and os.path.exists(self._vosk_model_path(folder)):
+            self.model_manager.preload(self._vosk_model_path(folder))
 
-        if model_lower in ["vosk", "vosksmall", "vosksmallmodel"]:
-            self.model_type = "Vosk"
-            # Динамический путь к vosk_small
-            self.model_path = str(Path(__file__).parent / "resources" / "vosk" / "vosk_small")
-
-            if not os.path.exists(self.model_path):
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Папка м+алой модели Воск не найдена.")
-                    self.tts_mediator.start_play_thread()
-                self.model_type = None
-                return
-
-            try:
-                # Показываем прогресс-бар
-                if self.progress_bar:
-                    self.progress_bar.setVisible(True)
-                    self.progress_bar.setValue(0)
-
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Загрузка м+алой модели Воск...")
-                    self.tts_mediator.start_play_thread()
-
-                if self.progress_bar:
-                    self.progress_bar.setValue(30)
-
-                model_vosk = vosk.Model(self.model_path)
-
-                if self.progress_bar:
-                    self.progress_bar.setValue(70)
-
-                self.recognizer = vosk.KaldiRecognizer(model_vosk, self.samplerate)
-
-                if self.progress_bar:
-                    self.progress_bar.setValue(100)
-
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("М+алая модель Воск загружена.")
-                    self.tts_mediator.start_play_thread()
-
-                # Оставляем прогресс-бар видимым
-                if self.progress_bar:
-                    def reset_progress():
-                        ttime.sleep(1)
-                        self.progress_bar.setValue(0)
-
-                    threading.Thread(target=reset_progress, daemon=True).start()
-
-            except Exception as e:
-                self.recognizer = None
-                self.model_type = None
-                if self.progress_bar:
-                    self.progress_bar.setVisible(False)
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Ошибка загрузки м+алой модели Воск.")
-                    self.tts_mediator.start_play_thread()
-
-        elif model_lower in ["voskmedium", "voskmediummodel", "whisperoffline"]:
-            self.model_type = "Vosk"
-            # Динамический путь к vosk_medium
-            self.model_path = str(Path(__file__).parent / "resources" / "vosk" / "vosk_medium")
-
-            if not os.path.exists(self.model_path):
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Папка средней модели Воск не найдена.")
-                    self.tts_mediator.start_play_thread()
-                self.model_type = None
-                return
-
-            try:
-                # Показываем прогресс-бар
-                if self.progress_bar:
-                    self.progress_bar.setVisible(True)
-                    self.progress_bar.setValue(0)
-
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Загрузка средней модели Воск. Это займёт одну-две минуты...")
-                    self.tts_mediator.start_play_thread()
-
-                # Анимация прогресс-бара в отдельном потоке
-                stop_animation = threading.Event()
-
-                def animate_progress():
-                    progress = 0
-                    while not stop_animation.is_set() and progress < 95:
-                        progress += 1
-                        if self.progress_bar:
-                            self.progress_bar.setValue(progress)
-                        ttime.sleep(0.1)  # Обновление каждые 100мс
-
-                animation_thread = threading.Thread(target=animate_progress, daemon=True)
-                animation_thread.start()
-
-                # Загрузка модели (блокирующая операция)
-                model_vosk = vosk.Model(self.model_path)
-
-                # Останавливаем анимацию
-                stop_animation.set()
-                animation_thread.join(timeout=0.5)
-
-                if self.progress_bar:
-                    self.progress_bar.setValue(95)
-
-                self.recognizer = vosk.KaldiRecognizer(model_vosk, self.samplerate)
-
-                if self.progress_bar:
-                    self.progress_bar.setValue(100)
-
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Средняя модель Воск загружена.")
-                    self.tts_mediator.start_play_thread()
-
-                # Оставляем прогресс-бар видимым
-                if self.progress_bar:
-                    def reset_progress():
-                        ttime.sleep(1)
-                        self.progress_bar.setValue(0)
+    def wait_model_ready(self, timeout=None):
+        """
+        Ожидание окончания загрузки выбранной модели (для сервера и офлайн-прогонов без UI).
+        Ожидание завершается и при ошибке или отсутствии модели: что загружено — смотреть по model_type.
+        """
+        return self._model_ready.wait(timeout)
 
-                    threading.Thread(target=reset_progress, daemon=True).start()
+    def set_model(self, model):
+        folder, info = self._resolve_vosk_model(model)
+        if folder:
+            self._set_vosk_model(folder, info)
+            return
+        if model.lower().replace(" ", "") in WHISPER_ALIASES:
+            self._set_whisper_model()
+            return
 
-            except Exception as e:
-                stop_animation.set()
-                self.recognizer = None
-                self.model_type = None
-                if self.progress_bar:
-                    self.progress_bar.setValue(0)
-                if self.tts_mediator:
-                    self.tts_mediator.queue.append("Ошибка загрузки средней модели Воск.")
-                    self.tts_mediator.start_play_thread()
+        was_listening = self.is_listening
+        self._model_request += 1  # Отменяет ожидающую подмену модели Vosk
+        self._loading_model_path = None
+        self.stop_recognition()
 
-        elif model_lower == "googleonline":
+        model_lower = model.lower().replace(" ", "")
+        if model_lower == "googleonline":
             self.model_type = "Google Online"
+            self._model_ready.set()
             try:
                 self.google_mic = sr.Microphone(sample_rate=self.samplerate)
                 self.google_recognizer.energy_threshold = 50
@@ -244,23 +277,141 @@ class SpeechRecognitionEngine:
         if was_listening and self.model_type:
             self.start_recognition()
 
-    def load_word_replacements(self, file_path):
-        if not os.path.exists(file_path):
-            try:
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                default_replacements = {"пересадить на": "transfer to"}
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(default_replacements, f, indent=4, ensure_ascii=False)
-                return default_replacements
-            except Exception:
-                return {}
+    def _set_vosk_model(self, folder, info):
+        """
+        Загрузка модели Vosk в фоне. Распознавание продолжает работать на текущей модели
+        и переключается на новую, когда она готова.
+        """
+        model_path = self._vosk_model_path(folder)
+        if not os.path.exists(model_path):
+            self._announce(info["missing"])
+            self._model_ready.set()  # Ждать нечего
+            return
+        self._load_model_in_background(self.model_manager, model_path, info, self._activate_vosk_model)
+
+    def _set_whisper_model(self):
+        """Whisper грузится так же, как Vosk: в фоне, с подменой без остановки захвата."""
+        if not whisper_available():
+            self._announce(WHISPER_MODEL_INFO["missing"])
+            return
+        self._load_model_in_background(
+            self.whisper_manager, self._whisper_model_key(), WHISPER_MODEL_INFO, self._activate_whisper_model
+        )
+
+    def _whisper_model_key(self):
+        # Ключ кэша: смена типа вычислений или числа потоков — это другая загруженная модель
+        return f"{self.whisper_model_name}|{self.whisper_compute_type}|{self.whisper_threads}"
+
+    @staticmethod
+    def _load_whisper_model(key):
+        model, compute_type, threads = key.rsplit("|", 2)
+        return load_whisper_model(model, compute_type, int(threads))
+
+    def configure_whisper(self, model=None, beam_size=None, cpu_threads=None, compute_type=None,
+                          partial_interval_sec=None):
+        """
+        Настройки Whisper. beam_size и частичные результаты применяются сразу,
+        смена модели, типа вычислений или потоков перезагружает активную модель в фоне.
+        """
+        if compute_type is not None and compute_type not in WHISPER_COMPUTE_TYPES:
+            raise ValueError(f"Неизвестный тип вычислений Whisper: {compute_type}")
+        if beam_size is not None:
+            self.whisper.beam_size = max(1, int(beam_size))
+        if partial_interval_sec is not None:
+            self.whisper.partial_interval_sec = max(0.0, float(partial_interval_sec))
+        key = self._whisper_model_key()
+        if model:
+            self.whisper_model_name = str(model)
+        if cpu_threads is not None:
+            self.whisper_threads = max(0, int(cpu_threads))
+        if compute_type is not None:
+            self.whisper_compute_type = compute_type
+        if self.model_type == "Whisper" and self._whisper_model_key() != key:
+            self._set_whisper_model()
+
+    def _load_model_in_background(self, manager, key, info, activate):
+        self._model_request += 1
+        request_id = self._model_request
+        future = manager.load_async(key)
+        stop_animation = threading.Event()
+        if not future.done():
+            # Ждущие wait_model_ready() дождутся новой модели, а не вернутся по прежней
+            self._model_ready.clear()
+            self._loading_model_path = key
+            self._announce(info["loading"])
+            if self.progress_bar:
+                self.progress_bar.setVisible(True)
+                self.progress_bar.setValue(0)
+
+                # Анимация прогресс-бара в отдельном потоке
+                def animate_progress():
+                    progress = 0
+                    while not stop_animation.is_set() and progress < 95:
+                        progress += 1
+                        self.progress_bar.setValue(progress)
+                        ttime.sleep(0.1)  # Обновление каждые 100мс
+
+                threading.Thread(target=animate_progress, daemon=True).start()
+
+        future.add_done_callback(
+            lambda f: self._on_model_loaded(f, request_id, key, info, stop_animation, activate)
+        )
+
+    def _activate_vosk_model(self, model_vosk, model_path):
+        recognizer = self._create_recognizer(model_vosk)
+        self.vosk_model = model_vosk
+        self.model_path = model_path
+        self.recognizer = recognizer
+        return "Vosk"
+
+    def _activate_whisper_model(self, model_whisper, key):
+        self.whisper.model = model_whisper
+        self.whisper.reset(self.recognition_samplerate)
+        if self.recognition_mode == "grammar":
+            self.whisper.set_prompt(self.command_grammar.phrases())
+        return "Whisper"
+
+    def _on_model_loaded(self, future, request_id, key, info, stop_animation, activate):
+        stop_animation.set()
+        if request_id != self._model_request:
+            return  # Пользователь уже выбрал другую модель; эта остаётся в кэше
+        self._loading_model_path = None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError:
-            return {}
+            model_type = activate(future.result(), key)
+        except Exception:
+            self._start_when_ready = False
+            self._model_ready.set()  # Загрузка закончилась: ждущие работают с прежней моделью или её отсутствием
+            if self.progress_bar:
+                self.progress_bar.setValue(0)
+            self._announce(info["error"])
+            return
+
+        # Горячая подмена: поток захвата подхватит новый декодер (Vosk или Whisper) со следующего блока,
+        # другой движок (Google) нужно перезапустить
+        switch_pipeline = self.is_listening and self.model_type not in STREAM_MODEL_TYPES
+        restart = self._start_when_ready or switch_pipeline
+        if switch_pipeline:
+            self.stop_recognition()
+        self._start_when_ready = False
+        self.model_type = model_type
+        self._model_ready.set()
+
+        if self.progress_bar:
+            self.progress_bar.setValue(100)
+
+            # Оставляем прогресс-бар видимым
+            def reset_progress():
+                ttime.sleep(1)
+                self.progress_bar.setValue(0)
+
+            threading.Thread(target=reset_progress, daemon=True).start()
+        self._announce(info["loaded"])
+
+        if restart:
+            self.start_recognition()
+
+    def apply_word_replacements(self, text):
+        return self.word_replacements.apply(text, STT_BUILTIN_REPLACEMENTS)
 
     def set_speech_browser(self, speech_browser):
         self.speech_browser = speech_browser
@@ -269,12 +420,96 @@ class SpeechRecognitionEngine:
         self.keyword = keyword.lower()
         self.keyword_detected = False
         self.last_keyword_time = 0
+        if self.recognition_mode == "grammar":
+            self._swap_recognizer()
+
+    def _create_recognizer(self, model):
+        if self.recognition_mode == "grammar":
+            grammar = self.command_grammar.grammar_json(self.keyword, self.grammar_extra_phrases)
+            return vosk.KaldiRecognizer(model, self.recognition_samplerate, grammar)
+        return vosk.KaldiRecognizer(model, self.recognition_samplerate)
+
+    def _swap_recognizer(self):
+        """Новый распознаватель на уже загруженной модели; поток распознавания подхватит его со следующего блока."""
+        # Whisper грамматику не поддерживает: фразы команд идут подсказкой словаря
+        self.whisper.set_prompt(self.command_grammar.phrases() if self.recognition_mode == "grammar" else ())
+        if self.vosk_model is None:
+            return
+        try:
+            self.recognizer = self._create_recognizer(self.vosk_model)
+        except Exception as e:
+            print(f"[STT] Ошибка пересоздания распознавателя: {e}")
+
+    def set_recognition_mode(self, mode, extra_phrases=None):
+        """Режим Vosk: "open" или "grammar" (фразы команд активного процесса + [unk])."""
+        if mode not in ("open", "grammar"):
+            raise ValueError(f"Неизвестный режим распознавания: {mode}")
+        if extra_phrases is not None:
+            self.grammar_extra_phrases = list(extra_phrases)
+        self.recognition_mode = mode
+        self._swap_recognizer()
+
+    def set_active_process(self, process_name):
+        """Смена процесса меняет только грамматику, модель не перезагружается."""
+        if self.command_grammar.set_process(process_name) and self.recognition_mode == "grammar":
+            self._swap_recognizer()
+
+    def refresh_command_grammar(self):
+        """Вызывается после добавления/переименования команд: перечитываются только изменённые файлы."""
+        if self.command_grammar.refresh() and self.recognition_mode == "grammar":
+            self._swap_recognizer()
 
     def enable_keyword_filter(self, state):
         self.keyword_filter_enabled = state
         self.keyword_detected = False
         self.last_keyword_time = 0
 
+    def enable_wake_word(self, state, window_sec=None):
+        """Спотинг ключевого слова перед полным декодером (работает при включённом фильтре ключевого слова)."""
+        if window_sec is not None:
+            self.wake_word.window_sec = float(window_sec)
+        self.wake_word.reset()
+        self.wake_word_enabled = bool(state)
+
+    def get_wake_word_stats(self):
+        return self.wake_word.stats()
+
+    def _wake_word_gating(self):
+        if not (self.wake_word_enabled and self.keyword_filter_enabled) or self.model_type != "Vosk":
+            return False
+        try:
+            return self.wake_word.ensure(self.vosk_model, self.recognition_samplerate, self.keyword)
+        except Exception as e:
+            print(f"[STT] Спотинг ключевого слова недоступен: {e}")
+            self.wake_word_enabled = False
+            return False
+
+    def set_echo_reference_mode(self, mode, delay_ms=None):
+        if mode not in ("off", "reference", "half_duplex"):
+            raise ValueError(f"Неизвестный режим эхоподавления: {mode}")
+        if delay_ms is not None:
+            self.aec.delay_ms = float(delay_ms)
+        self.aec.reset()
+        self.echo_reference_mode = mode
+        self.playback_reference.enabled = mode != "off"
+
+    def get_aec_stats(self):
+        return {
+            **self.aec.stats(),
+            "mode": self.echo_reference_mode,
+            "playing": self.playback_reference.is_playing(),
+            "gated_blocks": self.echo_gated_blocks,
+        }
+
+    def _echo_gate_active(self):
+        """Полудуплекс: блок не идёт в распознаватель, пока звучит озвучка (и AEC не справляется)."""
+        if self.echo_reference_mode == "off":
+            return False
+        if self.echo_reference_mode == "reference" and self.aec.converged:
+            return False
+        at_time = self._block_time if self._block_time is not None else ttime.perf_counter()
+        return self.playback_reference.is_playing(at_time)
+
     def enable_noise_reduction(self, state):
         self.noise_reduction_enabled = state
 
@@ -290,20 +525,107 @@ class SpeechRecognitionEngine:
     def enable_voice_control(self, state):
         self.voice_control_enabled = state
 
+    def enable_early_dispatch(self, state, stable_frames=None):
+        if stable_frames is not None:
+            self.early_dispatch.stable_frames = max(1, int(stable_frames))
+        self.early_dispatch.reset_utterance()
+        self.early_dispatch_enabled = bool(state)
+
+    def get_early_dispatch_stats(self):
+        return self.early_dispatch.stats()
+
+    def get_latency_stats(self):
+        return self.latency.stats()
+
+    def get_latency_traces(self, count=10):
+        return self.latency.recent(count)
+
+    def get_latency_report(self):
+        return self.latency.format_report()
+
+    def reset_latency_stats(self):
+        self.latency.reset()
+
+    def set_capture_mode(self, mode, ring_buffer_blocks=None):
+        """Переключает режим захвата Vosk ("queue" или "ring"). Применяется при следующем запуске потока."""
+        if mode not in ("queue", "ring"):
+            raise ValueError(f"Неизвестный режим захвата: {mode}")
+        if ring_buffer_blocks:
+            self.ring_buffer_blocks = int(ring_buffer_blocks)
+        was_listening = self.is_listening
+        if was_listening:
+            self.stop_recognition()
+        self.capture_mode = mode
+        if was_listening:
+            self.start_recognition()
+
+    def get_capture_stats(self):
+        """Счётчики переполнения/опустошения кольцевого буфера (пусто в режиме queue)."""
+        if self.ring_buffer is None:
+            return {"mode": self.capture_mode, "pending_blocks": self.queue.qsize()}
+        return {"mode": self.capture_mode, **self.ring_buffer.stats()}
+
+    def set_dsp_budget(self, budget_ms):
+        """Бюджет времени DSP на блок; при систематическом превышении стадия уходит в pass-through."""
+        self.dsp_worker.block_budget_sec = max(0.001, float(budget_ms) / 1000.0)
+
+    def get_pipeline_stats(self):
+        """Метрики стадий конвейера Vosk: захват, DSP, распознаватель."""
+        return {
+            "capture": {**self.capture_metrics.snapshot(), **self.get_capture_stats()},
+            "dsp": {**self.dsp_worker.stats(), "active": self.dsp_worker.is_running},
+            "recognizer": self.recognizer_metrics.snapshot(),
+        }
+
+    def set_recognition_rate(self, rate):
+        """
+        Частота, на которой работает KaldiRecognizer (захват остаётся на self.samplerate).
+        Модель не перезагружается: пересоздаётся только распознаватель.
+        """
+        rate = int(rate)
+        was_listening = self.is_listening
+        if was_listening:
+            self.stop_recognition()
+        self.recognition_samplerate = rate
+        self._swap_recognizer()
+        if was_listening:
+            self.start_recognition()
+
+    def enable_vad(self, state):
+        self.vad_enabled = state
+        self.vad.reset()
+
+    def set_vad_thresholds(self, **values):
+        """Пороги VAD (см. VoiceActivityGate.thresholds())."""
+        self.vad.set_thresholds(**values)
+        self.noise_vad.set_thresholds(**values)
+
+    def get_vad_state(self):
+        """Текущие пороги VAD и живое значение вероятности речи для настройки."""
+        return self.vad.state()
+
+    def set_filter_chain(self, stages):
+        """Задаёт стадии цепочки эхо-подавления (см. StreamingFilterChain), состояние сбрасывается."""
+        self.filter_chain = StreamingFilterChain(self.samplerate, stages)
+
     def apply_echo_cancellation(self, data):
         if not self._echo_cancellation_enabled:
             return data
         try:
-            if len(data) <= 4096:
+            if not len(data):
                 return data
-            if np.any(np.isnan(data)) or np.any(np.isinf(data)):
+            if data.dtype != np.int16 and (np.any(np.isnan(data)) or np.any(np.isinf(data))):
                 return data
-            sos = signal.butter(10, [200, 500], btype='bandstop', fs=self.samplerate, output='sos')
-            data_filtered = signal.sosfilt(sos, data.astype(np.float32))
+            data_filtered = self.filter_chain.process(data)
             if len(data_filtered) < 4096:
                 return np.clip(data_filtered, -32768, 32767).astype(np.int16)
             if np.any(np.isnan(data_filtered)) or np.any(np.isinf(data_filtered)):
                 return np.clip(data_filtered, -32768, 32767).astype(np.int16)
+            if self.noise_profile.ready:
+                data_filtered = self._echo_noise_suppressor.reduce(
+                    np.clip(data_filtered, -32768, 32767).astype(np.int16), 0.8
+                )
+                return data_filtered
             data_filtered = nr.reduce_noise(
                 y=data_filtered,
                 sr=self.samplerate,
@@ -320,24 +642,103 @@ class SpeechRecognitionEngine:
             return data
 
     def audio_callback_vosk(self, in_data, frame_count, time_info, status):
+        # Только захват: DSP выполняется в отдельном потоке (self.dsp_worker)
         try:
+            start = ttime.perf_counter()
             data = np.frombuffer(in_data, dtype=np.int16)
             if len(data) <= 1024:
                 return (None, pyaudio.paContinue)
-            data = self.apply_echo_cancellation(data)
-            if self.noise_reduction_enabled and len(data) > 1024:
-                if np.any(np.isnan(data)) or np.any(np.isinf(data)):
-                    return (None, pyaudio.paContinue)
-                data = nr.reduce_noise(y=data.flatten(), sr=self.samplerate, prop_decrease=self.noise_reduction_level)
-                data = np.clip(data, -32768, 32767).astype(np.int16)
-            self.queue.put(bytes(data))
+            if self.ring_buffer is not None:
+                stored = self.ring_buffer.write(data)
+            else:
+                try:
+                    self.queue.put_nowait(bytes(data))
+                    stored = True
+                except Full:
+                    stored = False
+            if stored:
+                self._captured_samples += len(data)
+                self._capture_anchor = (self._captured_samples, ttime.perf_counter())
+                self.capture_metrics.record(ttime.perf_counter() - start)
+            else:
+                self.capture_metrics.record_drop()
             return (None, pyaudio.paContinue)
         except Exception:
             return (None, pyaudio.paContinue)
 
+    def _process_dsp_block(self, block):
+        data = np.frombuffer(block, dtype=np.int16)
+        if self.echo_reference_mode == "reference" and self._capture_block_time is not None:
+            data = self.aec.process(data, self._capture_block_time, self.playback_reference)
+        data = self.apply_echo_cancellation(data)
+        if self.noise_reduction_enabled and len(data):
+            # Профиль шума учится на тишине (решение VAD по кадрам блока) и применяется маской по кадрам
+            speech_active = self.noise_vad.is_speech(data)
+            data = self.noise_suppressor.process(
+                data, self.noise_reduction_level, learn=True, speech_active=speech_active
+            )
+            if not self.noise_profile.ready and len(data) > 1024:
+                # Профиля ещё нет (первый запуск на устройстве): прежняя оценка шума по блоку
+                data = nr.reduce_noise(y=data.flatten(), sr=self.samplerate, prop_decrease=self.noise_reduction_level)
+                data = np.clip(data, -32768, 32767).astype(np.int16)
+            now = ttime.monotonic()
+            if self.noise_profile.dirty and now - self._noise_profile_saved_at >= self.noise_profile_save_interval:
+                self._noise_profile_saved_at = now
+                self.noise_profile.save()
+        return data.tobytes()
+
+    def _dsp_needed(self):
+        return (self.noise_reduction_enabled or self._echo_cancellation_enabled
+                or self.echo_reference_mode == "reference")
+
+    def _input_device_name(self):
+        try:
+            return self.pyaudio_instance.get_default_input_device_info()["name"]
+        except Exception:
+            return "default"
+
+    def get_noise_profile_state(self):
+        return {
+            "device": self.noise_profile.device,
+            "ready": self.noise_profile.ready,
+            "frames": self.noise_profile.frames,
+        }
+
+    def reset_noise_profile(self):
+        """Забыть профиль шума текущего устройства (переучится на ближайшей тишине)."""
+        self.noise_profile.reset()
+
+    def _reset_vosk_pipeline(self):
+        """Состояние потоковых стадий перед новым потоком (ресемплер, VAD, фильтры)."""
+        if self.recognition_samplerate != self.samplerate:
+            self.resampler = PolyphaseResampler(self.samplerate, self.recognition_samplerate)
+        else:
+            self.resampler = None
+        self.vad.reset(self.recognition_samplerate)
+        self.whisper.reset(self.recognition_samplerate)
+        self.wake_word.reset()
+        self.filter_chain.reset()
+        self.aec.reset()
+        self.noise_suppressor.reset()
+        self.noise_vad.reset(self.samplerate)
+        device = self._input_device_name()
+        if device != self.noise_profile.device:
+            self.noise_profile.save()
+            self.noise_profile.load(device)
+        self._capture_anchor = (0, 0.0)
+        self._captured_samples = 0
+        self._consumed_samples = 0
+        self._capture_block_time = None
+        self._block_time = None
+
     def start_stream(self):
         try:
-            if self.model_type == "Vosk":
+            if self.model_type in STREAM_MODEL_TYPES:
+                self._reset_vosk_pipeline()
+                if self.capture_mode == "ring":
+                    self.ring_buffer = Int16RingBuffer(self.block_size, self.ring_buffer_blocks)
+                else:
+                    self.ring_buffer = None
                 self.stream = self.pyaudio_instance.open(
                     format=self.format,
                     channels=self.channels,
@@ -367,27 +768,19 @@ class SpeechRecognitionEngine:
     def recognize_loop(self):
         while self.is_listening:
             try:
-                if self.model_type == "Vosk":
+                if self.model_type in STREAM_MODEL_TYPES:
                     self.start_stream()
                     while self.is_listening and self.stream:
                         try:
-                            data = self.queue.get(timeout=1.0)
-                            if self.recognizer.AcceptWaveform(data):
-                                result = json.loads(self.recognizer.Result())["text"].lower()
-                                if result:
-                                    for wrong, correct in self.word_replacements.items():
-                                        result = result.replace(wrong, correct)
-                                    self.handle_result(result)
-                            else:
-                                partial = json.loads(self.recognizer.PartialResult())
-                                if partial.get("partial") and partial["partial"] != getattr(self, 'last_partial_result', ''):
-                                    partial_result = partial["partial"].lower()
-                                    for wrong, correct in self.word_replacements.items():
-                                        partial_result = partial_result.replace(wrong, correct)
-                                    self.handle_partial(partial_result)
-                                    self.last_partial_result = partial["partial"]
+                            data = self._next_audio_block(timeout=1.0)
+                            try:
+                                self._decode_block(data)
+                            finally:
+                                self._release_audio_block(data)
                         except Empty:
                             continue
+                    self.dsp_worker.stop()
+                    self.dsp_worker.clear()
                     if self.stream:
                         self.stream.stop_stream()
                         self.stream.close()
@@ -400,22 +793,25 @@ class SpeechRecognitionEngine:
                         with self.google_mic as source:
                             self.google_recognizer.adjust_for_ambient_noise(source, duration=0.1)
                             self.google_recognizer.energy_threshold = 50
-                            while self.is_listening:
-                                try:
-                                    audio = self.google_recognizer.listen(source, timeout=2, phrase_time_limit=5)
-                                    result = self.google_recognizer.recognize_google(audio, language="ru-RU").lower()
-                                    if result:
-                                        for wrong, correct in self.word_replacements.items():
-                                            result = result.replace(wrong, correct)
-                                        self.handle_result(result)
-                                except sr.WaitTimeoutError:
-                                    pass
-                                except sr.UnknownValueError:
-                                    pass
-                                except sr.RequestError:
-                                    if self.tts_mediator:
-                                        self.tts_mediator.queue.append("Ошибка Гугл Эй-Пи ай.")
-                                        self.tts_mediator.start_play_thread()
+                            self.google_pipeline = OrderedRecognitionPipeline(
+                                self.google_client.recognize,
+                                self._handle_google_result,
+                                workers=self.google_workers,
+                                max_pending=self.google_max_pending,
+                                on_error=self._on_google_error
+                            )
+                            try:
+                                while self.is_listening:
+                                    try:
+                                        audio = self.google_recognizer.listen(source, timeout=2, phrase_time_limit=5)
+                                    except sr.WaitTimeoutError:
+                                        continue
+                                    # Микрофон сразу слушает дальше, запрос идёт в пуле.
+                                    # Время захвата — начало фразы: конец записи минус её длительность
+                                    duration = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+                                    self.google_pipeline.submit(audio, ttime.perf_counter() - duration)
+                            finally:
+                                self.google_pipeline.shutdown()
                     except OSError as e:
                         self.google_mic = None
                         ttime.sleep(1)
@@ -426,7 +822,7 @@ class SpeechRecognitionEngine:
 
             except Exception:
                 if self.stream:
-                    if self.model_type == "Vosk":
+                    if self.model_type in STREAM_MODEL_TYPES:
                         self.stream.stop_stream()
                         self.stream.close()
                     else:
@@ -435,6 +831,200 @@ class SpeechRecognitionEngine:
                     self.stream = None
                 ttime.sleep(1)
 
+    def _handle_google_result(self, result, capture_time):
+        # Вызывается по одному и в порядке захвата; начало речи — время начала записанной фразы
+        self.latency.mark("voice_start", capture_time)
+        self.latency.mark("final")
+        self.handle_result(self.apply_word_replacements(result.lower()))
+        self.latency.complete()
+
+    def _on_google_error(self, error):
+        if isinstance(error, sr.RequestError):
+            self._announce("Ошибка Гугл Эй-Пи ай.")
+        else:
+            print(f"[STT] Ошибка распознавания Google: {error}")
+
+    def configure_google(self, workers=None, timeout=None, max_pending=None):
+        """
+        Параллельность и таймаут запросов Google. Число потоков и очередь применяются
+        со следующего запуска распознавания, таймаут — сразу.
+        """
+        if workers is not None:
+            self.google_workers = max(1, int(workers))
+        if max_pending is not None:
+            self.google_max_pending = max(1, int(max_pending))
+        if timeout is not None:
+            self.google_client.timeout = float(timeout)
+
+    def get_google_stats(self):
+        return self.google_pipeline.stats() if self.google_pipeline else {}
+
+    def _capture_get(self, timeout):
+        """Блок стадии захвата: bytes из Queue или memoryview слота кольцевого буфера."""
+        if self.ring_buffer is None:
+            block = self.queue.get(timeout=timeout)
+            self._note_block_time()
+            return block
+        block = self.ring_buffer.acquire_block(timeout=timeout)
+        if block is None:
+            raise Empty
+        self._note_block_time()
+        return block
+
+    def _note_block_time(self):
+        # Время начала блока по часам захвата: всё, что сохранено после него, ещё не прочитано
+        captured, anchor_time = self._capture_anchor
+        if anchor_time:
+            self._capture_block_time = anchor_time - (captured - self._consumed_samples) / self.samplerate
+        self._consumed_samples += self.block_size
+
+    def _capture_release(self):
+        if self.ring_buffer is not None:
+            self.ring_buffer.release_block()
+
+    def _next_audio_block(self, timeout):
+        """
+        Следующий блок для распознавателя.
+        При включённом эхо/шумоподавлении блоки идут через DSP-поток, иначе — напрямую из захвата
+        (в режиме ring без копирования). Переключение делает только поток распознавания,
+        поэтому у стадии захвата всегда один потребитель.
+        """
+        if self._dsp_needed():
+            if not self.dsp_worker.is_running:
+                # Время захвата блока идёт через очередь DSP вместе с ним: поток DSP уже читает следующие
+                self.dsp_worker.start(self._capture_get, self._capture_release, lambda: self._capture_block_time)
+            data, self._block_time = self.dsp_worker.get_stamped(timeout=timeout)
+            return data
+        if self.dsp_worker.is_running:
+            self.dsp_worker.stop()
+        # Сначала дочитываем уже обработанные блоки, чтобы не потерять хвост фразы
+        try:
+            data, self._block_time = self.dsp_worker.get_stamped_nowait()
+            return data
+        except Empty:
+            pass
+        data = self._capture_get(timeout)
+        self._block_time = self._capture_block_time
+        return data
+
+    def _release_audio_block(self, data):
+        # memoryview приходит только напрямую из кольцевого буфера; выход DSP — bytes
+        if isinstance(data, memoryview):
+            self._capture_release()
+
+    def _decode_block(self, data):
+        """Блок захвата -> (ресемплинг) -> (VAD) -> (ключевое слово) -> декодер."""
+        if self._echo_gate_active():
+            self.echo_gated_blocks += 1
+            return
+        if self.resampler is not None:
+            # Децимация до частоты модели: Kaldi обрабатывает в 3 раза меньше отсчётов
+            data = self.resampler.process_int16(np.frombuffer(data, dtype=np.int16))
+        wake_gating = self._wake_word_gating()
+        # Whisper декодирует только целые сегменты речи, поэтому VAD для него включён всегда
+        vad_on = self.vad_enabled or self.model_type == "Whisper"
+        if not vad_on and not wake_gating:
+            self._accept_and_handle(data)
+            return
+        samples = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.int16)
+        if vad_on:
+            chunks, segment_ended = self.vad.process(samples)
+            if chunks:
+                self.latency.mark("voice_start", overwrite=False)
+                if self.vad.last_voiced:
+                    self.latency.mark("voice_end")
+        else:
+            chunks, segment_ended = [samples], False
+        if wake_gating:
+            gated = []
+            for chunk in chunks:
+                passed, window_closed = self.wake_word.process(chunk)
+                gated.extend(passed)
+                # Окно команды закрылось: финализируем то, что успел услышать основной распознаватель
+                segment_ended = segment_ended or window_closed
+            chunks = gated
+        if self.model_type == "Whisper":
+            self._decode_whisper(chunks, segment_ended)
+            return
+        for chunk in chunks:
+            self._accept_and_handle(chunk)
+        if segment_ended:
+            # Речь закончилась: финализируем сразу, не дожидаясь эндпоинта Kaldi на тишине
+            self._handle_final_json(self.recognizer.FinalResult())
+
+    def _decode_whisper(self, chunks, segment_ended):
+        start = ttime.perf_counter()
+        for chunk in chunks:
+            partial = self.whisper.accept(chunk)
+            if partial and partial != getattr(self, 'last_partial_result', ''):
+                self.handle_partial(self.apply_word_replacements(partial))
+                self.last_partial_result = partial
+        if segment_ended or self.whisper.segment_full:
+            self.latency.mark("final")
+            self._handle_final_text(self.whisper.finish())
+            self.last_partial_result = ""
+        self.recognizer_metrics.record(ttime.perf_counter() - start)
+
+    def _accept_waveform(self, data):
+        if not isinstance(data, bytes):
+            # cffi принимает для const char* только bytes или cdata: оборачиваем буфер без копирования
+            ffi = getattr(vosk, "_ffi", None)
+            data = ffi.from_buffer(data) if ffi is not None else bytes(data)
+        return self.recognizer.AcceptWaveform(data)
+
+    def _accept_and_handle(self, data):
+        start = ttime.perf_counter()
+        accepted = self._accept_waveform(data)
+        self.recognizer_metrics.record(ttime.perf_counter() - start)
+        if accepted:
+            self._handle_final_json(self.recognizer.Result())
+        else:
+            partial = json.loads(self.recognizer.PartialResult())
+            if partial.get("partial") and partial["partial"] != getattr(self, 'last_partial_result', ''):
+                if not self.vad_enabled:
+                    # Без VAD началом и концом речи считаются первое и последнее изменение гипотезы
+                    self.latency.mark("voice_start", overwrite=False)
+                    self.latency.mark("voice_end")
+                partial_result = self.apply_word_replacements(self._strip_unknown(partial["partial"].lower()))
+                self.handle_partial(partial_result)
+                self.last_partial_result = partial["partial"]
+                if self.wake_word_enabled:
+                    self.wake_word.extend()
+            if self.early_dispatch_enabled and self.voice_control_enabled:
+                self._check_early_dispatch(partial.get("partial", ""))
+
+    def _check_early_dispatch(self, partial_text):
+        # Стабильность считается по блокам, поэтому проверка идёт на каждом AcceptWaveform
+        if self.early_dispatch.phrases_version != self.command_grammar.version:
+            self.early_dispatch.set_phrases(self.command_grammar.phrases(), self.command_grammar.version)
+        text = self.apply_word_replacements(self._strip_unknown(partial_text.lower())) if partial_text else ""
+        command = self._strip_keyword(text) if text else None
+        phrase = self.early_dispatch.observe_partial(command or "")
+        if phrase and self.model_type:
+            if self.speech_browser:
+                self.signal_emitter.speech_text.emit(phrase)
+            self.latency.mark("filtered", overwrite=False)
+            self._send_command(phrase)
+
+    def _handle_final_json(self, raw):
+        self.latency.mark("final")
+        self._handle_final_text(json.loads(raw).get("text", ""))
+
+    def _handle_final_text(self, text):
+        result = self._strip_unknown(text.lower())
+        if result:
+            self.handle_result(self.apply_word_replacements(result))
+        elif self.early_dispatch_enabled:
+            self.early_dispatch.finish("")
+        self.latency.complete()
+
+    @staticmethod
+    def _strip_unknown(text):
+        # В режиме грамматики всё, что не команда, приходит как [unk]
+        if "[unk]" not in text:
+            return text
+        return " ".join(word for word in text.split() if word != "[unk]")
+
     def handle_partial(self, partial_result):
         if self.speech_browser:
             self.signal_emitter.speech_text.emit(partial_result)
@@ -442,29 +1032,42 @@ class SpeechRecognitionEngine:
         # Частичные результаты только отображаются, но НЕ отправляются в VoiceAttack
         # чтобы избежать дублирования с финальным результатом
 
-    def handle_result(self, result):
-        processed_result = result
+    def _strip_keyword(self, result):
+        # None — ключевое слово включено, но не прозвучало
         if self.keyword_filter_enabled:
             if self.keyword in result:
-                processed_result = result.replace(self.keyword, "").strip()
-            else:
-                return
+                return result.replace(self.keyword, "").strip()
+            return None
+        return result
+
+    def handle_result(self, result):
+        processed_result = self._strip_keyword(result)
+        self.latency.mark("filtered", overwrite=False)
+        if self.early_dispatch_enabled and self.early_dispatch.finish(processed_result or ""):
+            return  # Команда уже отправлена по частичному результату
         if processed_result and self.model_type:
             if self.speech_browser:
                 self.signal_emitter.speech_text.emit(processed_result)
             if self.voice_control_enabled:
-                try:
-                    processed_result = re.sub(r'[.!?]+$', '', processed_result.strip())
-                    for wrong, correct in self.word_replacements.items():
-                        processed_result = processed_result.replace(wrong, correct)
-                    self.communicator.send_to_va(processed_result)
-                    self.signal_emitter.sent_text.emit(processed_result)
-                except Exception:
-                    if self.tts_mediator:
-                        self.tts_mediator.queue.append("Ошибка отправки команды в В+ойс атак.")
-                        self.tts_mediator.start_play_thread()
+                self._send_command(processed_result)
+
+    def _send_command(self, processed_result):
+        try:
+            # Замены словаря уже применены к результату до handle_result
+            processed_result = re.sub(r'[.!?]+$', '', processed_result.strip())
+            # Время "sent" ставит поток отправки после sendto; при ранней отправке — её, а не подавленный финал
+            self.communicator.send_to_va(processed_result, on_sent=self.latency.deferred_mark("sent"))
+            self.signal_emitter.sent_text.emit(processed_result)
+        except Exception:
+            if self.tts_mediator:
+                self.tts_mediator.queue.append("Ошибка отправки команды в В+ойс атак.")
+                self.tts_mediator.start_play_thread()
 
     def start_recognition(self):
+        if not self.model_type and self._loading_model_path:
+            # Модель ещё грузится в фоне: запустим распознавание, когда она будет готова
+            self._start_when_ready = True
+            return
         if not self.model_type:
             if self.tts_mediator:
                 self.tts_mediator.queue.append("Модель распознавания не выбрана.")
@@ -487,12 +1090,15 @@ class SpeechRecognitionEngine:
 
     def stop_recognition(self):
         self.is_listening = False
+        self._start_when_ready = False
+        self.noise_profile.save()
         if self.recognition_thread:
             self.recognition_thread.join(timeout=2.0)
             self.recognition_thread = None
         self.communicator.close()
+        self.dsp_worker.stop()
         if self.stream:
-            if self.model_type == "Vosk":
+            if self.model_type in STREAM_MODEL_TYPES:
                 self.stream.stop_stream()
                 self.stream.close()
             else:
@@ -501,9 +1107,7 @@ class SpeechRecognitionEngine:
             self.stream = None
 
     def reload_word_replacements(self):
-        self.word_replacements = self.load_word_replacements(
-            str(Path.home() / "Saved Games" / "EDVoicePlugin" / "resources" / "word_replacements.json")
-        )
+        self.word_replacements.reload()
 
     @property
     def echo_cancellation_enabled(self):
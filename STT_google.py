@@ -0,0 +1,131 @@
+# filename: STT_google.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import speech_recognition as sr
+
+
+class GoogleSpeechClient:
+    """
+    Запрос к Google через sr.Recognizer.recognize_google (ключ — библиотечный по умолчанию)
+    со своим таймаутом на запрос (operation_timeout отдельного распознавателя, не того, что слушает микрофон).
+    Ошибки — исключения speech_recognition: UnknownValueError и RequestError.
+    """
+
+    def __init__(self, language: str = "ru-RU", timeout: float = 5.0):
+        self.language = language
+        self._recognizer = sr.Recognizer()
+        self.timeout = timeout
+
+    @property
+    def timeout(self) -> float:
+        return self._recognizer.operation_timeout
+
+    @timeout.setter
+    def timeout(self, value: float):
+        self._recognizer.operation_timeout = value
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        return self._recognizer.recognize_google(audio, language=self.language)
+
+
+class OrderedRecognitionPipeline:
+    """
+    Распознавание фраз пулом потоков с выдачей результатов в порядке захвата.
+
+    Захват не ждёт сети: submit() только нумерует фразу и ставит её в пул из workers потоков.
+    Готовые результаты копятся, пока не распознаны все более ранние фразы, затем уходят
+    в on_result(text, capture_time) строго по порядку (под замком, по одному).
+    Ошибка или пустой результат тоже закрывают свой номер, поэтому одна медленная фраза
+    задерживает следующие не дольше таймаута запроса. Если в работе уже max_pending фраз,
+    новая отбрасывается: лучше пропустить фразу, чем копить отставание.
+    После shutdown() результаты запросов, ещё бывших в сети, отбрасываются.
+    """
+
+    def __init__(self,
+                 recognize: Callable[[sr.AudioData], str],
+                 on_result: Callable[[str, float], None],
+                 workers: int = 2,
+                 max_pending: int = 8,
+                 on_error: Callable[[Exception], None] | None = None):
+        self.recognize = recognize
+        self.on_result = on_result
+        self.on_error = on_error
+        self.max_pending = max(1, int(max_pending))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="GoogleSTT")
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+        self._next_seq = 0
+        self._next_delivery = 0
+        self._ready: dict[int, tuple[str | None, float]] = {}
+        self._closed = False
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self.reordered = 0
+
+    def submit(self, audio: sr.AudioData, capture_time: float) -> int | None:
+        """Фраза в пул; None — отброшена из-за перегрузки."""
+        with self._lock:
+            if self._closed:
+                return None
+            if self._next_seq - self._next_delivery >= self.max_pending:
+                self.dropped += 1
+                return None
+            seq = self._next_seq
+            self._next_seq += 1
+            self.submitted += 1
+        self._executor.submit(self._run, seq, audio, capture_time)
+        return seq
+
+    def _run(self, seq: int, audio: sr.AudioData, capture_time: float):
+        text = None
+        try:
+            text = self.recognize(audio)
+        except sr.UnknownValueError:
+            pass
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            if self.on_error is not None and not self._closed:
+                self.on_error(e)
+        self._complete(seq, text, capture_time)
+
+    def _complete(self, seq: int, text: str | None, capture_time: float):
+        with self._lock:
+            if seq != self._next_delivery:
+                self.reordered += 1
+            self._ready[seq] = (text, capture_time)
+        # Выдача под отдельным замком: on_result не вызывается параллельно и не обгоняет порядок
+        with self._deliver_lock:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        self._ready.clear()
+                        return
+                    item = self._ready.pop(self._next_delivery, None)
+                    if item is None:
+                        return
+                    self._next_delivery += 1
+                text, captured_at = item
+                if text:
+                    try:
+                        self.on_result(text, captured_at)
+                    except Exception as e:
+                        print(f"[STT] Ошибка обработки результата Google: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "in_flight": self._next_seq - self._next_delivery,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "reordered": self.reordered,
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,110 @@
+# filename: STT_grammar.py
+import json
+import os
+import re
+import threading
+
+BASE_PATH = os.path.expanduser("~/Saved Games/EDVoicePlugin/Processes")
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Фраза в виде, который понимает грамматика Vosk: нижний регистр, только слова."""
+    phrase = phrase.lower().replace('ё', 'е')
+    phrase = re.sub(r"[^\w\s'-]", " ", phrase)
+    return " ".join(phrase.split())
+
+
+class CommandGrammar:
+    """
+    Грамматика распознавания из библиотеки команд ProgramBuilder.
+
+    Собирает массивы "phrases" из Processes/<процесс>/<группа>/*.json активного процесса.
+    Перестроение инкрементальное: JSON-файлы перечитываются только при изменении mtime,
+    удалённые файлы выбрасываются из кэша.
+    """
+
+    def __init__(self, base_path: str | None = None):
+        self.base_path = base_path or BASE_PATH
+        self.process_name: str | None = None
+        self._lock = threading.Lock()
+        self._files: dict[str, tuple[int, list[str]]] = {}  # путь -> (mtime_ns, фразы)
+        self.version = 0
+
+    def set_process(self, process_name: str | None) -> bool:
+        """Переключает процесс. Возвращает True, если набор фраз изменился."""
+        with self._lock:
+            if process_name != self.process_name:
+                self.process_name = process_name
+                self._files = {}
+        return self.refresh()
+
+    def _command_files(self):
+        if not self.process_name:
+            return
+        process_path = os.path.join(self.base_path, self.process_name)
+        try:
+            groups = [entry for entry in os.scandir(process_path) if entry.is_dir()]
+        except OSError:
+            return
+        for group in groups:
+            try:
+                entries = list(os.scandir(group.path))
+            except OSError:
+                continue
+            for entry in entries:
+                # <группа>/<группа>.json — служебный файл порядка команд, не команда
+                if entry.is_file() and entry.name.endswith('.json') and entry.name != f"{group.name}.json":
+                    yield entry
+
+    @staticmethod
+    def _read_phrases(path: str) -> list[str]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return []
+        phrases = data.get('phrases', []) if isinstance(data, dict) else []
+        return [p for p in (normalize_phrase(str(x)) for x in phrases) if p]
+
+    def refresh(self) -> bool:
+        """Перечитывает изменённые файлы команд. Возвращает True, если набор фраз изменился."""
+        with self._lock:
+            before = self._phrase_set()
+            seen = set()
+            for entry in self._command_files():
+                seen.add(entry.path)
+                try:
+                    mtime = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._files.get(entry.path)
+                if cached is None or cached[0] != mtime:
+                    self._files[entry.path] = (mtime, self._read_phrases(entry.path))
+            for path in list(self._files):
+                if path not in seen:
+                    del self._files[path]
+            changed = self._phrase_set() != before
+            if changed:
+                self.version += 1
+            return changed
+
+    def _phrase_set(self) -> set:
+        return {phrase for _, phrases in self._files.values() for phrase in phrases}
+
+    def phrases(self) -> list[str]:
+        with self._lock:
+            return sorted(self._phrase_set())
+
+    def grammar_json(self, keyword: str = "", extra_phrases=()) -> str:
+        """
+        JSON-список для KaldiRecognizer: команды, ключевое слово (отдельно и перед командами),
+        служебные фразы и "[unk]" для всего остального.
+        """
+        commands = self.phrases()
+        keyword = normalize_phrase(keyword) if keyword else ""
+        grammar = set(commands)
+        grammar.update(p for p in (normalize_phrase(x) for x in extra_phrases) if p)
+        if keyword:
+            grammar.add(keyword)
+            grammar.update(f"{keyword} {phrase}" for phrase in commands)
+        return json.dumps(sorted(grammar) + ["[unk]"], ensure_ascii=False)
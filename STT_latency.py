@@ -0,0 +1,125 @@
+# filename: STT_latency.py
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Точки трассировки высказывания в порядке прохождения
+TRACE_POINTS = ("voice_start", "voice_end", "final", "filtered", "sent")
+
+# Интервалы для статистики: имя -> (от, до)
+TRACE_INTERVALS = {
+    "speech": ("voice_start", "voice_end"),          # длительность речи
+    "endpointing": ("voice_end", "final"),           # ожидание финала Kaldi после речи
+    "filtering": ("final", "filtered"),              # замены словаря и ключевое слово
+    "sending": ("filtered", "sent"),                 # очередь и отправка UDP (поток отправки)
+    "speech_end_to_send": ("voice_end", "sent"),     # задержка, которую слышит пользователь
+    "total": ("voice_start", "sent"),
+}
+
+
+class LatencyTracker:
+    """
+    Трассировка задержки "начало речи -> UDP в VoiceAttack" по высказываниям.
+
+    Отметки — time.perf_counter() в момент, когда блок доходит до декодера (время в очереди
+    захвата видно в get_pipeline_stats). Завершённые трассы хранятся в скользящем окне
+    (window последних высказываний), по нему считаются перцентили каждого интервала.
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._traces = deque(maxlen=window)
+        self._current: dict[str, float] = {}
+        self.discarded = 0
+
+    def mark(self, point: str, timestamp: float | None = None, overwrite: bool = True):
+        """Отметка точки текущего высказывания. overwrite=False — только первая отметка."""
+        if point not in TRACE_POINTS:
+            raise ValueError(f"Неизвестная точка трассировки: {point}")
+        with self._lock:
+            if overwrite or point not in self._current:
+                self._current[point] = timestamp if timestamp is not None else time.perf_counter()
+
+    def deferred_mark(self, point: str):
+        """
+        Отметка, которую поставит другой поток позже (например, поток отправки UDP):
+        callable(timestamp) пишет в трассу текущего высказывания, даже если оно уже закрыто.
+        Ставится только первая отметка точки.
+        """
+        if point not in TRACE_POINTS:
+            raise ValueError(f"Неизвестная точка трассировки: {point}")
+        with self._lock:
+            trace = self._current
+
+        def mark(timestamp: float | None = None):
+            with self._lock:
+                trace.setdefault(point, timestamp if timestamp is not None else time.perf_counter())
+        return mark
+
+    def has(self, point: str) -> bool:
+        with self._lock:
+            return point in self._current
+
+    def complete(self):
+        """Закрывает текущее высказывание; трасса без начала речи не учитывается."""
+        with self._lock:
+            trace, self._current = self._current, {}
+            if "voice_start" in trace and "final" in trace:
+                self._traces.append(trace)
+            elif trace:
+                self.discarded += 1
+
+    def reset(self):
+        with self._lock:
+            self._traces.clear()
+            self._current = {}
+            self.discarded = 0
+
+    def recent(self, count: int = 10) -> list[dict]:
+        """Последние трассы: интервалы в миллисекундах."""
+        with self._lock:
+            traces = list(self._traces)[-count:]
+        return [self._intervals_ms(trace) for trace in traces]
+
+    @staticmethod
+    def _intervals_ms(trace: dict) -> dict:
+        result = {}
+        for name, (start, end) in TRACE_INTERVALS.items():
+            if start in trace and end in trace:
+                result[name] = (trace[end] - trace[start]) * 1000.0
+        return result
+
+    def stats(self) -> dict:
+        """Перцентили p50/p90/p99 (мс) по каждому интервалу в скользящем окне."""
+        with self._lock:
+            traces = list(self._traces)
+            discarded = self.discarded
+        values = {name: [] for name in TRACE_INTERVALS}
+        for trace in traces:
+            for name, value in self._intervals_ms(trace).items():
+                values[name].append(value)
+        intervals = {}
+        for name, samples in values.items():
+            if not samples:
+                continue
+            p50, p90, p99 = np.percentile(samples, (50, 90, 99))
+            intervals[name] = {
+                "count": len(samples),
+                "p50_ms": float(p50),
+                "p90_ms": float(p90),
+                "p99_ms": float(p99),
+                "max_ms": float(max(samples)),
+            }
+        return {"utterances": len(traces), "discarded": discarded, "intervals": intervals}
+
+    def format_report(self) -> str:
+        stats = self.stats()
+        lines = [f"Высказываний: {stats['utterances']} (отброшено: {stats['discarded']})"]
+        for name in TRACE_INTERVALS:
+            item = stats["intervals"].get(name)
+            if item:
+                lines.append(f"{name:<20} n={item['count']:<4} p50={item['p50_ms']:7.1f}  "
+                             f"p90={item['p90_ms']:7.1f}  p99={item['p99_ms']:7.1f}  max={item['max_ms']:7.1f} мс")
+        return "\n".join(lines)
@@ -0,0 +1,80 @@
+# filename: STT_model_manager.py
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import vosk
+
+
+class VoskModelManager:
+    """
+    Фоновая загрузка моделей Vosk с LRU-кэшем загруженных моделей.
+
+    Особенности:
+    - load_async() возвращает Future; повторный запрос той же модели во время загрузки
+      получает тот же Future (модель не грузится дважды).
+    - Последние max_models моделей остаются в памяти: возврат к ним мгновенный.
+    - Загрузка идёт в одном фоновом потоке, чтобы две средние модели не грузились одновременно.
+    """
+
+    def __init__(self, max_models: int = 2, loader: Callable[[str], object] | None = None):
+        self.max_models = max(1, int(max_models))
+        self._loader = loader or vosk.Model
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, object] = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VoskModelLoader")
+
+    def get_cached(self, model_path: str):
+        with self._lock:
+            model = self._cache.get(model_path)
+            if model is not None:
+                self._cache.move_to_end(model_path)
+            return model
+
+    def is_loading(self, model_path: str) -> bool:
+        with self._lock:
+            return model_path in self._pending
+
+    def load_async(self, model_path: str) -> Future:
+        """Future с vosk.Model; для модели из кэша — уже завершённый."""
+        with self._lock:
+            model = self._cache.get(model_path)
+            if model is not None:
+                self._cache.move_to_end(model_path)
+                future = Future()
+                future.set_result(model)
+                return future
+            future = self._pending.get(model_path)
+            if future is None:
+                future = self._executor.submit(self._load, model_path)
+                self._pending[model_path] = future
+            return future
+
+    def preload(self, model_path: str) -> Future:
+        """Загрузка заранее (например, при старте до построения UI)."""
+        return self.load_async(model_path)
+
+    def _load(self, model_path: str):
+        try:
+            model = self._loader(model_path)
+        except Exception:
+            with self._lock:
+                self._pending.pop(model_path, None)
+            raise
+        with self._lock:
+            self._pending.pop(model_path, None)
+            self._cache[model_path] = model
+            self._cache.move_to_end(model_path)
+            while len(self._cache) > self.max_models:
+                evicted, _ = self._cache.popitem(last=False)
+                print(f"[STT] Модель выгружена из кэша: {evicted}")
+        return model
+
+    def cached_models(self) -> list[str]:
+        with self._lock:
+            return list(self._cache)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,180 @@
+# filename: STT_noise_profile.py
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def _default_profiles_path() -> str:
+    return os.path.join(os.path.expanduser('~'), 'Saved Games', 'EDVoicePlugin', 'resources', 'noise_profiles.json')
+
+
+class NoiseProfile:
+    """
+    Скользящий спектральный профиль стационарного шума (средняя мощность по бинам STFT).
+
+    Обновляется только по кадрам тишины: когда VAD не видит речь и энергия кадра
+    не выше уровня шума больше чем на speech_margin_db. Профиль хранится по устройствам
+    ввода в noise_profiles.json, поэтому после перезапуска калибровка не нужна.
+    """
+
+    def __init__(self, samplerate: int = 48000, n_fft: int = 512, alpha: float = 0.02,
+                 min_seconds: float = 5.0, speech_margin_db: float = 6.0, file_path: str | None = None):
+        self.samplerate = samplerate
+        self.n_fft = n_fft
+        self.alpha = alpha
+        # Профиль готов после min_seconds тишины (кадры STFT с шагом n_fft/2)
+        self.min_frames = max(1, int(min_seconds * samplerate / (n_fft // 2)))
+        self.speech_margin_db = speech_margin_db
+        self.file_path = file_path or _default_profiles_path()
+        self.device = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.power = np.zeros(self.n_fft // 2 + 1)
+            self.frames = 0
+            self.dirty = False
+
+    @property
+    def ready(self) -> bool:
+        return self.frames >= self.min_frames
+
+    def update(self, frame_power: np.ndarray, speech_active: bool = False):
+        """frame_power — мощность кадров (кадры x бины). Кадры с речью в профиль не попадают."""
+        if speech_active or not len(frame_power):
+            return
+        with self._lock:
+            if self.frames:
+                noise_level = float(np.sum(self.power))
+                frame_levels = np.sum(frame_power, axis=1)
+                quiet = frame_levels <= noise_level * 10.0 ** (self.speech_margin_db / 10.0)
+                if not self.ready:
+                    quiet |= frame_levels <= np.min(frame_levels) * 2.0  # Профиль ещё учится
+                frame_power = frame_power[quiet]
+                if not len(frame_power):
+                    return
+            else:
+                self.power = frame_power[0].copy()
+            # Экспоненциальное сглаживание по всем кадрам блока за одну операцию
+            weights = self.alpha * (1.0 - self.alpha) ** np.arange(len(frame_power) - 1, -1, -1)
+            self.power = (1.0 - self.alpha) ** len(frame_power) * self.power + weights @ frame_power
+            self.frames += len(frame_power)
+            self.dirty = True
+
+    # ---- Хранение по устройствам ----
+
+    def _read_all(self) -> dict:
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def load(self, device: str) -> bool:
+        """Профиль устройства из файла. Возвращает True, если подходящий профиль найден."""
+        self.device = device
+        self.reset()
+        entry = self._read_all().get(device)
+        if not entry or entry.get("samplerate") != self.samplerate or entry.get("n_fft") != self.n_fft:
+            return False
+        power = np.asarray(entry.get("power", []), dtype=np.float64)
+        if power.shape != self.power.shape:
+            return False
+        with self._lock:
+            self.power = power
+            self.frames = max(int(entry.get("frames", 0)), self.min_frames)
+        return True
+
+    def save(self):
+        if not self.device or not self.ready or not self.dirty:
+            return
+        data = self._read_all()
+        with self._lock:
+            data[self.device] = {
+                "samplerate": self.samplerate,
+                "n_fft": self.n_fft,
+                "frames": self.frames,
+                "power": [float(x) for x in self.power],
+            }
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"[STT] Не удалось сохранить профиль шума: {e}")
+
+
+class SpectralSubtractor:
+    """
+    Потоковое спектральное вычитание по профилю шума.
+
+    STFT с окном sqrt-Ханна и перекрытием 50% (точное восстановление), все кадры блока
+    обрабатываются одной операцией numpy. Маска усиления на бин:
+        G = sqrt(max(1 - over_subtraction * N / |X|^2, 0)),  итог: 1 - strength * (1 - G),
+    где strength — та же доля подавления, что prop_decrease у noisereduce.
+    Выход задержан на n_fft/2 отсчётов; между блоками хранится хвост входа и перекрытия.
+    """
+
+    def __init__(self, profile: NoiseProfile, over_subtraction: float = 2.0):
+        self.profile = profile
+        self.over_subtraction = over_subtraction
+        self.n_fft = profile.n_fft
+        self.hop = self.n_fft // 2
+        self.window = np.sqrt(np.hanning(self.n_fft + 1)[:-1])
+        self.reset()
+
+    def reset(self):
+        self._input_tail = np.zeros(self.n_fft - self.hop)
+        self._overlap = np.zeros(self.hop)
+
+    def _frames(self, buffer: np.ndarray) -> np.ndarray:
+        count = (len(buffer) - self.n_fft) // self.hop + 1
+        if count <= 0:
+            return np.zeros((0, self.n_fft))
+        return np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop][:count]
+
+    def process(self, data: np.ndarray, strength: float = 0.7, learn: bool = False,
+                speech_active: bool = False) -> np.ndarray:
+        """
+        int16 -> int16. learn=True — заодно обновить профиль по тихим кадрам блока.
+        Пока профиль не готов, сигнал проходит без изменений (но с той же задержкой).
+        """
+        buffer = np.concatenate((self._input_tail, data.astype(np.float64)))
+        frames = self._frames(buffer)
+        count = len(frames)
+        if not count:
+            self._input_tail = buffer
+            return np.zeros(0, dtype=np.int16)
+        self._input_tail = buffer[count * self.hop:]
+
+        spectra = np.fft.rfft(frames * self.window, axis=1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        if learn:
+            self.profile.update(power, speech_active)
+        if self.profile.ready:
+            noise = self.profile.power
+            gain = np.sqrt(np.maximum(1.0 - self.over_subtraction * noise / (power + 1e-10), 0.0))
+            spectra *= 1.0 - strength * (1.0 - gain)
+        out_frames = np.fft.irfft(spectra, self.n_fft, axis=1) * self.window
+
+        out = np.zeros((count + 1) * self.hop)
+        out_view = out.reshape(count + 1, self.hop)
+        out_view[:count] += out_frames[:, :self.hop]
+        out_view[1:] += out_frames[:, self.hop:]
+        out[:self.hop] += self._overlap
+        self._overlap = out[count * self.hop:].copy()
+        return np.clip(out[:count * self.hop], -32768, 32767).astype(np.int16)
+
+    def reduce(self, data: np.ndarray, strength: float = 0.7) -> np.ndarray:
+        """Целый буфер (фраза) без потокового состояния: длина выхода равна длине входа."""
+        saved = self._input_tail, self._overlap
+        self.reset()
+        padded = np.concatenate((data, np.zeros(self.n_fft, dtype=data.dtype)))
+        out = self.process(padded, strength)[self.hop:self.hop + len(data)]
+        self._input_tail, self._overlap = saved
+        return out
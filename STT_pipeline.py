@@ -0,0 +1,196 @@
+# filename: STT_pipeline.py
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import Callable
+
+
+class StageMetrics:
+    """Счётчики одной стадии конвейера: время обработки блока, ожидание в очереди, потери."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.blocks = 0
+        self.dropped = 0
+        self.total_sec = 0.0
+        self.last_sec = 0.0
+        self.max_sec = 0.0
+        self.waits = 0
+        self.total_wait_sec = 0.0
+        self.max_wait_sec = 0.0
+
+    def record(self, elapsed: float):
+        with self._lock:
+            self.blocks += 1
+            self.total_sec += elapsed
+            self.last_sec = elapsed
+            if elapsed > self.max_sec:
+                self.max_sec = elapsed
+
+    def record_wait(self, wait: float):
+        """Время, которое блок провёл в выходной очереди стадии до потребителя."""
+        with self._lock:
+            self.waits += 1
+            self.total_wait_sec += wait
+            if wait > self.max_wait_sec:
+                self.max_wait_sec = wait
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.total_sec / self.blocks if self.blocks else 0.0
+            avg_wait = self.total_wait_sec / self.waits if self.waits else 0.0
+            return {
+                "blocks": self.blocks,
+                "dropped": self.dropped,
+                "avg_ms": avg * 1000.0,
+                "last_ms": self.last_sec * 1000.0,
+                "max_ms": self.max_sec * 1000.0,
+                "avg_wait_ms": avg_wait * 1000.0,
+                "max_wait_ms": self.max_wait_sec * 1000.0,
+            }
+
+
+class DSPWorker:
+    """
+    Отдельный поток DSP между захватом и распознавателем.
+
+    Поток данных:
+    1. Забирает блок у стадии захвата через source(timeout) и освобождает его release()
+    2. Обрабатывает process(block) -> bytes (эхо/шумоподавление)
+    3. Кладёт результат в ограниченную выходную очередь (при переполнении блок теряется и считается)
+       вместе с меткой stamp(), снятой сразу после source (например, время захвата блока)
+
+    Если обработка блока несколько раз подряд превышает block_budget_sec, стадия
+    переходит в режим "pass-through" (блоки идут без обработки) и через recovery_sec
+    пробует обрабатывать снова.
+    """
+
+    def __init__(self,
+                 process: Callable[[object], bytes],
+                 output_queue_size: int = 32,
+                 block_budget_sec: float = 0.024,
+                 overload_limit: int = 3,
+                 recovery_sec: float = 5.0):
+        self.process = process
+        self.output_queue: Queue = Queue(maxsize=max(1, int(output_queue_size)))
+        self.block_budget_sec = float(block_budget_sec)
+        self.overload_limit = max(1, int(overload_limit))
+        self.recovery_sec = float(recovery_sec)
+        self.metrics = StageMetrics("dsp")
+        self.passthrough = False
+        self.passthrough_switches = 0
+        self._passthrough_since = 0.0
+        self._over_budget = 0
+        self._source = None
+        self._release = None
+        self._stamp = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source: Callable[[float], object], release: Callable[[], None] | None = None,
+              stamp: Callable[[], object] | None = None):
+        if self.is_running:
+            return
+        self._source = source
+        self._release = release
+        self._stamp = stamp
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="STT_DSPWorker", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout: float = 1.0):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=join_timeout)
+        self._thread = None
+
+    def get(self, timeout: float | None = None) -> bytes:
+        """Следующий обработанный блок. Бросает queue.Empty по таймауту."""
+        return self.get_stamped(timeout)[0]
+
+    def get_nowait(self) -> bytes:
+        return self.get_stamped_nowait()[0]
+
+    def get_stamped(self, timeout: float | None = None) -> tuple[bytes, object]:
+        """(блок, метка stamp() этого блока). Бросает queue.Empty по таймауту."""
+        enqueued_at, data, stamp = self.output_queue.get(timeout=timeout)
+        self.metrics.record_wait(time.perf_counter() - enqueued_at)
+        return data, stamp
+
+    def get_stamped_nowait(self) -> tuple[bytes, object]:
+        enqueued_at, data, stamp = self.output_queue.get_nowait()
+        self.metrics.record_wait(time.perf_counter() - enqueued_at)
+        return data, stamp
+
+    def clear(self):
+        while True:
+            try:
+                self.output_queue.get_nowait()
+            except Empty:
+                return
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics.snapshot(),
+            "queue_size": self.output_queue.qsize(),
+            "queue_capacity": self.output_queue.maxsize,
+            "budget_ms": self.block_budget_sec * 1000.0,
+            "passthrough": self.passthrough,
+            "passthrough_switches": self.passthrough_switches,
+        }
+
+    def _update_passthrough(self, elapsed: float):
+        if elapsed > self.block_budget_sec:
+            self._over_budget += 1
+            if self._over_budget >= self.overload_limit and not self.passthrough:
+                self.passthrough = True
+                self.passthrough_switches += 1
+                self._passthrough_since = time.monotonic()
+                print(f"[STT DSP] Превышен бюджет {self.block_budget_sec * 1000:.0f} мс, режим pass-through")
+        else:
+            self._over_budget = 0
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                block = self._source(0.1)
+            except Empty:
+                continue
+            if block is None:
+                continue
+            stamp = self._stamp() if self._stamp else None
+            try:
+                if self.passthrough and time.monotonic() - self._passthrough_since >= self.recovery_sec:
+                    self.passthrough = False
+                    self._over_budget = 0
+                start = time.perf_counter()
+                if self.passthrough:
+                    data = bytes(block)
+                else:
+                    try:
+                        data = self.process(block)
+                    except Exception as e:
+                        print(f"[STT DSP] Ошибка обработки блока: {e}")
+                        data = bytes(block)
+                    self._update_passthrough(time.perf_counter() - start)
+                elapsed = time.perf_counter() - start
+            finally:
+                if self._release:
+                    self._release()
+            try:
+                self.output_queue.put_nowait((time.perf_counter(), data, stamp))
+                self.metrics.record(elapsed)
+            except Full:
+                self.metrics.record_drop()
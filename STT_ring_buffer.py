@@ -0,0 +1,84 @@
+# filename: STT_ring_buffer.py
+import threading
+import numpy as np
+
+
+class Int16RingBuffer:
+    """
+    Кольцевой буфер int16 фиксированной ёмкости для передачи аудиоблоков
+    из коллбека PortAudio в поток распознавания.
+
+    Особенности:
+    - Вся память выделяется один раз при создании (ёмкость в блоках).
+    - Один писатель (коллбек) и один читатель (recognize_loop): каждый курсор
+      изменяет только свой поток, поэтому блокировки на горячем пути не нужны.
+    - Читатель получает memoryview слота без копирования и обязан вызвать
+      release_block() после обработки.
+    - Переполнение (декодер не успевает) не растит очередь, а считается в overruns,
+      блок отбрасывается. В underruns считаются только ожидания, истёкшие без данных
+      (обычное ожидание следующего коллбека не в счёт).
+    """
+
+    def __init__(self, block_size: int, capacity_blocks: int = 64):
+        self.block_size = int(block_size)
+        self.capacity_blocks = max(2, int(capacity_blocks))
+        self._samples = np.zeros(self.capacity_blocks * self.block_size, dtype=np.int16)
+        self._slots = self._samples.reshape(self.capacity_blocks, self.block_size)
+        raw = memoryview(self._samples).cast('B')
+        slot_bytes = self.block_size * self._samples.itemsize
+        self._views = [raw[i * slot_bytes:(i + 1) * slot_bytes] for i in range(self.capacity_blocks)]
+        self._lengths = [0] * self.capacity_blocks
+        # Монотонные курсоры: write меняет только писатель, read — только читатель
+        self._write_index = 0
+        self._read_index = 0
+        self._data_ready = threading.Event()
+        self.overruns = 0
+        self.underruns = 0
+
+    def write(self, data) -> bool:
+        """Копирует блок в свободный слот. Возвращает False при переполнении."""
+        if self._write_index - self._read_index >= self.capacity_blocks:
+            self.overruns += 1
+            return False
+        slot = self._write_index % self.capacity_blocks
+        count = min(len(data), self.block_size)
+        self._slots[slot, :count] = data[:count]
+        self._lengths[slot] = count
+        self._write_index += 1
+        self._data_ready.set()
+        return True
+
+    def acquire_block(self, timeout: float | None = None):
+        """Возвращает memoryview очередного блока или None, если данных нет за timeout."""
+        if self._read_index == self._write_index:
+            self._data_ready.clear()
+            # Повторная проверка: писатель мог успеть между сравнением и clear()
+            if self._read_index == self._write_index and not self._data_ready.wait(timeout):
+                self.underruns += 1
+                return None
+            if self._read_index == self._write_index:
+                return None
+        slot = self._read_index % self.capacity_blocks
+        return self._views[slot][:self._lengths[slot] * self._samples.itemsize]
+
+    def release_block(self):
+        """Освобождает слот, полученный через acquire_block()."""
+        if self._read_index < self._write_index:
+            self._read_index += 1
+
+    def clear(self):
+        """Сбрасывает содержимое (вызывать только при остановленном потоке записи)."""
+        self._read_index = self._write_index
+        self._data_ready.clear()
+
+    @property
+    def pending_blocks(self) -> int:
+        return self._write_index - self._read_index
+
+    def stats(self) -> dict:
+        return {
+            "capacity_blocks": self.capacity_blocks,
+            "pending_blocks": self.pending_blocks,
+            "overruns": self.overruns,
+            "underruns": self.underruns,
+        }
@@ -0,0 +1,228 @@
+# filename: STT_vad.py
+from collections import deque
+
+import numpy as np
+
+
+class PrerollBuffer:
+    """Предвыделенный кольцевой буфер int16 с последними samples отсчётами."""
+
+    def __init__(self, samples: int):
+        self._data = np.zeros(max(1, int(samples)), dtype=np.int16)
+        self._pos = 0
+        self._fill = 0
+
+    def clear(self):
+        self._pos = 0
+        self._fill = 0
+
+    def push(self, samples: np.ndarray):
+        size = len(self._data)
+        if len(samples) >= size:
+            self._data[:] = samples[-size:]
+            self._pos = 0
+            self._fill = size
+            return
+        end = self._pos + len(samples)
+        if end <= size:
+            self._data[self._pos:end] = samples
+        else:
+            split = size - self._pos
+            self._data[self._pos:] = samples[:split]
+            self._data[:end - size] = samples[split:]
+        self._pos = end % size
+        self._fill = min(size, self._fill + len(samples))
+
+    def drain(self) -> list:
+        """Содержимое по порядку (1–2 представления буфера) и очистка."""
+        if not self._fill:
+            return []
+        size = len(self._data)
+        start = (self._pos - self._fill) % size
+        self._fill = 0
+        if start < self._pos:
+            return [self._data[start:self._pos]]
+        return [part for part in (self._data[start:], self._data[:self._pos]) if len(part)]
+
+
+class VoiceActivityGate:
+    """
+    Детектор речи перед KaldiRecognizer.AcceptWaveform.
+
+    Блок делится на кадры (frame_ms), для всех кадров сразу считаются:
+    - энергия (дБ от полной шкалы) относительно адаптивного уровня шума,
+    - спектральная плоскостность (шум вентилятора/шипение ~1, голос заметно меньше),
+    - частота переходов через ноль (глухие согласные при малой энергии).
+
+    В декодер уходят только блоки с речью, плюс pre-roll (последние preroll_ms до начала речи)
+    и hangover (hangover_ms после последнего голосового блока). Окончание сегмента
+    сообщается отдельно, чтобы вызвать FinalResult() без ожидания тишины в декодере.
+    """
+
+    def __init__(self,
+                 samplerate: int = 16000,
+                 energy_threshold_db: float = -50.0,
+                 snr_threshold_db: float = 9.0,
+                 flatness_max: float = 0.5,
+                 zcr_fricative: float = 0.25,
+                 min_voiced_ratio: float = 0.3,
+                 hangover_ms: float = 400.0,
+                 preroll_ms: float = 300.0,
+                 frame_ms: float = 10.0,
+                 noise_window_sec: float = 3.0,
+                 noise_rise_db_per_sec: float = 3.0):
+        self.energy_threshold_db = energy_threshold_db
+        self.snr_threshold_db = snr_threshold_db
+        self.flatness_max = flatness_max
+        self.zcr_fricative = zcr_fricative
+        self.min_voiced_ratio = min_voiced_ratio
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.frame_ms = frame_ms
+        self.noise_window_sec = noise_window_sec
+        self.noise_rise_db_per_sec = noise_rise_db_per_sec
+        self.reset(samplerate)
+
+    def reset(self, samplerate: int | None = None):
+        if samplerate:
+            self.samplerate = int(samplerate)
+        self.frame_len = max(16, int(self.samplerate * self.frame_ms / 1000.0))
+        self._preroll = PrerollBuffer(self.samplerate * self.preroll_ms / 1000.0)
+        self._hangover_left = 0
+        self.noise_floor_db = -60.0
+        # Минимальная статистика: низкий перцентиль энергии блоков за последние noise_window_sec
+        self._noise_history = deque()
+        self._noise_history_sec = 0.0
+        self.speech_probability = 0.0
+        self.in_speech = False
+        self.last_voiced = False
+        self.segments = 0
+        self.voiced_samples = 0
+        self.total_samples = 0
+
+    def thresholds(self) -> dict:
+        return {
+            "energy_threshold_db": self.energy_threshold_db,
+            "snr_threshold_db": self.snr_threshold_db,
+            "flatness_max": self.flatness_max,
+            "zcr_fricative": self.zcr_fricative,
+            "min_voiced_ratio": self.min_voiced_ratio,
+            "hangover_ms": self.hangover_ms,
+            "preroll_ms": self.preroll_ms,
+        }
+
+    def set_thresholds(self, **values):
+        for name, value in values.items():
+            if name not in self.thresholds():
+                raise ValueError(f"Неизвестный параметр VAD: {name}")
+            setattr(self, name, float(value))
+        if "preroll_ms" in values:
+            self.reset()
+
+    def state(self) -> dict:
+        return {
+            **self.thresholds(),
+            "speech_probability": self.speech_probability,
+            "in_speech": self.in_speech,
+            "noise_floor_db": self.noise_floor_db,
+            "segments": self.segments,
+            "voiced_ratio": self.voiced_samples / self.total_samples if self.total_samples else 0.0,
+        }
+
+    def _frame_probabilities(self, samples: np.ndarray) -> np.ndarray:
+        n_frames = len(samples) // self.frame_len
+        if n_frames == 0:
+            frames = samples.astype(np.float32)[None, :]
+        else:
+            frames = samples[:n_frames * self.frame_len].astype(np.float32).reshape(n_frames, self.frame_len)
+        power = np.mean(frames * frames, axis=1)
+        energy_db = 10.0 * np.log10(power / (32768.0 * 32768.0) + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-10
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+
+        margin = energy_db - (self.noise_floor_db + self.snr_threshold_db)
+        prob = 1.0 / (1.0 + np.exp(-margin / 2.0))
+        # Широкополосный стационарный шум ослабляем, но глухие согласные (высокий ZCR) оставляем
+        noisy = (flatness > self.flatness_max) & (zcr < self.zcr_fricative)
+        prob = np.where(noisy, prob * 0.5, prob)
+        prob = np.where(energy_db < self.energy_threshold_db, 0.0, prob)
+
+        # Адаптация уровня шума по "тихим" кадрам
+        quiet = prob < 0.5
+        if np.any(quiet):
+            level = float(np.mean(energy_db[quiet]))
+            self.noise_floor_db += 0.05 * (level - self.noise_floor_db)
+        self.noise_floor_db = min(self.noise_floor_db, float(np.min(energy_db)))
+        self._track_noise_minimum(energy_db, len(samples) / self.samplerate)
+        return prob
+
+    def _track_noise_minimum(self, energy_db: np.ndarray, block_sec: float):
+        """
+        Подъём уровня шума, если фон вырос (раскрутился вентилятор): по "тихим" кадрам он
+        подняться не может — при возросшем шуме тихих кадров нет. Минимум низкого перцентиля
+        энергии за окно почти всегда попадает в паузы речи, поэтому речь его не поднимает.
+        """
+        self._noise_history.append((block_sec, float(np.percentile(energy_db, 10))))
+        self._noise_history_sec += block_sec
+        while self._noise_history_sec - self._noise_history[0][0] >= self.noise_window_sec:
+            self._noise_history_sec -= self._noise_history.popleft()[0]
+        if self._noise_history_sec < self.noise_window_sec * 0.5:
+            return  # Окно ещё не набралось
+        estimate = min(level for _, level in self._noise_history)
+        if estimate > self.noise_floor_db:
+            self.noise_floor_db = min(estimate, self.noise_floor_db + self.noise_rise_db_per_sec * block_sec)
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """
+        Только решение по кадрам, без pre-roll и сегментов: речь в блоке или ещё hangover после неё.
+        Для стадий до декодера (обучение профиля шума) — отдельный экземпляр, не тот, что у process().
+        """
+        if not len(samples):
+            return self.in_speech
+        prob = self._frame_probabilities(samples)
+        self.speech_probability = 0.7 * self.speech_probability + 0.3 * float(np.mean(prob))
+        self.last_voiced = float(np.mean(prob >= 0.5)) >= self.min_voiced_ratio
+        if self.last_voiced:
+            self.in_speech = True
+            self._hangover_left = int(self.samplerate * self.hangover_ms / 1000.0)
+        elif self.in_speech:
+            self._hangover_left -= len(samples)
+            self.in_speech = self._hangover_left > 0
+        return self.in_speech
+
+    def process(self, samples: np.ndarray) -> tuple[list, bool]:
+        """
+        Возвращает (куски для декодера, сегмент_завершён).
+        Куски pre-roll — представления внутреннего буфера: использовать до следующего вызова.
+        """
+        if not len(samples):
+            return [], False
+        prob = self._frame_probabilities(samples)
+        voiced_ratio = float(np.mean(prob >= 0.5))
+        self.speech_probability = 0.7 * self.speech_probability + 0.3 * float(np.mean(prob))
+        self.total_samples += len(samples)
+        voiced = voiced_ratio >= self.min_voiced_ratio
+        self.last_voiced = voiced
+        hangover_samples = int(self.samplerate * self.hangover_ms / 1000.0)
+
+        if not self.in_speech:
+            if not voiced:
+                self._preroll.push(samples)
+                return [], False
+            self.in_speech = True
+            self.segments += 1
+            self._hangover_left = hangover_samples
+            self.voiced_samples += len(samples)
+            return self._preroll.drain() + [samples], False
+
+        self.voiced_samples += len(samples)
+        if voiced:
+            self._hangover_left = hangover_samples
+            return [samples], False
+        self._hangover_left -= len(samples)
+        if self._hangover_left > 0:
+            return [samples], False
+        self.in_speech = False
+        return [samples], True
@@ -0,0 +1,112 @@
+# filename: STT_wakeword.py
+import json
+
+import numpy as np
+import vosk
+
+from STT_grammar import normalize_phrase
+from STT_vad import PrerollBuffer
+
+
+class WakeWordSpotter:
+    """
+    Первая ступень распознавания при включённом ключевом слове.
+
+    Все блоки идут в крошечный KaldiRecognizer с грамматикой [ключевое слово, "[unk]"]
+    на той же модели Vosk — он в разы дешевле полного словаря. Основной распознаватель
+    при этом простаивает. Когда ключевое слово найдено, открывается окно команды
+    (window_sec аудио, продлевается пока идёт речь): основной распознаватель получает
+    последние preroll_sec аудио (само ключевое слово) и все блоки окна.
+
+    Время окна считается по отсчётам аудио, а не по часам, чтобы офлайн-прогон
+    вёл себя так же, как живой захват.
+    """
+
+    def __init__(self, window_sec: float = 5.0, preroll_sec: float = 1.5):
+        self.window_sec = window_sec
+        self.preroll_sec = preroll_sec
+        self.recognizer = None
+        self.samplerate = 16000
+        self._key = None
+        self._keyword = ""
+        self._window_left = 0
+        self._preroll = PrerollBuffer(self.samplerate * self.preroll_sec)
+        self.detections = 0
+        self.gated_samples = 0
+        self.passed_samples = 0
+
+    @property
+    def active(self) -> bool:
+        """Открыто ли окно команды."""
+        return self._window_left > 0
+
+    def ensure(self, model, samplerate: int, keyword: str) -> bool:
+        """
+        Пересоздаёт распознаватель ключевого слова при смене модели, частоты или слова.
+        Возвращает False, если спотинг невозможен (нет модели или ключевого слова).
+        """
+        keyword = normalize_phrase(keyword) if keyword else ""
+        if model is None or not keyword:
+            return False
+        key = (id(model), int(samplerate), keyword)
+        if key != self._key:
+            self.samplerate = int(samplerate)
+            self._keyword = keyword
+            self.recognizer = vosk.KaldiRecognizer(model, self.samplerate,
+                                                   json.dumps([keyword, "[unk]"], ensure_ascii=False))
+            self._key = key
+            self.reset()
+        return True
+
+    def reset(self):
+        self._window_left = 0
+        self._preroll = PrerollBuffer(self.samplerate * self.preroll_sec)
+        if self.recognizer is not None:
+            self.recognizer.Reset()
+
+    def extend(self):
+        """Речь в окне команды продолжается: окно отсчитывается заново."""
+        if self.active:
+            self._window_left = int(self.window_sec * self.samplerate)
+
+    def _detected(self, accepted: bool) -> bool:
+        if accepted:
+            text = json.loads(self.recognizer.Result()).get("text", "")
+        else:
+            text = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return self._keyword in text
+
+    def process(self, samples: np.ndarray) -> tuple[list, bool]:
+        """
+        Возвращает (куски для основного распознавателя, окно_команды_закрылось).
+        Куски pre-roll — представления внутреннего буфера: использовать до следующего вызова.
+        """
+        if not len(samples):
+            return [], False
+        if self.active:
+            self.passed_samples += len(samples)
+            self._window_left -= len(samples)
+            if self._window_left <= 0:
+                self._window_left = 0
+                return [samples], True
+            return [samples], False
+
+        self.gated_samples += len(samples)
+        self._preroll.push(samples)
+        accepted = self.recognizer.AcceptWaveform(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+        if not self._detected(accepted):
+            return [], False
+        self.detections += 1
+        self.recognizer.Reset()
+        self._window_left = int(self.window_sec * self.samplerate)
+        return self._preroll.drain(), False
+
+    def stats(self) -> dict:
+        total = self.gated_samples + self.passed_samples
+        return {
+            "keyword": self._keyword,
+            "active": self.active,
+            "detections": self.detections,
+            "window_sec": self.window_sec,
+            "full_decode_ratio": self.passed_samples / total if total else 0.0,
+        }
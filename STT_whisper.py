@@ -0,0 +1,112 @@
+# filename: STT_whisper.py
+import numpy as np
+
+from STT_dsp import PolyphaseResampler
+from STT_grammar import normalize_phrase
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # Необязательная зависимость: без неё остаются Vosk и Google
+    WhisperModel = None
+
+WHISPER_RATE = 16000
+WHISPER_COMPUTE_TYPES = ("int8", "int8_float32", "int16", "float32", "default")
+
+
+def whisper_available() -> bool:
+    return WhisperModel is not None
+
+
+def load_whisper_model(model: str, compute_type: str = "int8", cpu_threads: int = 0):
+    """
+    Модель CTranslate2 на CPU. model — размер ("small", "base", ...) или путь к
+    сконвертированной папке; compute_type "int8" — квантованные веса (быстрее и меньше памяти).
+    """
+    if WhisperModel is None:
+        raise RuntimeError("Пакет faster-whisper не установлен")
+    if compute_type not in WHISPER_COMPUTE_TYPES:
+        raise ValueError(f"Неизвестный тип вычислений Whisper: {compute_type}")
+    return WhisperModel(model, device="cpu", compute_type=compute_type, cpu_threads=int(cpu_threads))
+
+
+class WhisperSegmentDecoder:
+    """
+    Распознавание Whisper по сегментам речи от VAD.
+
+    Whisper не потоковый: отсчёты сегмента копятся в предвыделенном буфере, финал —
+    одно декодирование всего сегмента с beam_size, когда VAD сообщает конец речи
+    (или буфер max_segment_sec заполнен). Частичный результат — жадное декодирование
+    накопленного звука каждые partial_interval_sec секунд речи (0 — без частичных, по умолчанию:
+    декодирование идёт в потоке распознавания, и пока оно длится, захват может терять блоки).
+    Фразы prompt (команды активного процесса) подсказывают модели словарь.
+    """
+
+    def __init__(self,
+                 samplerate: int = WHISPER_RATE,
+                 beam_size: int = 1,
+                 language: str = "ru",
+                 partial_interval_sec: float = 0.0,
+                 max_segment_sec: float = 15.0,
+                 no_speech_threshold: float = 0.6):
+        self.model = None
+        self.beam_size = beam_size
+        self.language = language
+        self.partial_interval_sec = partial_interval_sec
+        self.max_segment_sec = max_segment_sec
+        self.no_speech_threshold = no_speech_threshold
+        self.prompt = None
+        self.reset(samplerate)
+
+    def reset(self, samplerate: int | None = None):
+        if samplerate is not None:
+            self.samplerate = samplerate
+            self._buffer = np.zeros(int(self.max_segment_sec * samplerate), dtype=np.int16)
+        self._length = 0
+        self._partial_at = 0
+
+    def set_prompt(self, phrases):
+        """Подсказка словаря: фразы через запятую, не длиннее окна подсказки модели."""
+        text = ", ".join(phrases)
+        self.prompt = text[:400] or None
+
+    @property
+    def segment_full(self) -> bool:
+        return self._length >= len(self._buffer)
+
+    def accept(self, samples: np.ndarray) -> str | None:
+        """Отсчёты речи (int16) -> текст частичного результата, если пора его обновить."""
+        count = min(len(samples), len(self._buffer) - self._length)
+        self._buffer[self._length:self._length + count] = samples[:count]
+        self._length += count
+        if not self.partial_interval_sec or self.model is None:
+            return None
+        if self._length - self._partial_at < self.partial_interval_sec * self.samplerate:
+            return None
+        self._partial_at = self._length
+        return self.transcribe(self._buffer[:self._length], beam_size=1)
+
+    def finish(self) -> str:
+        """Финал сегмента; буфер готов к следующему."""
+        text = ""
+        if self._length and self.model is not None:
+            text = self.transcribe(self._buffer[:self._length])
+        self.reset()
+        return text
+
+    def transcribe(self, samples: np.ndarray, beam_size: int | None = None) -> str:
+        if self.samplerate != WHISPER_RATE:
+            samples = PolyphaseResampler(self.samplerate, WHISPER_RATE).process_int16(samples)
+        audio = samples.astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=beam_size or self.beam_size,
+            initial_prompt=self.prompt,
+            vad_filter=False,  # Сегменты уже выделены VAD движка
+            without_timestamps=True,
+            condition_on_previous_text=False,
+        )
+        # Сегменты, которые модель сама считает тишиной, — типичные галлюцинации Whisper
+        text = " ".join(seg.text for seg in segments if seg.no_speech_prob < self.no_speech_threshold)
+        # Текст в виде Vosk (нижний регистр, без пунктуации), чтобы фильтры и замены работали одинаково
+        return normalize_phrase(text)
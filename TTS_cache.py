@@ -0,0 +1,166 @@
+# filename: TTS_cache.py
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _default_cache_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), 'Saved Games', 'EDVoicePlugin', 'resources', 'tts_cache')
+
+
+def normalize_tts_text(text: str) -> str:
+    """Одинаково звучащие варианты фразы — один ключ: NFC и схлопнутые пробелы."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class PhraseAudioCache:
+    """
+    Двухуровневый кэш синтезированных фраз: PCM int16 по ключу из текста и параметров голоса.
+
+    - Память: LRU готовых массивов, ограниченный суммарным размером memory_bytes.
+    - Диск: сжатый PCM (npz, deflate) в cache_dir, один файл на фразу; при превышении
+      disk_bytes удаляются давно не использованные файлы (время доступа — mtime файла).
+    Попадание с диска поднимает фразу в память. Ключ включает версию модели,
+    поэтому после обновления модели старые записи просто перестают находиться и вытесняются.
+    """
+
+    def __init__(self, cache_dir: str | None = None, memory_bytes: int = 64 * 1024 * 1024,
+                 disk_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir or _default_cache_dir()
+        self.memory_bytes = int(memory_bytes)
+        self.disk_bytes = int(disk_bytes)
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple] = OrderedDict()
+        self._memory_used = 0
+        self._disk_files: dict[str, int] = {}
+        self._disk_used = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith('.npz'):
+                    size = entry.stat().st_size
+                    self._disk_files[entry.name[:-4]] = size
+                    self._disk_used += size
+        except OSError as e:
+            print(f"[TTS Cache] Каталог кэша недоступен: {e}")
+
+    @staticmethod
+    def make_key(text, model, speaker, speed, volume, language, version) -> str:
+        params = [normalize_tts_text(text), model, speaker, round(float(speed), 3), round(float(volume), 3),
+                  language, version]
+        return hashlib.sha1(json.dumps(params, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key: str):
+        """(pcm int16, частота, каналы) или None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+            on_disk = key in self._disk_files
+        if on_disk:
+            try:
+                with np.load(self._path(key)) as data:
+                    entry = (data["pcm"], int(data["samplerate"]), int(data["channels"]))
+                os.utime(self._path(key))  # Отметка использования для вытеснения
+            except (OSError, KeyError, ValueError) as e:
+                print(f"[TTS Cache] Повреждённая запись {key}: {e}")
+                self._remove_file(key)
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, entry)
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, pcm: np.ndarray, samplerate: int, channels: int = 1):
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        with self._lock:
+            self._remember(key, (pcm, int(samplerate), int(channels)))
+        if self.disk_bytes <= 0:
+            return
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, pcm=pcm, samplerate=samplerate, channels=channels)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"[TTS Cache] Не удалось сохранить фразу: {e}")
+            return
+        with self._lock:
+            self._disk_used += size - self._disk_files.get(key, 0)
+            self._disk_files[key] = size
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _remember(self, key: str, entry: tuple):
+        # Вызывается под замком
+        if key in self._memory:
+            self._memory_used -= self._memory.pop(key)[0].nbytes
+        if entry[0].nbytes > self.memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_used += entry[0].nbytes
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted[0].nbytes
+
+    def _evict_disk(self):
+        files = []
+        for key in list(self._disk_files):
+            try:
+                files.append((os.path.getmtime(self._path(key)), key))
+            except OSError:
+                self._remove_file(key)
+        files.sort()
+        for _, key in files:
+            if self._disk_used <= self.disk_bytes * 0.9:  # Запас, чтобы не чистить на каждой записи
+                break
+            self._remove_file(key)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        with self._lock:
+            self._disk_used -= self._disk_files.pop(key, 0)
+
+    def clear(self):
+        for key in list(self._disk_files):
+            self._remove_file(key)
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_entries": len(self._disk_files),
+                "disk_bytes": self._disk_used,
+            }
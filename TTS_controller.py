@@ -11,10 +11,9 @@ from pathlib import Path
 import langdetect
 import nltk
 import re
-from pydub import AudioSegment
 from num2words import num2words  # Для замены чисел на слова
-import wave  # Для получения duration
 import pygame  # Для воспроизведения с pause/stop
+from playback_reference import get_playback_reference
 
 nltk.download('punkt')
 nltk.download('punkt_tab')  # Для устранения ошибки punkt_tab not found
@@ -66,6 +65,13 @@ class TTS_Controller(QObject):
 
         # Инициализация pygame для плеера
         pygame.mixer.init()
+        # Фразы играются из памяти (mixer.Sound) на своём канале, без временных WAV
+        self.channel = pygame.mixer.Channel(0)
+        self._play_started = 0.0
+        self._paused_at = 0.0
+        # Опорный сигнал для эхоподавления STT: что и когда звучит из динамиков
+        self.playback_reference = get_playback_reference()
+        self._playback_pcm = None  # (int16 отсчёты, частота, каналы) текущей фразы
 
         # Делегируем сигналы из signal_emitter в свои
         self.update_received_signal = self.signal_emitter.update_received_signal
@@ -174,12 +180,9 @@ class TTS_Controller(QObject):
         if not os.path.exists(wav_path):
             try:
                 test_phrase = "Тестовый голос для клонирования."
-                temp_path = self.engine.synthesize(test_phrase, model="Silero", speaker=base_voice, speed=1.0,
+                audio = self.engine.synthesize_pcm(test_phrase, model="Silero", speaker=base_voice, speed=1.0,
                                                    volume=1.0, language="ru")
-                segment = AudioSegment.from_wav(temp_path)
-                segment = segment.set_frame_rate(22050)
-                segment.export(wav_path, format='wav')
-                os.remove(temp_path)
+                self.engine.export_wav(audio, wav_path, samplerate=22050)
             except Exception as e:
                 print(f"Ошибка создания WAV для {base_voice}_clone: {e}")
 
@@ -419,28 +422,27 @@ class TTS_Controller(QObject):
                     lang = self.detect_language(processed_sentence)
 
                     try:
-                        path = self.engine.synthesize(processed_sentence, model=actual_model, speaker=speaker, speed=speed,
-                                                      volume=volume, language=lang)
-                        with wave.open(path, 'r') as w:
-                            duration = w.getnframes() / w.getframerate()
-                        self.playback_started.emit(processed_sentence, duration)
-
-                        pygame.mixer.music.load(path)
-                        pygame.mixer.music.play()
-
-                        while pygame.mixer.music.get_busy() and not self.is_stopped:
+                        audio = self.engine.synthesize_pcm(processed_sentence, model=actual_model, speaker=speaker,
+                                                           speed=speed, volume=volume, language=lang)
+                        if self.playback_reference.enabled:
+                            self._playback_pcm = (audio.pcm, audio.samplerate, audio.channels)
+                        else:
+                            self._playback_pcm = None
+                        self.playback_started.emit(processed_sentence, audio.duration)
+
+                        self.channel.play(self._mixer_sound(audio))
+                        self._play_started = time.perf_counter()
+                        if self._playback_pcm is not None:
+                            self.playback_reference.publish(*self._playback_pcm[:2], self._play_started,
+                                                            channels=self._playback_pcm[2])
+
+                        while self.channel.get_busy() and not self.is_stopped:
                             if self.is_paused:
                                 self.pause_playback()
                                 self.pause_event.wait()
                                 self.resume_playback()
-                            time.sleep(0.1)
-
-                        time.sleep(0.5)  # Задержка для освобождения файла
-                        if os.path.exists(path):
-                            try:
-                                os.remove(path)
-                            except Exception as e:
-                                print(f"Ошибка удаления файла: {e}")
+                            time.sleep(0.02)
+                        self._playback_pcm = None
                         latency = time.perf_counter() - start_time
                         print(f"Синтез занял {latency:.2f} сек")
                     except ValueError as e:
@@ -537,18 +539,36 @@ class TTS_Controller(QObject):
             self.signal_emitter.start_received_timer_signal.emit()
             self.start_play_thread()
 
+    @staticmethod
+    def _mixer_sound(audio):
+        """Sound(buffer=...) ждёт PCM в формате, с которым инициализирован микшер."""
+        frequency, _, channels = pygame.mixer.get_init()
+        if audio.samplerate != frequency or audio.channels != channels:
+            audio = audio.resampled(frequency, channels)
+        return pygame.mixer.Sound(buffer=audio.pcm.tobytes())
+
     def pause_playback(self):
         self.is_paused = True
-        pygame.mixer.music.pause()
+        self._paused_at = time.perf_counter()
+        self.channel.pause()
+        self.playback_reference.truncate()
 
     def resume_playback(self):
         self.is_paused = False
         self.pause_event.set()
-        pygame.mixer.music.unpause()
+        now = time.perf_counter()
+        self._play_started += now - self._paused_at  # Пауза не входит в позицию воспроизведения
+        self.channel.unpause()
+        if self._playback_pcm is not None:
+            # Остаток фразы с позиции паузы
+            samples, rate, channels = self._playback_pcm
+            offset = int((now - self._play_started) * rate) * channels
+            self.playback_reference.publish(samples[offset:], rate, now, channels=channels)
 
     def stop_playback(self):
         self.is_stopped = True
-        pygame.mixer.music.stop()
+        self.channel.stop()
+        self.playback_reference.truncate()
 
     def clear_queue(self):
         self.queue.clear()
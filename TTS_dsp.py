@@ -0,0 +1,59 @@
+# filename: TTS_dsp.py
+import numpy as np
+
+
+def apply_gain(audio: np.ndarray, volume: float) -> np.ndarray:
+    """Громкость на месте (float32), без копии буфера."""
+    if volume != 1.0:
+        np.multiply(audio, np.float32(volume), out=audio)
+    return audio
+
+
+def time_stretch_wsola(audio: np.ndarray, speed: float, samplerate: int,
+                       frame_ms: float = 20.0, tolerance_ms: float = 8.0) -> np.ndarray:
+    """
+    Изменение темпа без сдвига высоты тона (WSOLA), float32 -> float32.
+
+    Выход собирается из окон Ханна frame_ms с перекрытием 50% (шаг синтеза Hs), окна входа
+    берутся с шагом Hs * speed. Каждое окно сдвигается в пределах tolerance_ms так, чтобы
+    лучше всего совпасть по форме с естественным продолжением предыдущего окна —
+    поэтому на стыках нет щелчков и «булькания». Поиск сдвига — два матричных умножения
+    на кадр (грубо по прореженному сигналу и точно рядом с максимумом). Длина выхода ≈ len(audio) / speed.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if speed == 1.0 or len(audio) == 0:
+        return audio
+    if speed <= 0:
+        raise ValueError(f"Недопустимая скорость: {speed}")
+    frame = max(16, int(samplerate * frame_ms / 1000.0)) // 2 * 2
+    hop_out = frame // 2
+    hop_in = hop_out * speed
+    tolerance = max(1, int(samplerate * tolerance_ms / 1000.0))
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)  # Периодическое окно: сумма при 50% перекрытии = 1
+
+    out_len = int(len(audio) / speed)
+    frames = out_len // hop_out + 1
+    # Запас нулей: поиск уходит на tolerance влево и на кадр с продолжением вправо
+    pad = tolerance + frame
+    source = np.concatenate((np.zeros(pad, dtype=np.float32), audio,
+                             np.zeros(pad + frame + int(hop_in) + 1, dtype=np.float32)))
+    out = np.zeros((frames + 1) * hop_out + frame, dtype=np.float32)
+
+    prev = pad - hop_out  # Позиция предыдущего выбранного окна во входе
+    for k in range(frames + 1):
+        # Окна начинаются на полкадра раньше: к началу фразы сумма окон уже равна 1
+        ideal = pad - hop_out + int(round(k * hop_in))
+        if k == 0:
+            pos = ideal
+        else:
+            # Естественное продолжение предыдущего окна — образец для выравнивания
+            template = source[prev + hop_out:prev + hop_out + frame]
+            start = ideal - tolerance
+            candidates = np.lib.stride_tricks.sliding_window_view(source[start:ideal + tolerance + frame], frame)
+            # Грубый поиск через 4 сдвига по прореженным отсчётам, затем уточнение рядом с максимумом
+            best = int(np.argmax(candidates[::4, ::4] @ template[::4])) * 4
+            lo = max(0, best - 4)
+            pos = start + lo + int(np.argmax(candidates[lo:best + 5] @ template))
+        out[k * hop_out:k * hop_out + frame] += window * source[pos:pos + frame]
+        prev = pos
+    return out[hop_out:hop_out + out_len]
@@ -2,16 +2,48 @@
 import torch
 import os
 import wave
-from pydub import AudioSegment
 import numpy as np
 import tempfile
 from TTS.api import TTS
 from pathlib import Path
 import pygame  # Для воспроизведения с pause/stop
 import time  # Добавлен импорт time
+from TTS_cache import PhraseAudioCache
+from STT_dsp import PolyphaseResampler
+from TTS_dsp import time_stretch_wsola, apply_gain
+
+TTS_POSTPROCESS_VERSION = "wsola1"
+
+
+class SynthesizedAudio:
+    """Фраза в памяти: PCM int16 (каналы чередуются), частота и число каналов."""
+
+    def __init__(self, pcm, samplerate, channels=1):
+        self.pcm = pcm
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+
+    @property
+    def duration(self):
+        return len(self.pcm) / self.channels / self.samplerate
+
+    def resampled(self, samplerate, channels=None):
+        """Копия на другой частоте и/или с другим числом каналов (для формата микшера)."""
+        channels = channels or self.channels
+        frames = self.pcm.reshape(-1, self.channels).astype(np.float64)
+        mono = frames.mean(axis=1) if self.channels > 1 else frames[:, 0]
+        if samplerate != self.samplerate:
+            # Хвост нулей выталкивает из фильтра последние отсчёты фразы
+            padded = np.concatenate((mono, np.zeros(self.samplerate // 50)))
+            mono = PolyphaseResampler(self.samplerate, samplerate).process(padded)
+        pcm = np.clip(mono, -32768, 32767).astype(np.int16)
+        if channels > 1:
+            pcm = np.repeat(pcm, channels)
+        return SynthesizedAudio(pcm, samplerate, channels)
+
 
 class TTS_Engine:
-    def __init__(self, fp16=False):
+    def __init__(self, fp16=False, cache_memory_mb=64, cache_disk_mb=512):
         # Динамические пути
         script_dir = os.path.dirname(os.path.abspath(__file__))
         self.silero_model_path = os.path.join(script_dir, 'resources', 'silero', 'v4_ru.pt')
@@ -24,6 +56,15 @@ class TTS_Engine:
 
         self.fp16 = fp16  # FP16 для ускорения на GPU
 
+        # Кэш готовых фраз: повторяющиеся объявления не синтезируются заново
+        self.phrase_cache = PhraseAudioCache(memory_bytes=cache_memory_mb * 1024 * 1024,
+                                             disk_bytes=cache_disk_mb * 1024 * 1024)
+        try:
+            stat = os.stat(self.silero_model_path)
+            self.silero_version = f"silero_v4:{stat.st_size}:{int(stat.st_mtime)}"
+        except OSError:
+            self.silero_version = "silero_v4"
+
         # Инициализация Silero
         try:
             if not os.path.exists(self.silero_model_path):
@@ -33,7 +74,7 @@ class TTS_Engine:
             self.silero_model.to(self.device)
             print(f"Silero инициализирован на устройстве: {self.device}")
             # Прогрев Silero
-            self.synthesize("Тест", model="Silero", speaker="baya", speed=1.0, volume=1.0, language="ru")
+            self.synthesize_pcm("Тест", model="Silero", speaker="baya", speed=1.0, volume=1.0, language="ru", use_cache=False)
             # Автоматическое создание WAV-файлов для всех голосов Silero
             self.create_voice_samples()
         except Exception as e:
@@ -57,40 +98,78 @@ class TTS_Engine:
             wav_path = os.path.join(self.speaker_wav_path, f"{voice}_sample.wav")
             if not os.path.exists(wav_path):
                 try:
-                    temp_path = self.synthesize(test_phrase, model="Silero", speaker=voice, speed=1.0, volume=1.0, language="ru")
+                    audio = self.synthesize_pcm(test_phrase, model="Silero", speaker=voice, speed=1.0, volume=1.0, language="ru")
                     # Resample до 22050 Hz для XTTS
-                    segment = AudioSegment.from_wav(temp_path)
-                    segment = segment.set_frame_rate(self.xtts_sample_rate)
-                    segment.export(wav_path, format='wav')
-                    os.remove(temp_path)
+                    self.export_wav(audio, wav_path, samplerate=self.xtts_sample_rate)
                     print(f"{voice}_sample.wav создан автоматически!")
                 except Exception as e:
                     print(f"Ошибка автоматического создания {voice}_sample.wav: {e}")
 
-    def synthesize(self, text, model="Silero", speaker="baya", speed=1.0, volume=1.0, language="ru", fp16=None):
+    def _model_version(self, model, fp16):
+        # Версия постобработки тоже в ключе: смена алгоритма темпа не отдаёт старые записи кэша
+        if model == "Silero":
+            return f"{self.silero_version}|{TTS_POSTPROCESS_VERSION}"
+        return f"{'xtts_v2:fp16' if fp16 else 'xtts_v2'}|{TTS_POSTPROCESS_VERSION}"
+
+    def get_cache_stats(self):
+        return self.phrase_cache.stats()
+
+    def clear_cache(self):
+        self.phrase_cache.clear()
+
+    def synthesize(self, text, model="Silero", speaker="baya", speed=1.0, volume=1.0, language="ru", fp16=None,
+                   use_cache=True):
+        """Фраза во временный WAV (для внешних потребителей файла); воспроизведение использует synthesize_pcm."""
+        audio = self.synthesize_pcm(text, model=model, speaker=speaker, speed=speed, volume=volume,
+                                    language=language, fp16=fp16, use_cache=use_cache)
         output_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
+        self.export_wav(audio, output_file)
+        return output_file
+
+    @staticmethod
+    def export_wav(audio, path, samplerate=None):
+        """Явная запись фразы в WAV (при необходимости с ресемплингом, например 22050 Гц для образцов XTTS)."""
+        if samplerate and samplerate != audio.samplerate:
+            audio = audio.resampled(samplerate)
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(audio.channels)
+            wf.setsampwidth(2)
+            wf.setframerate(audio.samplerate)
+            wf.writeframes(audio.pcm.tobytes())
+
+    @staticmethod
+    def _postprocess(audio, samplerate, speed=1.0, volume=1.0):
+        """float32 моно (-1..1) -> темп без сдвига тона (WSOLA) и громкость -> SynthesizedAudio int16."""
+        audio = time_stretch_wsola(audio, speed, samplerate)
+        if not audio.flags.writeable or audio.dtype != np.float32:
+            audio = audio.astype(np.float32)
+        apply_gain(audio, volume)
+        np.multiply(audio, np.float32(32767), out=audio)
+        np.clip(audio, -32768, 32767, out=audio)
+        return SynthesizedAudio(audio.astype(np.int16), samplerate)
+
+    def synthesize_pcm(self, text, model="Silero", speaker="baya", speed=1.0, volume=1.0, language="ru", fp16=None,
+                       use_cache=True):
+        """Фраза в памяти (SynthesizedAudio), без временных файлов."""
+        cache_key = None
+        if use_cache:
+            current_fp16 = fp16 if fp16 is not None else self.fp16
+            cache_key = self.phrase_cache.make_key(text, model, speaker, speed, volume, language,
+                                                   self._model_version(model, current_fp16))
+            cached = self.phrase_cache.get(cache_key)
+            if cached is not None:
+                # Попадание в кэш: ни torch, ни постобработка не нужны
+                print(f"Синтез из кэша: model={model}, speaker={speaker}, text={text}")
+                return SynthesizedAudio(*cached)
         print(f"Синтез: model={model}, speaker={speaker}, text={text}, language={language}")
         if model == "Silero":
             if not self.silero_model:
                 raise ValueError("Silero модель не инициализирована")
             try:
                 audio = self.silero_model.apply_tts(text=text, speaker=speaker, sample_rate=self.sample_rate, put_accent=True)
-                audio_np = audio.cpu().numpy()
-                with wave.open(output_file, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(self.sample_rate)
-                    wf.writeframes((audio_np * 32767).astype(np.int16).tobytes())
-                segment = AudioSegment.from_wav(output_file)
-                if speed != 1.0:
-                    segment = segment.speedup(playback_speed=speed) if speed > 1 else segment._spawn(
-                        segment.raw_data, overrides={"frame_rate": int(segment.frame_rate * speed)})
-                if volume != 1.0:
-                    gain_db = 20 * np.log10(volume)
-                    segment = segment + gain_db
-                segment.export(output_file, format='wav')
-                print(f"Silero синтезировал: {output_file}")
-                return output_file
+                # Тензор Silero — float32 в -1..1: темп и громкость на нём же, в int16 один раз в конце
+                result = self._postprocess(audio.cpu().numpy(), self.sample_rate, speed, volume)
+                print(f"Silero синтезировал: {result.duration:.2f} сек")
             except Exception as e:
                 raise ValueError(f"Ошибка синтеза Silero: {e}")
         elif model == "XTTS-v2" and self.xtts_tts:
@@ -104,18 +183,19 @@ class TTS_Engine:
                 current_fp16 = fp16 if fp16 is not None else self.fp16
                 if current_fp16 and not self.xtts_tts.is_half:
                     self.xtts_tts = self.xtts_tts.half()
-                self.xtts_tts.tts_to_file(text=text, speaker_wav=speaker_wav, file_path=output_file, language=language, speed=speed)
-                segment = AudioSegment.from_wav(output_file)
-                if volume != 1.0:
-                    gain_db = 20 * np.log10(volume)
-                    segment = segment + gain_db
-                segment.export(output_file, format='wav')
-                print(f"XTTS синтезировал: {output_file}")
-                return output_file
+                wav = np.asarray(self.xtts_tts.tts(text=text, speaker_wav=speaker_wav, language=language, speed=speed),
+                                 dtype=np.float32)
+                # Нормализация как при записи в файл (tts_to_file); темп XTTS задаёт сама модель
+                wav /= max(0.01, float(np.max(np.abs(wav))) if len(wav) else 0.01)
+                result = self._postprocess(wav, self.xtts_tts.synthesizer.output_sample_rate, volume=volume)
+                print(f"XTTS синтезировал: {result.duration:.2f} сек")
             except Exception as e:
                 raise ValueError(f"Ошибка синтеза XTTS: {e}")
         else:
             raise ValueError("Неподдерживаемый движок или XTTS не инициализирован")
+        if cache_key is not None:
+            self.phrase_cache.put(cache_key, result.pcm, result.samplerate, result.channels)
+        return result
 
     def play(self, audio_path):
         print(f"Воспроизведение: {audio_path}")
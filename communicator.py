@@ -1,24 +1,291 @@
 # filename: communicator.py
+import os
 import socket
+import threading
+import time
+from collections import deque
+from queue import Queue, Full, Empty
+
+# Разделитель сообщений внутри одного датаграммы при объединении (VoiceAttack делит по строкам)
+VA_MESSAGE_DELIMITER = "\n"
+
+# Протокол по умолчанию: "plain" — текст как есть, "sequenced" — кадры с номером (см. frame_message)
+VA_PROTOCOL = os.getenv("EDVP_VA_PROTOCOL", "plain").lower()
+# Объединение сообщений в один датаграмм — только если получатель VoiceAttack делит их по строкам
+VA_COALESCE = os.getenv("EDVP_VA_COALESCE", "0").lower() in ("1", "true", "yes", "on")
+VA_FRAME_PREFIX = "EDVP"
+VA_ACK_PREFIX = "ACK"
+
+
+# Пустой элемент очереди: будит поток отправки при close()
+_WAKE_UP = object()
+
+
+def frame_message(seq, payload, ack):
+    """Кадр протокола "sequenced": строка заголовка "EDVP <номер> <1|0 — нужно ли ACK>", далее текст."""
+    return f"{VA_FRAME_PREFIX} {seq} {1 if ack else 0}\n{payload}"
+
+
+def parse_frame(data):
+    """(seq, ack, payload) для кадра или None, если это обычное сообщение."""
+    header, sep, payload = data.partition("\n")
+    parts = header.split()
+    if not sep or len(parts) != 3 or parts[0] != VA_FRAME_PREFIX or not parts[1].isdigit():
+        return None
+    return int(parts[1]), parts[2] == "1", payload
+
+
+def parse_ack(data):
+    parts = data.split()
+    if len(parts) == 2 and parts[0] == VA_ACK_PREFIX and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
 
 class Communicator:
-    def __init__(self):
-        self.udp_ip = "127.0.0.1"
-        self.udp_port = 4242
+    """
+    Отправка сообщений в VoiceAttack по UDP (127.0.0.1:4242).
+
+    send_to_va() не блокирует вызывающий поток (распознавание, GUI, обработчик запросов):
+    сообщение ставится в ограниченную очередь, sendto делает отдельный поток отправки.
+    - coalesce=True (по умолчанию из EDVP_VA_COALESCE, выключено) — всё, что накопилось
+      в очереди, уходит одним датаграммом через VA_MESSAGE_DELIMITER (пачка событий журнала — один системный вызов вместо десятков);
+    - key/min_interval — ограничение частоты по ключу: повтор того же ключа раньше
+      min_interval секунд отбрасывается;
+    - при полной очереди сообщение отбрасывается; счётчики — в stats();
+    - on_sent(timestamp) вызывается в потоке отправки после sendto (время perf_counter).
+
+    protocol="sequenced" — каждый датаграмм в кадре с номером (frame_message). С ack=True
+    получатель отвечает "ACK <номер>" на адрес отправителя; без ответа за ack_timeout кадр
+    отправляется повторно (тот же номер, до max_retries раз), затем считается потерянным.
+    По ответам считается время туда-обратно (rtt_ms в stats()).
+    """
+
+    def __init__(self, udp_ip="127.0.0.1", udp_port=4242, queue_size=256, coalesce=None,
+                 max_datagram_bytes=8192, coalesce_window_sec=0.005,
+                 protocol=None, ack=True, ack_timeout=0.05, max_retries=3, rtt_window=500):
+        self.udp_ip = udp_ip
+        self.udp_port = udp_port
         self.udp_sock = None
+        self.coalesce = VA_COALESCE if coalesce is None else coalesce
+        self.max_datagram_bytes = max_datagram_bytes
+        self.coalesce_window_sec = coalesce_window_sec
+        self.protocol = (protocol or VA_PROTOCOL).lower()
+        if self.protocol not in ("plain", "sequenced"):
+            raise ValueError(f"Неизвестный протокол VoiceAttack: {self.protocol}")
+        self.ack = ack and self.protocol == "sequenced"
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self._queue = Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._last_sent = {}
+        self._thread = None
+        self._ack_thread = None
+        self._stop_event = threading.Event()
+        self._counters = {"sent": 0, "datagrams": 0, "dropped": 0, "rate_limited": 0, "coalesced": 0, "failed": 0,
+                          "acked": 0, "retransmits": 0, "lost": 0}
+        self._failing = False
+        self._next_seq = 1
+        self._pending = {}  # seq -> [данные, сообщений, первая отправка, последняя отправка, повторов]
+        self._rtt = deque(maxlen=max(1, int(rtt_window)))
+
+    def send_to_va(self, message, key=None, min_interval=None, on_sent=None):
+        """Ставит сообщение в очередь отправки. False — отброшено (частота по ключу или переполнение)."""
+        if not message:
+            return False
+        limited = key is not None and min_interval
+        if limited:
+            now = time.monotonic()
+            with self._lock:
+                if now - self._last_sent.get(key, float("-inf")) < min_interval:
+                    self._counters["rate_limited"] += 1
+                    return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((message, on_sent))
+        except Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            return False
+        if limited:
+            with self._lock:
+                # Только после постановки в очередь: отброшенное сообщение не блокирует повтор ключа
+                self._last_sent[key] = now
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = {**self._counters, "queued": self._queue.qsize(), "protocol": self.protocol,
+                     "in_flight": len(self._pending)}
+            rtt = sorted(self._rtt)
+        if rtt:
+            def pct(p):
+                return rtt[min(len(rtt) - 1, int(p / 100.0 * len(rtt)))] * 1000.0
+            stats["rtt_ms"] = {"count": len(rtt), "p50": pct(50), "p90": pct(90), "p99": pct(99), "max": rtt[-1] * 1000.0}
+        return stats
+
+    def _ensure_thread(self):
+        with self._lock:
+            # Поток, который ещё дописывает очередь после close(), просто продолжает работу
+            self._stop_event.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="VA_Sender", daemon=True)
+                self._thread.start()
+
+    def _ensure_socket(self):
+        if self.udp_sock:
+            return
+        self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.ack:
+            # Ответы ACK приходят на тот же сокет. Привязка до старта потока приёма: на Windows
+            # recvfrom на непривязанном сокете — WSAEINVAL. Таймаут — чтобы поток видел остановку
+            self.udp_sock.bind(("127.0.0.1" if self.udp_ip in ("127.0.0.1", "localhost") else "", 0))
+            self.udp_sock.settimeout(0.5)
+            self._ack_thread = threading.Thread(target=self._receive_acks, args=(self.udp_sock,),
+                                                name="VA_Ack", daemon=True)
+            self._ack_thread.start()
+
+    def _run(self):
+        while True:
+            if self._stop_event.is_set() and self._queue.empty() and not self._pending:
+                with self._lock:
+                    # Проверка под замком: send_to_va мог успеть снять остановку
+                    if self._stop_event.is_set() and self._queue.empty():
+                        self._thread = None
+                        self._close_socket()
+                        return
+            # Пока есть неподтверждённые кадры, просыпаемся чаще, чтобы вовремя повторить
+            timeout = self.ack_timeout / 2 if self._pending else 0.5
+            try:
+                item = self._queue.get(timeout=timeout)
+            except Empty:
+                item = None
+            if item is not None and item is not _WAKE_UP:
+                items = [item]
+                if self.coalesce:
+                    if self.coalesce_window_sec and self._queue.empty():
+                        time.sleep(self.coalesce_window_sec)  # Даём пачке событий дописаться в очередь
+                    items.extend(self._drain_batch(len(item[0].encode('utf-8'))))
+                self._send_datagram(VA_MESSAGE_DELIMITER.join(message for message, _ in items),
+                                    [on_sent for _, on_sent in items if on_sent is not None], len(items))
+            if self._pending:
+                self._retransmit_expired()
 
-    def send_to_va(self, message):
-        if not self.udp_sock:
+    def _drain_batch(self, size):
+        batch = []
+        while True:
+            try:
+                item = self._queue.queue[0]  # Смотрим, влезет ли следующее сообщение
+            except IndexError:
+                return batch
+            if item is _WAKE_UP:
+                return batch
+            size += len(item[0].encode('utf-8')) + len(VA_MESSAGE_DELIMITER)
+            if size > self.max_datagram_bytes:
+                return batch
             try:
-                self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            except Exception:
-                return  # Не отправляем, если ошибка создания сокета
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                return batch
+
+    def _send_datagram(self, payload, callbacks, count):
+        if self.protocol == "sequenced":
+            with self._lock:
+                seq = self._next_seq
+                self._next_seq += 1
+            data = frame_message(seq, payload, self.ack).encode('utf-8')
+            if self.ack:
+                now = time.perf_counter()
+                with self._lock:
+                    # Запоминаем до sendto: ACK может прийти раньше, чем sendto вернёт управление
+                    self._pending[seq] = [data, count, now, now, 0]
+        else:
+            data = payload.encode('utf-8')
+        if self._sendto(data, count):
+            sent_at = time.perf_counter()
+            with self._lock:
+                self._counters["sent"] += count
+                self._counters["datagrams"] += 1
+                self._counters["coalesced"] += count - 1
+            for on_sent in callbacks:
+                try:
+                    on_sent(sent_at)
+                except Exception as e:
+                    print(f"[Communicator] Ошибка обработчика отправки: {e}")
+
+    def _sendto(self, data, count):
         try:
-            self.udp_sock.sendto(message.encode('utf-8'), (self.udp_ip, self.udp_port))
-        except Exception:
-            pass  # Тихо игнорируем ошибки отправки
+            self._ensure_socket()
+            self.udp_sock.sendto(data, (self.udp_ip, self.udp_port))
+        except Exception as e:
+            with self._lock:
+                self._counters["failed"] += count
+            if not self._failing:
+                # Пишем только первую ошибку серии, чтобы не засорять лог
+                print(f"[Communicator] Ошибка отправки в VoiceAttack: {e}")
+                self._failing = True
+            return False
+        self._failing = False
+        return True
 
-    def close(self):
+    def _retransmit_expired(self):
+        now = time.perf_counter()
+        resend = []
+        with self._lock:
+            for seq, entry in list(self._pending.items()):
+                if now - entry[3] < self.ack_timeout:
+                    continue
+                if entry[4] >= self.max_retries:
+                    del self._pending[seq]
+                    self._counters["lost"] += entry[1]
+                    print(f"[Communicator] Кадр {seq} не подтверждён после {entry[4]} повторов")
+                    continue
+                entry[3] = now
+                entry[4] += 1
+                self._counters["retransmits"] += 1
+                resend.append((entry[0], entry[1]))
+        for data, count in resend:
+            self._sendto(data, count)
+
+    def _receive_acks(self, sock):
+        while sock is self.udp_sock:
+            try:
+                data, _ = sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except ConnectionResetError:
+                continue  # Windows: ICMP "порт недоступен" от прошлой отправки — VA ещё не слушает
+            except OSError:
+                return  # Сокет закрыт
+            seq = parse_ack(data.decode('utf-8', errors='replace'))
+            if seq is None:
+                continue
+            now = time.perf_counter()
+            with self._lock:
+                entry = self._pending.pop(seq, None)
+                if entry is not None:
+                    self._counters["acked"] += entry[1]
+                    self._rtt.append(now - entry[2])
+
+    def _close_socket(self):
         if self.udp_sock:
-            self.udp_sock.close()
-            self.udp_sock = None
\ No newline at end of file
+            sock, self.udp_sock = self.udp_sock, None
+            sock.close()
+
+    def close(self, timeout=1.0):
+        """
+        Дожидается отправки очереди и подтверждений (не дольше timeout) и закрывает сокет.
+        Если поток отправки не успел, он закроет сокет сам, когда допишет очередь.
+        """
+        with self._lock:
+            self._stop_event.set()
+            thread = self._thread
+            if thread is None:
+                self._close_socket()
+                return
+        try:
+            self._queue.put_nowait(_WAKE_UP)  # Будим поток, ждущий в get(), без таймаута опроса
+        except Full:
+            pass  # Очередь полна — поток и так не спит
+        if thread is not threading.current_thread():
+            thread.join(timeout=timeout)
@@ -50,7 +50,6 @@ class JournalController:
 
         self.communicator: Communicator | None = None
 
-        self._last_sent = {}
         self._min_send_interval_sec = 0.4
 
         self.ui.textBrowser_AllEventsFromJournal.setWordWrapMode(QTextOption.NoWrap)
@@ -65,6 +64,8 @@ class JournalController:
     def _ensure_communicator(self):
         if self.communicator is None:
             try:
+                # Пачку событий одним датаграммом шлём только по EDVP_VA_COALESCE=1:
+                # профиль VoiceAttack должен делить сообщение по строкам
                 self.communicator = Communicator()
             except Exception:
                 self.communicator = None
@@ -72,18 +73,11 @@ class JournalController:
     def _send_to_va_dedup(self, name: str):
         if not name:
             return
-        now = time.monotonic()
-        last = self._last_sent.get(name, 0.0)
-        if now - last < self._min_send_interval_sec:
-            return
-        self._last_sent[name] = now
         self._ensure_communicator()
-        if self.communicator:
-            try:
-                print(f"[Journal] Send to VA: {name}")
-                self.communicator.send_to_va(name)
-            except Exception as e:
-                print(f"[Journal] UDP send error: {e}")
+        # Повтор того же события чаще _min_send_interval_sec отбрасывает сам Communicator
+        if self.communicator and self.communicator.send_to_va(
+                name, key=name, min_interval=self._min_send_interval_sec):
+            print(f"[Journal] Send to VA: {name}")
 
     def _write_to_update_queue(self, name: str, value: str):
         """
@@ -0,0 +1,37 @@
+# filename: log_levels.py
+import os
+
+# Уровни: "ERROR" < "WARN" < "INFO" < "DEBUG"
+LOG_LEVELS = {"ERROR": 40, "WARN": 30, "INFO": 20, "DEBUG": 10}
+
+
+def log_level_value(name: str) -> int:
+    return LOG_LEVELS.get(name, 20)
+
+
+class LevelLogger:
+    """
+    Печать в консоль с порогом из переменной окружения модуля (например, EDVP_STT_SERVER_LOG_LEVEL).
+    Модули берут методы как log_err/log_warn/log_inf/log_dbg.
+    """
+
+    def __init__(self, env_var: str, default: str = "INFO"):
+        self.level = log_level_value(os.getenv(env_var, default).upper())
+        # На горячем пути строку стоит формировать только при включённой отладке
+        self.debug_enabled = self.level <= LOG_LEVELS["DEBUG"]
+
+    def log(self, level: str, msg: str):
+        if log_level_value(level) >= self.level:
+            print(msg)
+
+    def err(self, msg: str):
+        self.log("ERROR", msg)
+
+    def warn(self, msg: str):
+        self.log("WARN", msg)
+
+    def inf(self, msg: str):
+        self.log("INFO", msg)
+
+    def dbg(self, msg: str):
+        self.log("DEBUG", msg)
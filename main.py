@@ -1,6 +1,4 @@
 import sys
-import json
-import os
 from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox
 from PySide6.QtCore import QTimer, Qt
 from PySide6.QtGui import QTextCursor
@@ -17,6 +15,7 @@ from communicator import Communicator  # ✅ НОВЫЙ ИМПОРТ
 import langdetect
 from ReadingController import ReadingController  # Добавлен импорт для интеграции модуля "Читалка"
 from ProgramBuilder_controller import ProgramBuilderController  # Новый импорт для интеграции ProgramBuilder
+from word_replacements_engine import get_word_replacements_engine
 
 
 class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
@@ -58,6 +57,9 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
             self.horizontalSlider_NoiseReduction.setMinimum(0)
             self.horizontalSlider_NoiseReduction.setMaximum(100)
 
+        # Общий словарь замен (STT, Читалка, окно словаря)
+        self.word_replacements = get_word_replacements_engine()
+
         if hasattr(self, 'pushButton_SaveReplacement'):
             self.pushButton_SaveReplacement.clicked.connect(self.save_word_replacement)
 
@@ -100,6 +102,11 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
         # Процессы
         self.processes_controller = ProcessesController(self)
 
+        # Грамматика команд STT следует за активным процессом
+        self.processes_controller.processes_bus.add_listener(self.controller)
+        if self.processes_controller.active_process:
+            self.controller.on_process_activated(self.processes_controller.active_process.process_name)
+
         # ✅ Коллбек теперь вызывает сигнал Qt (потокобезопасно)
         def _on_vars_updated(process_name: str):
             try:
@@ -215,22 +222,8 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
         if not wrong or not correct:
             QMessageBox.warning(self, "Ошибка", "Заполните оба поля.")
             return
-        saved_games_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources')
-        os.makedirs(saved_games_path, exist_ok=True)
-        path = os.path.join(saved_games_path, 'word_replacements.json')
-        replacements = {}
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    replacements = json.load(f)
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить словарь: {e}")
-                return
-        replacements[wrong] = correct
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(replacements, f, indent=4, ensure_ascii=False)
-            self.controller.speech_engine.reload_word_replacements()
+            self.word_replacements.set_replacement(wrong, correct)
             self.update_dictionary_display()
             self.lineEdit_WrongWord.clear()
             self.lineEdit_CorrectWord.clear()
@@ -239,15 +232,7 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить: {e}")
 
     def update_dictionary_display(self):
-        saved_games_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources')
-        path = os.path.join(saved_games_path, 'word_replacements.json')
-        replacements = {}
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    replacements = json.load(f)
-            except Exception as e:
-                print(f"Ошибка загрузки словаря: {e}")
+        replacements = self.word_replacements.get_replacements()
         text = ""
         for i, (wrong, correct) in enumerate(replacements.items(), 1):
             text += f"{i}. {wrong} → {correct}\n"
@@ -258,15 +243,7 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
         if not search_text:
             self.update_dictionary_display()
             return
-        saved_games_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources')
-        path = os.path.join(saved_games_path, 'word_replacements.json')
-        replacements = {}
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    replacements = json.load(f)
-            except Exception as e:
-                print(f"Ошибка загрузки словаря: {e}")
+        replacements = self.word_replacements.get_replacements()
         text = ""
         found_line = None
         for i, (wrong, correct) in enumerate(replacements.items(), 1):
@@ -293,25 +270,13 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Введите номер строки (число).")
             return
         line_number = int(line_number_str)
-        saved_games_path = os.path.expanduser('~/Saved Games/EDVoicePlugin/resources')
-        path = os.path.join(saved_games_path, 'word_replacements.json')
-        replacements = {}
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    replacements = json.load(f)
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить словарь: {e}")
-                return
+        replacements = self.word_replacements.get_replacements()
         if line_number < 1 or line_number > len(replacements):
             QMessageBox.warning(self, "Ошибка", f"Строка {line_number} не существует.")
             return
         keys = list(replacements.keys())
-        del replacements[keys[line_number - 1]]
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(replacements, f, indent=4, ensure_ascii=False)
-            self.controller.speech_engine.reload_word_replacements()
+            self.word_replacements.delete_replacement(keys[line_number - 1])
             self.update_dictionary_display()
             self.lineEdit_WordNumberInDictionary.clear()
             self.lineEdit_find.clear()
@@ -321,6 +286,7 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
 
     def on_debug_mode_toggled(self, checked):
         self.eddi_controller.toggle_debug_mode(checked)
+        self.controller.show_latency_panel(checked)
 
     def keyPressEvent(self, event):
         """✅ Обработка клавиш для таблицы переменных"""
@@ -360,7 +326,7 @@ class MainWindow(Ui_MainWindow_EDVoicePlugin_ui, QMainWindow):
             # ✅ НОВОЕ: Закрываем Communicator
             if hasattr(self, "communicator") and self.communicator:
                 self.communicator.close()
-                print("[Main] Communicator закрыт")
+                print(f"[Main] Communicator закрыт: {self.communicator.stats()}")
         except Exception as e:
             print(f"[Main] Ошибка при закрытии Communicator: {e}")
 
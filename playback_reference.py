@@ -0,0 +1,91 @@
+# filename: playback_reference.py
+import threading
+import time
+
+import numpy as np
+
+from STT_dsp import PolyphaseResampler
+
+
+class PlaybackReference:
+    """
+    Общий буфер того, что сейчас звучит из динамиков (озвучка TTS), с метками времени.
+
+    TTS публикует PCM фразы в момент запуска воспроизведения (time.perf_counter()),
+    STT читает опорный сигнал за любой интервал времени захвата — для адаптивного
+    эхоподавления — и проверяет, идёт ли воспроизведение (полудуплексный режим).
+    Сигнал хранится в float32 на частоте захвата STT, старые фразы выбрасываются.
+    """
+
+    def __init__(self, samplerate: int = 48000, tail_sec: float = 0.3, keep_sec: float = 5.0):
+        self.samplerate = samplerate
+        self.tail_sec = tail_sec  # Хвост реверберации после конца фразы
+        self.keep_sec = keep_sec
+        self.enabled = False  # Публикация нужна только пока её читает STT
+        self._lock = threading.Lock()
+        self._segments: list[list] = []  # [start_time, end_time, samples]
+
+    def publish(self, pcm: np.ndarray, samplerate: int, start_time: float | None = None, channels: int = 1):
+        """PCM фразы (int16 или float), которая начала звучать в start_time."""
+        if not self.enabled or pcm is None or not len(pcm):
+            return
+        start_time = time.perf_counter() if start_time is None else start_time
+        samples = np.asarray(pcm)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        else:
+            samples = samples.astype(np.float32)
+        if channels > 1:
+            samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+        if samplerate != self.samplerate:
+            samples = PolyphaseResampler(samplerate, self.samplerate).process(samples).astype(np.float32)
+        end_time = start_time + len(samples) / self.samplerate
+        with self._lock:
+            self._segments = [seg for seg in self._segments if seg[1] > start_time - self.keep_sec]
+            self._segments.append([start_time, end_time, samples])
+
+    def truncate(self, end_time: float | None = None):
+        """Воспроизведение остановлено или поставлено на паузу в end_time."""
+        end_time = time.perf_counter() if end_time is None else end_time
+        with self._lock:
+            for seg in self._segments:
+                if seg[0] < end_time < seg[1]:
+                    seg[2] = seg[2][:int((end_time - seg[0]) * self.samplerate)]
+                    seg[1] = end_time
+            self._segments = [seg for seg in self._segments if seg[0] < seg[1]]
+
+    def clear(self):
+        with self._lock:
+            self._segments = []
+
+    def is_playing(self, at_time: float | None = None) -> bool:
+        at_time = time.perf_counter() if at_time is None else at_time
+        with self._lock:
+            return any(seg[0] <= at_time <= seg[1] + self.tail_sec for seg in self._segments)
+
+    def read(self, start_time: float, count: int) -> np.ndarray:
+        """Опорный сигнал (float32) за count отсчётов, начиная с start_time; тишина вне фраз."""
+        out = np.zeros(count, dtype=np.float32)
+        with self._lock:
+            segments = list(self._segments)
+        for seg_start, seg_end, samples in segments:
+            offset = int(round((seg_start - start_time) * self.samplerate))
+            src_from = max(0, -offset)
+            dst_from = max(0, offset)
+            length = min(count - dst_from, len(samples) - src_from)
+            if length > 0:
+                out[dst_from:dst_from + length] += samples[src_from:src_from + length]
+        return out
+
+
+_shared_reference: PlaybackReference | None = None
+_shared_lock = threading.Lock()
+
+
+def get_playback_reference() -> PlaybackReference:
+    """Общий экземпляр для TTS (публикует) и STT (читает)."""
+    global _shared_reference
+    with _shared_lock:
+        if _shared_reference is None:
+            _shared_reference = PlaybackReference()
+        return _shared_reference
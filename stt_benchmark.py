@@ -0,0 +1,238 @@
+# filename: stt_benchmark.py
+"""
+Офлайн-бенчмарк распознавания: WAV-корпус прогоняется через конвейер SpeechRecognitionEngine
+(DSP -> ресемплинг -> VAD -> Vosk -> замены/ключевое слово -> отправка) без микрофона.
+
+Корпус — папка с WAV (моно 16 бит, любая частота) и manifest.json:
+    {"шасси.wav": "выпустить шасси", "огонь.wav": "огонь", ...}
+
+Запуск (перебираются все сочетания параметров):
+    python stt_benchmark.py corpus/ --models vosk_small vosk_medium --blocks 1536 4800 \\
+        --noise-reduction off on --echo off --rates 16000 48000 --output results.json
+
+Для каждой конфигурации в JSON пишутся: RTF, CPU по стадиям (мс на 1 с аудио),
+пиковый RSS, WER и точность команд (финал целиком совпал с транскрипцией).
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+
+from STT_engine import SpeechRecognitionEngine
+from STT_grammar import normalize_phrase
+from STT_noise_profile import NoiseProfile, SpectralSubtractor
+from stt_rate_benchmark import load_capture_audio
+
+MODELS_DIR = Path(__file__).parent / "resources" / "vosk"
+# Ключ устройства профиля шума бенчмарка: не зависит от микрофона и не совпадает с живыми профилями
+BENCHMARK_DEVICE = "stt_benchmark"
+
+
+class _CollectingCommunicator:
+    """Вместо UDP в VoiceAttack: запоминает отправленные команды."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_to_va(self, message, on_sent=None, **kwargs):
+        self.sent.append(message)
+        if on_sent is not None:
+            on_sent(None)
+        return True
+
+    def close(self):
+        pass
+
+
+class _TimedStage:
+    """Обёртка стадии (ресемплер, VAD): суммирует CPU потока на вызовах method."""
+
+    def __init__(self, stage, method, totals, name):
+        self._stage = stage
+        self._call = getattr(stage, method)
+        self._totals = totals
+        self._name = name
+        setattr(self, method, self._timed)
+
+    def _timed(self, *args, **kwargs):
+        start = time.thread_time()
+        try:
+            return self._call(*args, **kwargs)
+        finally:
+            self._totals[self._name] += time.thread_time() - start
+
+    def __getattr__(self, name):
+        return getattr(self._stage, name)
+
+
+def load_corpus(corpus_dir: str) -> list[tuple[str, str, object]]:
+    with open(os.path.join(corpus_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [(name, text, load_capture_audio(os.path.join(corpus_dir, name))) for name, text in manifest.items()]
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """(число ошибок по Левенштейну на словах, длина эталона)."""
+    ref, hyp = reference.split(), hypothesis.split()
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1], len(ref)
+
+
+def peak_rss_mb() -> float:
+    info = psutil.Process().memory_info()
+    peak = getattr(info, "peak_wset", None)  # Windows
+    if peak is None:
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux: КБ
+        except ImportError:
+            peak = info.rss
+    return peak / (1024.0 * 1024.0)
+
+
+def make_engine(model_dir: str, profile_dir: str) -> SpeechRecognitionEngine:
+    engine = SpeechRecognitionEngine(model_dir)
+    engine.communicator = _CollectingCommunicator()
+    # Свой профиль шума во временной папке: noise_profiles.json пользователя не читается и не перезаписывается
+    engine.noise_profile = NoiseProfile(engine.samplerate, file_path=os.path.join(profile_dir, "noise_profiles.json"))
+    engine.noise_suppressor = SpectralSubtractor(engine.noise_profile)
+    engine._echo_noise_suppressor = SpectralSubtractor(engine.noise_profile)
+    engine._input_device_name = lambda: BENCHMARK_DEVICE
+    engine.voice_control_enabled = True
+    engine.vosk_model = engine.model_manager.load_async(model_dir).result()
+    engine.model_path = model_dir
+    engine.model_type = "Vosk"
+    return engine
+
+
+def run_config(engine, corpus, config: dict) -> dict:
+    engine.block_size = config["block_size"]
+    engine.enable_noise_reduction(config["noise_reduction"])
+    engine.enable_echo_cancellation(config["echo_cancellation"])
+    engine.set_recognition_rate(config["recognition_rate"])
+    # Каждая конфигурация учит профиль шума с нуля, иначе результат зависит от порядка прогонов
+    engine._reset_vosk_pipeline()
+    engine.noise_profile.reset()
+
+    cpu = {"dsp": 0.0, "resample": 0.0, "vad": 0.0, "decode": 0.0}
+    errors = words = exact = 0
+    audio_sec = 0.0
+    per_file = []
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for name, reference, audio in corpus:
+        engine._reset_vosk_pipeline()
+        if engine.resampler is not None:
+            engine.resampler = _TimedStage(engine.resampler, "process_int16", cpu, "resample")
+        vad = engine.vad
+        engine.vad = _TimedStage(vad, "process", cpu, "vad")
+        engine.recognizer.Reset()
+        engine.communicator.sent.clear()
+
+        for i in range(0, len(audio), engine.block_size):
+            block = audio[i:i + engine.block_size].tobytes()
+            if engine._dsp_needed():
+                start = time.thread_time()
+                block = engine._process_dsp_block(block)
+                cpu["dsp"] += time.thread_time() - start
+            start = time.thread_time()
+            engine._decode_block(block)
+            cpu["decode"] += time.thread_time() - start
+        start = time.thread_time()
+        engine._handle_final_json(engine.recognizer.FinalResult())
+        cpu["decode"] += time.thread_time() - start
+        engine.vad = vad
+
+        hypothesis = normalize_phrase(" ".join(engine.communicator.sent))
+        reference = normalize_phrase(reference)
+        file_errors, file_words = word_errors(reference, hypothesis)
+        errors += file_errors
+        words += file_words
+        exact += hypothesis == reference
+        audio_sec += len(audio) / engine.samplerate
+        per_file.append({"file": name, "reference": reference, "hypothesis": hypothesis, "word_errors": file_errors})
+
+    wall = time.perf_counter() - wall_start
+    total_cpu = time.process_time() - cpu_start
+    # Ресемплинг и VAD вызываются внутри _decode_block: в decode остаётся только Kaldi и постобработка
+    cpu["decode"] -= cpu["resample"] + cpu["vad"]
+    return {
+        **config,
+        "audio_sec": audio_sec,
+        "real_time_factor": wall / audio_sec if audio_sec else 0.0,
+        "cpu_ms_per_audio_sec": total_cpu / audio_sec * 1000.0 if audio_sec else 0.0,
+        "stage_cpu_ms_per_audio_sec": {k: v / audio_sec * 1000.0 if audio_sec else 0.0 for k, v in cpu.items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "wer": errors / words if words else 0.0,
+        "command_accuracy": exact / len(corpus) if corpus else 0.0,
+        "files": per_file,
+    }
+
+
+def _on_off(values):
+    return [value == "on" for value in values]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк конвейера распознавания по WAV-корпусу")
+    parser.add_argument("corpus", help="папка с WAV и manifest.json")
+    parser.add_argument("--models", nargs="+", default=["vosk_small"],
+                        help="папки моделей в resources/vosk или полные пути")
+    parser.add_argument("--blocks", nargs="+", type=int, default=[1536])
+    parser.add_argument("--noise-reduction", nargs="+", choices=("on", "off"), default=["off"])
+    parser.add_argument("--echo", nargs="+", choices=("on", "off"), default=["off"])
+    parser.add_argument("--rates", nargs="+", type=int, default=[16000])
+    parser.add_argument("--vad", action="store_true", help="включить VAD перед декодером")
+    parser.add_argument("--output", default="stt_benchmark_results.json")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit("manifest.json пуст")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="stt_benchmark_") as profile_dir:
+        for model in args.models:
+            model_dir = model if os.path.isdir(model) else str(MODELS_DIR / model)
+            engine = make_engine(model_dir, profile_dir)
+            engine.enable_vad(args.vad)
+            for block, nr_on, echo_on, rate in itertools.product(
+                    args.blocks, _on_off(args.noise_reduction), _on_off(args.echo), args.rates):
+                config = {
+                    "model": model,
+                    "block_size": block,
+                    "noise_reduction": nr_on,
+                    "echo_cancellation": echo_on,
+                    "recognition_rate": rate,
+                    "vad": args.vad,
+                }
+                result = run_config(engine, corpus, config)
+                results.append(result)
+                print(f"{model} block={block} nr={nr_on} echo={echo_on} rate={rate}: "
+                      f"RTF {result['real_time_factor']:.3f}, WER {result['wer'] * 100:.1f}%, "
+                      f"команды {result['command_accuracy'] * 100:.1f}%, RSS {result['peak_rss_mb']:.0f} МБ")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "files": len(corpus),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
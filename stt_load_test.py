@@ -0,0 +1,191 @@
+# filename: stt_load_test.py
+"""
+Нагрузочный клиент для stt_server (namespace /assocket.ws) — только localhost.
+
+Каждая из N сессий — отдельное socket.io-подключение, которое стримит WAV бинарными
+кадрами (в реальном времени или быстрее) и отправляет {"eou": true}, как настоящий клиент.
+
+Запуск:
+    python stt_load_test.py commands/*.wav --sessions 4 --utterances 10 --speed 1.0 --output load.json
+
+--speed 1.0 — реальное время, 2.0 — вдвое быстрее, 0 — без пауз между кадрами.
+Отчёт: время до первого частичного результата, время до финала (от eou и от начала фразы),
+пропускная способность (секунд аудио в секунду), доля ошибок (таймаут, busy, обрыв).
+"""
+import argparse
+import json
+import threading
+import time
+import wave
+
+import numpy as np
+import socketio
+
+from STT_dsp import PolyphaseResampler
+
+NAMESPACE = '/assocket.ws'
+SERVER_RATE = 16000
+
+
+def load_wav_16k(path: str) -> bytes:
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: нужен WAV 16 бит")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio[:len(audio) // channels * channels].reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != SERVER_RATE:
+        audio = PolyphaseResampler(rate, SERVER_RATE).process_int16(audio)
+    return audio.tobytes()
+
+
+class LoadSession:
+    """Одна клиентская сессия: подключение, стриминг фраз, замер задержек."""
+
+    def __init__(self, url: str, chunk_ms: int, speed: float, timeout: float, verify_ssl: bool):
+        self.url = url
+        self.chunk_bytes = SERVER_RATE * chunk_ms // 1000 * 2
+        self.speed = speed
+        self.timeout = timeout
+        self.client = socketio.Client(ssl_verify=verify_ssl, reconnection=False)
+        self.client.on('message', self._on_message, namespace=NAMESPACE)
+        self._final = threading.Event()
+        self._stream_start = 0.0
+        self._final_at = 0.0
+        self._final_text = ""
+        self._utterance_id = 0
+        self.first_partial_at = None
+        self.busy = False
+        self.results = []
+
+    def _on_message(self, message):
+        now = time.perf_counter()
+        try:
+            data = json.loads(message).get("data", {})
+        except (TypeError, ValueError):
+            return
+        if data.get("status") == "busy":
+            self.busy = True
+        elif data.get("eou"):
+            if data.get("utteranceId") != self._utterance_id:
+                return  # Запоздавший финал фразы, у которой уже истёк таймаут
+            self._final_at = now
+            self._final_text = data.get("utterance", "")
+            self._final.set()
+        elif "utterance" in data and self.first_partial_at is None:
+            self.first_partial_at = now
+
+    def run(self, utterances: list[bytes]):
+        try:
+            self.client.connect(self.url, namespaces=[NAMESPACE], transports=['websocket'])
+        except Exception as e:
+            self.results.extend({"error": f"connect: {e}"} for _ in utterances)
+            return
+        try:
+            self.client.send(json.dumps({"start": True}), namespace=NAMESPACE)
+            for audio in utterances:
+                self.results.append(self._run_utterance(audio))
+        finally:
+            self.client.disconnect()
+
+    def _run_utterance(self, audio: bytes) -> dict:
+        self._utterance_id += 1
+        self._final.clear()
+        self.first_partial_at = None
+        self.busy = False
+        audio_sec = len(audio) / 2 / SERVER_RATE
+        chunk_sec = self.chunk_bytes / 2 / SERVER_RATE
+        self._stream_start = time.perf_counter()
+        try:
+            for i, offset in enumerate(range(0, len(audio), self.chunk_bytes)):
+                self.client.send(audio[offset:offset + self.chunk_bytes], namespace=NAMESPACE)
+                if self.speed > 0:
+                    # Темп по абсолютному расписанию, чтобы задержки отправки не накапливались
+                    delay = self._stream_start + (i + 1) * chunk_sec / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+            eou_at = time.perf_counter()
+            self.client.send(json.dumps({"eou": True, "utteranceId": self._utterance_id}), namespace=NAMESPACE)
+        except Exception as e:
+            return {"error": f"send: {e}", "audio_sec": audio_sec}
+        if not self._final.wait(self.timeout):
+            return {"error": "busy" if self.busy else "timeout", "audio_sec": audio_sec}
+        return {
+            "audio_sec": audio_sec,
+            "time_to_first_partial": (self.first_partial_at - self._stream_start) if self.first_partial_at else None,
+            "time_to_final_from_eou": self._final_at - eou_at,
+            "time_to_final_from_start": self._final_at - self._stream_start,
+            "busy": self.busy,
+            "text": self._final_text,
+        }
+
+
+def _percentiles(values: list[float]) -> dict | None:
+    if not values:
+        return None
+    p50, p90, p99 = np.percentile(values, (50, 90, 99))
+    return {"count": len(values), "p50_ms": p50 * 1000.0, "p90_ms": p90 * 1000.0,
+            "p99_ms": p99 * 1000.0, "max_ms": max(values) * 1000.0}
+
+
+def summarize(results: list[dict], wall: float, sessions: int) -> dict:
+    ok = [r for r in results if "error" not in r]
+    audio_sec = sum(r["audio_sec"] for r in ok)
+    errors: dict[str, int] = {}
+    for r in results:
+        if "error" in r:
+            kind = r["error"].split(":")[0]
+            errors[kind] = errors.get(kind, 0) + 1
+    return {
+        "sessions": sessions,
+        "utterances": len(results),
+        "wall_sec": wall,
+        "throughput_audio_sec_per_sec": audio_sec / wall if wall else 0.0,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "errors": errors,
+        "time_to_first_partial": _percentiles([r["time_to_first_partial"] for r in ok
+                                               if r["time_to_first_partial"] is not None]),
+        "time_to_final_from_eou": _percentiles([r["time_to_final_from_eou"] for r in ok]),
+        "time_to_final_from_start": _percentiles([r["time_to_final_from_start"] for r in ok]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест stt_server на localhost")
+    parser.add_argument("wavs", nargs="+", help="WAV-файлы фраз (по кругу для каждой сессии)")
+    parser.add_argument("--port", type=int, default=443)
+    parser.add_argument("--http", action="store_true", help="сервер без TLS")
+    parser.add_argument("--verify-ssl", action="store_true", help="проверять сертификат (по умолчанию нет: mkcert localhost)")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--utterances", type=int, default=10, help="фраз на сессию")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = f"{'http' if args.http else 'https'}://127.0.0.1:{args.port}"
+    audio = [load_wav_16k(path) for path in args.wavs]
+    sessions = [LoadSession(url, args.chunk_ms, args.speed, args.timeout, args.verify_ssl) for _ in range(args.sessions)]
+    threads = []
+    start = time.perf_counter()
+    for index, session in enumerate(sessions):
+        utterances = [audio[(index + i) % len(audio)] for i in range(args.utterances)]
+        thread = threading.Thread(target=session.run, args=(utterances,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    report = summarize([r for s in sessions for r in s.results], wall, args.sessions)
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
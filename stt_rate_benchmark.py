@@ -0,0 +1,88 @@
+# filename: stt_rate_benchmark.py
+"""
+Замер CPU распознавателя Vosk на частоте захвата (48 кГц) и на родной частоте модели
+(16 кГц с потоковой полифазной децимацией).
+
+Запуск:
+    python stt_rate_benchmark.py record.wav [--model resources/vosk/vosk_small] [--block 1536]
+
+WAV — моно 16 бит любой частоты: он приводится к 48 кГц, как при захвате с микрофона.
+"""
+import argparse
+import json
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+import vosk
+
+from STT_dsp import PolyphaseResampler
+
+CAPTURE_RATE = 48000
+
+
+def load_capture_audio(wav_path: str) -> np.ndarray:
+    with wave.open(wav_path, 'rb') as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError("Нужен моно WAV 16 бит")
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if rate != CAPTURE_RATE:
+        audio = PolyphaseResampler(rate, CAPTURE_RATE).process_int16(audio)
+    return audio
+
+
+def run_pass(model, audio: np.ndarray, block_size: int, recognition_rate: int) -> dict:
+    recognizer = vosk.KaldiRecognizer(model, recognition_rate)
+    resampler = PolyphaseResampler(CAPTURE_RATE, recognition_rate) if recognition_rate != CAPTURE_RATE else None
+    resample_cpu = 0.0
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    for i in range(0, len(audio), block_size):
+        block = audio[i:i + block_size]
+        if resampler is not None:
+            t = time.process_time()
+            block = resampler.process_int16(block)
+            resample_cpu += time.process_time() - t
+        recognizer.AcceptWaveform(block.tobytes())
+    text = json.loads(recognizer.FinalResult()).get("text", "")
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    seconds = len(audio) / CAPTURE_RATE
+    return {
+        "recognition_rate": recognition_rate,
+        "cpu_per_audio_sec": cpu / seconds,
+        "resample_cpu_per_audio_sec": resample_cpu / seconds,
+        "real_time_factor": wall / seconds,
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU распознавания Vosk: 48 кГц против 16 кГц")
+    parser.add_argument("wav")
+    parser.add_argument("--model", default=str(Path(__file__).parent / "resources" / "vosk" / "vosk_small"))
+    parser.add_argument("--block", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    audio = load_capture_audio(args.wav)
+    model = vosk.Model(args.model)
+    results = {}
+    for rate in (CAPTURE_RATE, 16000):
+        passes = [run_pass(model, audio, args.block, rate) for _ in range(args.repeat)]
+        results[rate] = min(passes, key=lambda r: r["cpu_per_audio_sec"])
+
+    full, native = results[CAPTURE_RATE], results[16000]
+    for res in (full, native):
+        print(f"{res['recognition_rate']} Гц: CPU {res['cpu_per_audio_sec'] * 1000:.1f} мс на 1 с аудио "
+              f"(из них ресемплинг {res['resample_cpu_per_audio_sec'] * 1000:.1f} мс), "
+              f"RTF {res['real_time_factor']:.3f}, текст: {res['text']!r}")
+    saved = full["cpu_per_audio_sec"] - native["cpu_per_audio_sec"]
+    print(f"Экономия: {saved * 1000:.1f} мс CPU на 1 с аудио "
+          f"({saved / full['cpu_per_audio_sec'] * 100 if full['cpu_per_audio_sec'] else 0:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
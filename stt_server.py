@@ -1,44 +1,83 @@
 import json
 import os
 import re
+import sys
+import threading
+import time
+from queue import Queue, Empty
 from pathlib import Path
-from flask import Flask, request
+from flask import Flask, request, jsonify, abort
 from flask_socketio import SocketIO, emit
 import numpy as np
-import librosa
 import speech_recognition as sr
 import vosk
 
 from STT_engine import SpeechRecognitionEngine
+from STT_dsp import PolyphaseResampler, StreamingFilterChain
+from stt_worker_pool import RecognizerWorkerPool, PoolBusy
+from log_levels import LevelLogger
+
+# ---- Настройка логирования ----
+_logger = LevelLogger("EDVP_STT_SERVER_LOG_LEVEL")
+log_err, log_warn, log_inf, log_dbg = _logger.err, _logger.warn, _logger.inf, _logger.dbg
+# На горячем пути (кадры аудио) строка формируется только при включённой отладке
+DEBUG_ENABLED = _logger.debug_enabled
+
+
+# ---- Ограничения сессий ----
+MAX_FRAME_BYTES = int(os.getenv("EDVP_STT_MAX_FRAME_BYTES", 64 * 1024))       # Один бинарный кадр
+MAX_UTTERANCE_SEC = float(os.getenv("EDVP_STT_MAX_UTTERANCE_SEC", 30))        # Аудио фразы до "eou"
+MAX_UTTERANCE_WALL_SEC = float(os.getenv("EDVP_STT_MAX_UTTERANCE_WALL_SEC", 60))  # Время фразы без "eou"
+IDLE_SESSION_SEC = float(os.getenv("EDVP_STT_IDLE_SESSION_SEC", 120))         # Сессия без кадров
+MODEL_WAIT_SEC = float(os.getenv("EDVP_STT_MODEL_WAIT_SEC", 300))             # Загрузка модели при старте
+# Отладка Flask/Werkzeug (как раньше, включена) — отдельно от уровня логов
+FLASK_DEBUG = os.getenv("EDVP_STT_SERVER_FLASK_DEBUG", "1").lower() in ("1", "true", "yes", "on")
 
 app = Flask(__name__)
 socketio = SocketIO(app, async_mode='eventlet')
 
 
 class STTServerEngine(SpeechRecognitionEngine):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Общая цепочка фильтров: буферы разных сессий обрабатываются по очереди
+        self._dsp_lock = threading.Lock()
+
     def recognize_from_buffer(self, audio_bytes, sample_rate=16000, channels=1):
         audio_np = np.frombuffer(audio_bytes, dtype=np.int16)
+        rate = sample_rate
 
-        # Ресемплинг если нужно
-        if sample_rate != self.samplerate:
-            audio_np = audio_np.astype(np.float32) / 32768.0
-            audio_np = librosa.resample(audio_np, orig_sr=sample_rate, target_sr=self.samplerate)
-            audio_np = (audio_np * 32767).astype(np.int16)
-
-        # Применяем шумоподавление если включено
-        if self.noise_reduction_enabled or self._echo_cancellation_enabled:
-            audio_np = self.apply_echo_cancellation(audio_np)
+        # Эхо- и шумоподавление цепочки (каждый буфер — новая фраза, состояние фильтров с нуля).
+        # apply_echo_cancellation работает только при включённом эхоподавлении — иначе и ресемплинг не нужен
+        if self._echo_cancellation_enabled:
+            # Фильтры рассчитаны на частоту захвата
+            if rate != self.samplerate:
+                audio_np = PolyphaseResampler(rate, self.samplerate).process_int16(audio_np)
+                rate = self.samplerate
+            with self._dsp_lock:
+                self.filter_chain.reset()
+                audio_np = self.apply_echo_cancellation(audio_np)
 
         result = ""
 
         if self.model_type == "Vosk":
-            self.recognizer.Reset()
-            self.recognizer.AcceptWaveform(audio_np.tobytes())
-            partial = json.loads(self.recognizer.FinalResult())
+            # Ресемплинг к частоте распознавателя, если нужно
+            if rate != self.recognition_samplerate:
+                audio_np = PolyphaseResampler(rate, self.recognition_samplerate).process_int16(audio_np)
+            # Свой распознаватель на вызов: общий Reset() ломал параллельные сессии
+            recognizer = self._create_recognizer(self.vosk_model)
+            recognizer.AcceptWaveform(audio_np.tobytes())
+            partial = json.loads(recognizer.FinalResult())
             result = partial.get("text", "").lower()
 
+        elif self.model_type == "Whisper":
+            # Фраза целиком уже в буфере: одно декодирование без VAD и частичных
+            if rate != self.recognition_samplerate:
+                audio_np = PolyphaseResampler(rate, self.recognition_samplerate).process_int16(audio_np)
+            result = self.whisper.transcribe(audio_np)
+
         elif self.model_type == "Google Online":
-            audio_data = sr.AudioData(audio_np.tobytes(), self.samplerate, channels)
+            audio_data = sr.AudioData(audio_np.tobytes(), rate, channels)
             try:
                 result = self.google_recognizer.recognize_google(audio_data, language="ru-RU").lower()
             except sr.UnknownValueError:
@@ -47,8 +86,7 @@ class STTServerEngine(SpeechRecognitionEngine):
                 return {"error": "Google API error"}
 
         # Применяем замены слов
-        for wrong, correct in self.word_replacements.items():
-            result = result.replace(wrong, correct)
+        result = self.apply_word_replacements(result)
 
         # Убираем знаки препинания в конце
         result = re.sub(r'[.!?]+$', '', result.strip())
@@ -56,6 +94,118 @@ class STTServerEngine(SpeechRecognitionEngine):
         return result
 
 
+class RecognitionSession:
+    """
+    Потоковое распознавание одной сессии socket.io.
+
+    Бинарные кадры сразу идут в собственный KaldiRecognizer сессии (модель Vosk общая
+    для всех сессий), частичные результаты отдаются клиенту по мере появления,
+    финал — по "eou". Аудио фразы копится в предвыделенном bytearray (удвоение ёмкости),
+    он нужен для Google и для выравнивания нечётных по байтам кадров.
+    """
+
+    def __init__(self, engine, session_id, sample_rate=16000, capacity_sec=10.0):
+        self.engine = engine
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self._capacity = int(sample_rate * capacity_sec) * 2
+        self._audio = bytearray(self._capacity)
+        # Учёт в обработчике socket.io (рабочий поток эти поля не трогает)
+        self.max_bytes = int(sample_rate * MAX_UTTERANCE_SEC) * 2
+        self.received_bytes = 0
+        self.utterance_started = None
+        self.last_activity = time.monotonic()
+        self.limit_reported = False
+        self._length = 0
+        self._fed = 0  # Сколько байт уже ушло в распознаватель
+        self.recognizer = None
+        self._model = None
+        self.resampler = None
+        self.filter_chain = None
+        self._to_capture_rate = None
+        self._from_capture_rate = None
+        self.committed = []  # Фрагменты, финализированные эндпоинтом Kaldi до "eou"
+        self.last_partial = ""
+        self.reset()
+
+    def reset(self):
+        self._length = 0
+        self._fed = 0
+        if len(self._audio) > self._capacity:
+            self._audio = bytearray(self._capacity)  # Длинная фраза не держит память простаивающей сессии
+        self.committed = []
+        self.last_partial = ""
+        engine = self.engine
+        if engine.model_type == "Vosk":
+            model = engine.vosk_model
+            if self.recognizer is None or self._model is not model:
+                self._model = model
+                self.recognizer = engine._create_recognizer(model)
+            else:
+                self.recognizer.Reset()
+            rate = engine.recognition_samplerate
+            self.resampler = PolyphaseResampler(self.sample_rate, rate) if self.sample_rate != rate else None
+        if engine._echo_cancellation_enabled:
+            # Свои фильтры и ресемплеры у каждой сессии: состояние между кадрами не смешивается
+            self.filter_chain = StreamingFilterChain(engine.samplerate)
+            self._to_capture_rate = PolyphaseResampler(self.sample_rate, engine.samplerate)
+            self._from_capture_rate = PolyphaseResampler(engine.samplerate, self.sample_rate)
+        else:
+            self.filter_chain = None
+
+    def _append(self, chunk):
+        end = self._length + len(chunk)
+        if end > len(self._audio):
+            grown = bytearray(max(end, 2 * len(self._audio)))
+            grown[:self._length] = self._audio[:self._length]
+            self._audio = grown
+        self._audio[self._length:end] = chunk
+        self._length = end
+
+    def feed(self, chunk):
+        """Бинарный кадр -> текст частичного результата, если он изменился, иначе None."""
+        self._append(chunk)
+        if self.engine.model_type != "Vosk" or self.recognizer is None:
+            return None
+        usable = (self._length - self._fed) // 2 * 2
+        if not usable:
+            return None
+        samples = np.frombuffer(memoryview(self._audio)[self._fed:self._fed + usable], dtype=np.int16)
+        self._fed += usable
+        if self.filter_chain is not None:
+            samples = self._from_capture_rate.process_int16(
+                self.filter_chain.process_int16(self._to_capture_rate.process_int16(samples))
+            )
+        if self.resampler is not None:
+            samples = self.resampler.process_int16(samples)
+        if not len(samples):
+            return None
+        if self.recognizer.AcceptWaveform(samples.tobytes()):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.committed.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        current = self.engine.apply_word_replacements(" ".join(self.committed + [partial]).strip().lower())
+        if current == self.last_partial:
+            return None
+        self.last_partial = current
+        return current
+
+    def finish(self):
+        """Финал фразы по "eou"; сессия готова к следующей фразе."""
+        if self.engine.model_type == "Vosk" and self.recognizer is not None:
+            text = json.loads(self.recognizer.FinalResult()).get("text", "")
+            result = " ".join(self.committed + ([text] if text else [])).lower()
+            result = self.engine.apply_word_replacements(result)
+            result = re.sub(r'[.!?]+$', '', result.strip())
+        else:
+            result = self.engine.recognize_from_buffer(bytes(self._audio[:self._length]), sample_rate=self.sample_rate)
+        self.reset()
+        return result
+
+
 # Создаём движок для сервера
 model_path = str(Path(__file__).parent / "resources" / "vosk" / "vosk_small")
 engine = STTServerEngine(model_path)
@@ -64,36 +214,169 @@ engine.enable_noise_reduction(True)
 engine.set_noise_level(50)
 engine.enable_echo_cancellation(False)
 engine.reload_word_replacements()
+# Сессии создаются с общей моделью: дожидаемся её фоновой загрузки
+if not engine.wait_model_ready(MODEL_WAIT_SEC) or engine.model_type != "Vosk":
+    log_err(f"[STT Server] Модель Vosk не загружена ({model_path}), сервер не запущен")
+    sys.exit(1)
+
+sessions = {}  # Потоковые сессии распознавания по sessionId
+# Пул потоков распознавания (размер — STT_SERVER_WORKERS, по умолчанию ядра - 1)
+pool = RecognizerWorkerPool(int(os.environ.get("STT_SERVER_WORKERS", "0")) or None)
+results = Queue()  # (sid, json) от рабочих потоков; отправляет их фоновая задача socketio
+_results_pump_started = False
+
+
+server_stats = {"rejected_frames": 0, "capped_utterances": 0, "evicted_sessions": 0, "busy_responses": 0}
+
+
+def get_session(session_id):
+    """Сессия клиента. Новая регистрируется только после закрепления за потоком (иначе PoolBusy)."""
+    session = sessions.get(session_id)
+    if session is None:
+        pool.assign(session_id)
+        session = sessions[session_id] = RecognitionSession(engine, session_id)
+    return session
+
+
+def close_session(session_id):
+    sessions.pop(session_id, None)
+    pool.release(session_id)
+
+
+def _evict_idle_sessions():
+    while True:
+        socketio.sleep(min(10.0, IDLE_SESSION_SEC))
+        now = time.monotonic()
+        for session_id, session in list(sessions.items()):
+            if now - session.last_activity >= IDLE_SESSION_SEC:
+                close_session(session_id)
+                server_stats["evicted_sessions"] += 1
+                log_inf(f"[STT Server] Сессия {session_id} закрыта по простою")
+
+
+def _pump_results():
+    # emit из ОС-потоков небезопасен для eventlet: результаты отправляются из задачи socketio
+    while True:
+        try:
+            while True:
+                sid, payload = results.get_nowait()
+                socketio.emit('message', payload, to=sid, namespace='/assocket.ws')
+        except Empty:
+            pass
+        socketio.sleep(0.01)
+
+
+def _publish_partial(sid):
+    def on_done(partial):
+        if partial is not None:
+            results.put((sid, json.dumps({"data": {"merge": partial, "utterance": partial, "eou": False}})))
+    return on_done
+
+
+def _publish_final(sid, utterance_id=None):
+    def on_done(text):
+        data = {"merge": text, "utterance": text, "eou": True}
+        if utterance_id is not None:
+            data["utteranceId"] = utterance_id  # Клиент сопоставляет финал со своей фразой
+        results.put((sid, json.dumps({"data": data})))
+        log_dbg(f"[STT Server] Отправлен текст: {text}")
+    return on_done
+
+
+def _busy():
+    server_stats["busy_responses"] += 1
+    emit('message', json.dumps({"data": {"status": "busy"}}))
+
+
+def _finish_utterance(session_id, session, sid, utterance_id=None):
+    session.received_bytes = 0
+    session.utterance_started = None
+    session.limit_reported = False
+    # Конец фразы не отбрасывается: встаёт в очередь сессии после её кадров
+    pool.submit(session_id, session.finish, on_done=_publish_final(sid, utterance_id), force=True)
+
+
+def _accept_frame(sid, session, message):
+    """Проверка лимитов кадра и фразы. False — кадр отброшен."""
+    now = time.monotonic()
+    session.last_activity = now
+    if len(message) > MAX_FRAME_BYTES or session.received_bytes + len(message) > session.max_bytes:
+        server_stats["rejected_frames"] += 1
+        if not session.limit_reported:
+            session.limit_reported = True
+            log_warn(f"[STT Server] Сессия {sid}: превышен лимит кадра/фразы, кадры отбрасываются")
+            emit('message', json.dumps({"data": {"status": "limit"}}))
+        return False
+    if session.utterance_started is None:
+        session.utterance_started = now
+    elif now - session.utterance_started > MAX_UTTERANCE_WALL_SEC:
+        # Клиент так и не прислал "eou": финализируем сами
+        server_stats["capped_utterances"] += 1
+        _finish_utterance(sid, session, sid)
+        session.utterance_started = now
+    session.received_bytes += len(message)
+    return True
+
 
-audio_buffer = {}  # Буфер для аудио по sessionId
+@app.route('/stats')
+def stats():
+    # Только локальные запросы
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(403)
+    return jsonify({
+        "active_sessions": len(sessions),
+        "bytes_buffered": sum(session.received_bytes for session in sessions.values()),
+        **server_stats,
+        "pool": pool.stats(),
+    })
 
 
 @socketio.on('connect', namespace='/assocket.ws')
 def connect():
-    print("Client connected")
+    global _results_pump_started
+    if not _results_pump_started:
+        _results_pump_started = True
+        socketio.start_background_task(_pump_results)
+        socketio.start_background_task(_evict_idle_sessions)
+    log_inf("Client connected")
 
 
 @socketio.on('message', namespace='/assocket.ws')
 def handle_message(message):
-    print("Received message: ", type(message))  # Лог для отладки
     if isinstance(message, bytes):
-        # Бинарное аудио
-        session_id = request.sid
-        if session_id not in audio_buffer:
-            audio_buffer[session_id] = b''
-        audio_buffer[session_id] += message
-        print("Audio chunk received, length: ", len(message))
+        # Бинарное аудио: в поток распознавания, закреплённый за сессией
+        sid = request.sid
+        try:
+            session = get_session(sid)
+        except PoolBusy:
+            _busy()
+            return
+        if not _accept_frame(sid, session, message):
+            return
+        if DEBUG_ENABLED:
+            log_dbg(f"Audio chunk received, length: {len(message)}")
+        try:
+            pool.submit(sid, session.feed, message, on_done=_publish_partial(sid))
+        except PoolBusy:
+            session.received_bytes -= len(message)
+            _busy()
     else:
         # Текст (JSON)
-        print("JSON message: ", message)
-        data = json.loads(message)
+        log_dbg(f"JSON message: {message}")
+        try:
+            data = json.loads(message)
+        except (TypeError, ValueError):
+            log_warn("[STT Server] Некорректное JSON-сообщение")
+            return
         session_id = data.get('sessionId', request.sid)
         if 'eou' in data or 'end' in data:  # Конец фразы
-            if session_id in audio_buffer:
-                text = engine.recognize_from_buffer(audio_buffer[session_id], sample_rate=16000)
-                emit('message', json.dumps({"data": {"merge": text, "utterance": text, "eou": True}}))
-                print("Sent text: ", text)
-                del audio_buffer[session_id]
+            session = sessions.get(session_id)
+            if session is not None:
+                session.last_activity = time.monotonic()
+                try:
+                    _finish_utterance(session_id, session, request.sid, data.get('utteranceId'))
+                except PoolBusy:
+                    _busy()
         else:
             # Начальный или другие сообщения
             emit('message', json.dumps({"data": {"sessionId": session_id, "status": "ok"}}))
@@ -101,9 +384,10 @@ def handle_message(message):
 
 @socketio.on('disconnect', namespace='/assocket.ws')
 def disconnect():
-    print("Client disconnected")
+    close_session(request.sid)
+    log_inf("Client disconnected")
 
 
 if __name__ == '__main__':
-    socketio.run(app, host='127.0.0.1', port=443, keyfile='localhost+2-key.pem', certfile='localhost+2.pem', debug=True,
+    socketio.run(app, host='127.0.0.1', port=443, keyfile='localhost+2-key.pem', certfile='localhost+2.pem', debug=FLASK_DEBUG,
                  allow_unsafe_werkzeug=True)
\ No newline at end of file
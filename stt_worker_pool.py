@@ -0,0 +1,135 @@
+# filename: stt_worker_pool.py
+import os
+import threading
+from queue import Queue, Full, Empty
+from typing import Callable
+
+
+class PoolBusy(Exception):
+    """Пул распознавания перегружен: клиенту отвечаем "busy"."""
+
+
+class RecognizerWorkerPool:
+    """
+    Пул потоков распознавания для stt_server.
+
+    - size рабочих потоков (ОС-потоки: Kaldi вызывается через cffi и отпускает GIL,
+      поэтому сессии декодируются на разных ядрах параллельно);
+    - сессия закрепляется за одним потоком (наименее загруженным при первом кадре),
+      поэтому её кадры обрабатываются строго по порядку, а распознаватель сессии
+      никогда не используется из двух потоков сразу;
+    - у каждого потока ограниченная очередь queue_size задач; если очередь полна
+      или у потока уже max_sessions сессий, submit бросает PoolBusy;
+    - submit никогда не ждёт (вызывается из цикла eventlet): задача с force=True при полной
+      очереди ложится в список переполнения сессии, поток забирает его по мере освобождения
+      очереди, а новые задачи сессии до тех пор встают за ним.
+    """
+
+    def __init__(self, size: int | None = None, queue_size: int = 64, max_sessions: int = 4):
+        self.size = max(1, int(size or max(1, (os.cpu_count() or 2) - 1)))
+        self.max_sessions = max(1, int(max_sessions))
+        self._lock = threading.Lock()
+        self._queues = [Queue(maxsize=max(1, int(queue_size))) for _ in range(self.size)]
+        self._assignment: dict[str, int] = {}
+        self._sessions_per_worker = [0] * self.size
+        self._overflow: dict[str, list] = {}
+        self.rejected = 0
+        self.completed = 0
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"STT_Recognizer_{i}", daemon=True)
+            for i in range(self.size)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def assign(self, session_id: str) -> int:
+        """Поток сессии; новая сессия закрепляется за наименее загруженным. PoolBusy — мест нет."""
+        with self._lock:
+            worker = self._assignment.get(session_id)
+            if worker is None:
+                worker = min(range(self.size), key=lambda i: (self._sessions_per_worker[i], self._queues[i].qsize()))
+                if self._sessions_per_worker[worker] >= self.max_sessions:
+                    self.rejected += 1
+                    raise PoolBusy(f"Нет свободных потоков распознавания для сессии {session_id}")
+                self._assignment[session_id] = worker
+                self._sessions_per_worker[worker] += 1
+            return worker
+
+    def submit(self, session_id: str, task: Callable, *args,
+               on_done: Callable | None = None, force: bool = False):
+        """
+        Задача сессии в её поток. on_done(result) вызывается в рабочем потоке.
+        force=True — не отказывать при полной очереди (конец фразы нельзя терять).
+        """
+        queue = self._queues[self.assign(session_id)]
+        item = (task, args, on_done)
+        with self._lock:
+            overflow = self._overflow.get(session_id)
+            if overflow is None:
+                try:
+                    queue.put_nowait(item)
+                    return
+                except Full:
+                    pass
+            if force:
+                self._overflow.setdefault(session_id, []).append(item)
+                return
+            self.rejected += 1
+        raise PoolBusy(f"Очередь распознавания сессии {session_id} переполнена")
+
+    def release(self, session_id: str):
+        """Сессия закрыта: поток освобождается для новых сессий."""
+        with self._lock:
+            worker = self._assignment.pop(session_id, None)
+            self._overflow.pop(session_id, None)
+            if worker is not None:
+                self._sessions_per_worker[worker] -= 1
+
+    def _run(self, index: int):
+        queue = self._queues[index]
+        while not self._stop_event.is_set():
+            if self._overflow:
+                self._refill(index)
+            try:
+                task, args, on_done = queue.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                result = task(*args)
+                if on_done is not None:
+                    on_done(result)
+            except Exception as e:
+                print(f"[STT Pool] Ошибка задачи распознавания: {e}")
+            with self._lock:
+                self.completed += 1
+
+    def _refill(self, index: int):
+        """Переносит отложенные задачи сессий этого потока в его очередь, сколько поместится."""
+        queue = self._queues[index]
+        with self._lock:
+            for session_id, items in list(self._overflow.items()):
+                if self._assignment.get(session_id) != index:
+                    continue
+                while items:
+                    try:
+                        queue.put_nowait(items[0])
+                    except Full:
+                        return
+                    items.pop(0)
+                del self._overflow[session_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.size,
+                "sessions": len(self._assignment),
+                "sessions_per_worker": list(self._sessions_per_worker),
+                "queue_sizes": [q.qsize() for q in self._queues],
+                "overflow": sum(len(items) for items in self._overflow.values()),
+                "rejected": self.rejected,
+                "completed": self.completed,
+            }
+
+    def shutdown(self):
+        self._stop_event.set()
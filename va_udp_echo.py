@@ -0,0 +1,114 @@
+# filename: va_udp_echo.py
+"""
+Локальная заглушка VoiceAttack для проверки UDP-протокола Communicator — только localhost.
+
+Режим serve — слушает порт как VoiceAttack: печатает сообщения, на кадры "sequenced"
+с запросом подтверждения отвечает "ACK <номер>", повторы кадров по номеру отбрасывает.
+--drop и --delay-ms имитируют потери и медленного получателя.
+
+Режим bench — отправляет сообщения через Communicator и печатает его счётчики
+(подтверждено, повторов, потеряно) и время туда-обратно.
+
+Запуск:
+    python va_udp_echo.py serve --port 4243 --drop 0.1
+    python va_udp_echo.py bench --port 4243 --count 1000 --rate 200
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from collections import deque
+
+from communicator import Communicator, VA_ACK_PREFIX, parse_frame
+
+
+def serve(port: int, drop: float, delay_ms: float, quiet: bool, stop_event: threading.Event | None = None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    sock.settimeout(0.5)
+    seen = set()
+    seen_order = deque(maxlen=4096)
+    received = duplicates = dropped = 0
+    print(f"[VA echo] Слушаю 127.0.0.1:{port} (потери {drop:.0%}, задержка {delay_ms} мс)")
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                data, addr = sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            if random.random() < drop:
+                dropped += 1
+                continue
+            text = data.decode("utf-8", errors="replace")
+            frame = parse_frame(text)
+            if frame is None:
+                received += 1
+                if not quiet:
+                    print(f"[VA echo] {text!r}")
+                continue
+            seq, want_ack, payload = frame
+            if delay_ms:
+                time.sleep(delay_ms / 1000.0)
+            if want_ack:
+                sock.sendto(f"{VA_ACK_PREFIX} {seq}".encode("utf-8"), addr)
+            if seq in seen:
+                duplicates += 1  # Повтор уже полученного кадра: ACK потерялся
+                continue
+            if len(seen_order) == seen_order.maxlen:
+                seen.discard(seen_order[0])
+            seen.add(seq)
+            seen_order.append(seq)
+            received += 1
+            if not quiet:
+                print(f"[VA echo] #{seq}: {payload!r}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        print(f"[VA echo] Получено {received}, повторов {duplicates}, отброшено {dropped}")
+
+
+def bench(port: int, count: int, rate: float, ack_timeout: float, retries: int) -> dict:
+    comm = Communicator(udp_port=port, protocol="sequenced", ack_timeout=ack_timeout, max_retries=retries,
+                        queue_size=max(256, count))
+    start = time.perf_counter()
+    for i in range(count):
+        comm.send_to_va(f"SetVar Bench_{i} = {i}")
+        if rate > 0:
+            delay = start + (i + 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    # Ждём подтверждений и повторов, затем закрываем
+    deadline = time.perf_counter() + ack_timeout * (retries + 2) + 1.0
+    while comm.stats()["in_flight"] or comm.stats()["queued"]:
+        if time.perf_counter() > deadline:
+            break
+        time.sleep(0.01)
+    comm.close()
+    return comm.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка VoiceAttack и замер UDP-протокола Communicator")
+    parser.add_argument("mode", choices=("serve", "bench"))
+    parser.add_argument("--port", type=int, default=4243, help="не 4242, чтобы не мешать настоящему VoiceAttack")
+    parser.add_argument("--drop", type=float, default=0.0, help="доля отбрасываемых датаграммов (serve)")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="задержка перед ACK (serve)")
+    parser.add_argument("--quiet", action="store_true")
+    parser.add_argument("--count", type=int, default=1000, help="сообщений (bench)")
+    parser.add_argument("--rate", type=float, default=200.0, help="сообщений в секунду, 0 — без пауз (bench)")
+    parser.add_argument("--ack-timeout", type=float, default=0.05)
+    parser.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args.port, args.drop, args.delay_ms, args.quiet)
+    else:
+        print(json.dumps(bench(args.port, args.count, args.rate, args.ack_timeout, args.retries),
+                         indent=4, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -244,8 +244,10 @@ class VariableRequestHandler:
 
         # Отправляем ответ в VA через порт 4242
         try:
-            self.communicator.send_to_va(response)
-            log_inf(f"[RequestHandler] Отправлено в VA: {response}")
+            if self.communicator.send_to_va(response):
+                log_inf(f"[RequestHandler] Отправлено в VA: {response}")
+            else:
+                log_warn(f"[RequestHandler] Очередь отправки переполнена, ответ отброшен: {response}")
         except Exception as e:
             log_err(f"[RequestHandler] Ошибка отправки ответа в VA: {e}")
 
@@ -0,0 +1,161 @@
+# filename: word_replacements_engine.py
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_REPLACEMENTS = {"пересадить на": "transfer to"}
+
+
+def _default_replacements_path() -> str:
+    return os.path.join(os.path.expanduser('~'), 'Saved Games', 'EDVoicePlugin', 'resources', 'word_replacements.json')
+
+
+class WordReplacementsEngine:
+    """
+    Общий словарь замен (word_replacements.json) для STT, Читалки и окна словаря.
+
+    Особенности:
+    - Все замены компилируются в одно регулярное выражение-альтернацию, длинные
+      ключи идут первыми (longest-match-first), текст проходится за один проход.
+    - Файл перечитывается только при изменении mtime (проверка не чаще check_interval_sec).
+    - Дополнительные встроенные замены (extra) компилируются отдельно и кэшируются.
+    - Если файл не читается (битый JSON), остаётся последний удачно загруженный словарь,
+      а set_replacement/delete_replacement бросают ValueError, чтобы не перезаписать файл.
+    """
+
+    def __init__(self, file_path: str | None = None, check_interval_sec: float = 0.5):
+        self.file_path = file_path or _default_replacements_path()
+        self.check_interval_sec = check_interval_sec
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._last_check = 0.0
+        self._replacements: dict[str, str] = {}
+        self._compiled: dict = {}
+        self.load_error = None
+        self._ensure_file()
+        self.reload()
+
+    # ---- FS helpers ----
+
+    def _ensure_file(self):
+        if os.path.exists(self.file_path):
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                json.dump(DEFAULT_REPLACEMENTS, f, indent=4, ensure_ascii=False)
+        except Exception as e:
+            print(f"[Dictionary] Не удалось создать словарь '{self.file_path}': {e}")
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """Принудительно перечитывает файл словаря."""
+        with self._lock:
+            mtime = self._current_mtime()
+            replacements = {}
+            error = None
+            if mtime is not None:
+                try:
+                    with open(self.file_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if not isinstance(data, dict):
+                        raise ValueError("ожидается объект JSON")
+                    replacements = {str(k): str(v) for k, v in data.items() if k}
+                except (OSError, ValueError) as e:
+                    error = f"{self.file_path}: {e}"
+                    print(f"[Dictionary] Ошибка загрузки словаря: {e}")
+            if error is None:
+                self._replacements = replacements
+            self.load_error = error
+            self._mtime = mtime
+            self._last_check = time.monotonic()
+            self._compiled = {}
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval_sec:
+            return
+        self._last_check = now
+        if self._current_mtime() != self._mtime:
+            self.reload()
+
+    def _save(self, replacements: dict):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with open(self.file_path, 'w', encoding='utf-8') as f:
+            json.dump(replacements, f, indent=4, ensure_ascii=False)
+        self.reload()
+
+    # ---- Публичный API ----
+
+    def get_replacements(self) -> dict:
+        """Копия словаря в порядке файла (для отображения в UI)."""
+        with self._lock:
+            self._refresh_if_changed()
+            return dict(self._replacements)
+
+    def _check_writable(self):
+        if self.load_error:
+            raise ValueError(f"Словарь не прочитан, сохранение отменено ({self.load_error})")
+
+    def set_replacement(self, wrong: str, correct: str):
+        with self._lock:
+            replacements = self.get_replacements()
+            self._check_writable()
+            replacements[wrong] = correct
+            self._save(replacements)
+
+    def delete_replacement(self, wrong: str):
+        with self._lock:
+            replacements = self.get_replacements()
+            self._check_writable()
+            if wrong in replacements:
+                del replacements[wrong]
+                self._save(replacements)
+
+    def _compiled_for(self, extra: tuple):
+        with self._lock:
+            self._refresh_if_changed()
+            compiled = self._compiled.get(extra)
+            if compiled is None:
+                mapping = dict(self._replacements)
+                mapping.update(extra)
+                if mapping:
+                    keys = sorted(mapping, key=len, reverse=True)
+                    pattern = re.compile("|".join(re.escape(k) for k in keys))
+                else:
+                    pattern = None
+                compiled = (pattern, mapping)
+                self._compiled[extra] = compiled
+            return compiled
+
+    def apply(self, text: str, extra: tuple = ()) -> str:
+        """
+        Применяет замены за один проход.
+        extra — кортеж пар (неверно, верно) поверх словаря из файла (имеют приоритет).
+        """
+        if not text:
+            return text
+        pattern, mapping = self._compiled_for(extra)
+        if pattern is None:
+            return text
+        return pattern.sub(lambda m: mapping[m.group(0)], text)
+
+
+_shared_engine: WordReplacementsEngine | None = None
+_shared_lock = threading.Lock()
+
+
+def get_word_replacements_engine() -> WordReplacementsEngine:
+    """Общий экземпляр словаря для всего приложения."""
+    global _shared_engine
+    with _shared_lock:
+        if _shared_engine is None:
+            _shared_engine = WordReplacementsEngine()
+        return _shared_engine